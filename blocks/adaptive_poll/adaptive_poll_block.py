@@ -0,0 +1,127 @@
+from datetime import timedelta
+from threading import RLock
+
+from nio.block.base import Block
+from nio.block.terminals import input
+from nio.modules.scheduler import Job
+from nio.properties import BoolProperty, FloatProperty, Property, \
+    TimeDeltaProperty, VersionProperty
+from nio.signal.base import Signal
+
+
+class AdaptiveInterval(object):
+
+    """ Poll interval that backs off while idle
+
+    The interval drops to the floor whenever a poll finds an active device
+    or a different device than the previous poll, it is multiplied by the
+    backoff after every idle poll, up to the ceiling.
+    """
+
+    def __init__(self, floor, ceiling, backoff):
+        """ Create an interval starting at the floor
+
+        Args:
+            floor (float): seconds between polls while active
+            ceiling (float): maximum seconds between polls while idle
+            backoff (float): interval multiplier applied on idle polls
+        """
+        self.floor = floor
+        self.ceiling = max(floor, ceiling)
+        self.backoff = max(1, backoff)
+        self.interval = floor
+        self._device = None
+
+    def update(self, active, device=None):
+        """ Update the interval with the outcome of a poll
+
+        Args:
+            active (bool): a device is playing
+            device: what identifies the device that was found
+
+        Returns:
+            True when the interval changed
+        """
+        previous = self.interval
+        changed = device != self._device
+        self._device = device
+        if active or changed:
+            self.interval = self.floor
+        else:
+            self.interval = min(self.interval * self.backoff, self.ceiling)
+        return self.interval != previous
+
+
+@input("activity", default=True, label="activity")
+class AdaptivePollDriver(Block):
+
+    """ Notify an empty signal to drive polls at an adaptive rate
+
+    Poll results are fed back to the activity input, polls run every
+    `floor` while a device is active or just changed and back off towards
+    `ceiling` while idle.
+    """
+
+    version = VersionProperty("0.1.0")
+    floor = TimeDeltaProperty(
+        title="Floor Interval", default={"seconds": 3}, order=0)
+    ceiling = TimeDeltaProperty(
+        title="Ceiling Interval", default={"minutes": 5}, order=1)
+    backoff = FloatProperty(
+        title="Idle Backoff Multiplier", default=2, order=2)
+    active = BoolProperty(
+        title="Device Active",
+        default="{{ $device['name'] != 'nothing' }}", order=3)
+    device = Property(
+        title="Device", default="{{ $device['name'] }}", order=4)
+
+    def __init__(self):
+        super().__init__()
+        self._interval = None
+        self._job = None
+        self._lock = RLock()
+
+    def configure(self, context):
+        super().configure(context)
+        self._interval = AdaptiveInterval(
+            self.floor().total_seconds(), self.ceiling().total_seconds(),
+            self.backoff())
+
+    def start(self):
+        super().start()
+        self._schedule()
+
+    def stop(self):
+        with self._lock:
+            if self._job is not None:
+                self._job.cancel()
+                self._job = None
+        super().stop()
+
+    def process_signals(self, signals, input_id=None):
+        changed = False
+        for signal in signals:
+            try:
+                active = self.active(signal)
+                device = self.device(signal)
+            except Exception:
+                self.logger.exception(
+                    "Unable to evaluate poll activity, polling fast")
+                active, device = True, None
+            changed = self._interval.update(active, device) or changed
+        if changed:
+            # the pending poll was scheduled before this poll's results
+            self._schedule()
+
+    def _schedule(self):
+        with self._lock:
+            if self._job is not None:
+                self._job.cancel()
+            self._job = Job(
+                self._poll, timedelta(seconds=self._interval.interval), False)
+
+    def _poll(self):
+        # next poll is scheduled first, results fed back synchronously
+        # reschedule it
+        self._schedule()
+        self.notify_signals([Signal()])
@@ -0,0 +1,77 @@
+""" Report API calls saved by adaptive polling against detection latency
+
+A stand-in for the Spotify player endpoint replays a week of listening
+sessions, polls are timed by AdaptiveInterval on simulated time.
+
+Run from the project root with:
+    python -m blocks.adaptive_poll.benchmarks.bench_polling [days]
+"""
+import random
+import sys
+from bisect import bisect_right
+
+from ..adaptive_poll_block import AdaptiveInterval
+
+
+class _StandInPlayer(object):
+
+    """ Answers GET /v1/me/player with the device playing at a time """
+
+    def __init__(self, days, seed=0):
+        rng = random.Random(seed)
+        devices = ["Kitchen", "Office", "Phone"]
+        # (start, device) changes, 'nothing' while idle
+        self.changes = [(0, "nothing")]
+        for day in range(days):
+            for hour, hours in ((8, 1), (13, 0.5), (19, 3)):
+                start = (day * 24 + hour + rng.random()) * 3600
+                end = start + hours * 3600 * (0.5 + rng.random())
+                time = start
+                while time < end:
+                    self.changes.append((time, rng.choice(devices)))
+                    time += rng.uniform(600, 3600)
+                self.changes.append((end, "nothing"))
+        self._times = [time for time, _ in self.changes]
+        self.calls = 0
+
+    def get(self, time):
+        self.calls += 1
+        return self.changes[bisect_right(self._times, time) - 1][1]
+
+
+def simulate(days, floor, ceiling, backoff=2):
+    """ Poll the stand-in for a number of days
+
+    Returns:
+        tuple of API calls and the latency of every detected change
+    """
+    player = _StandInPlayer(days)
+    interval = AdaptiveInterval(floor, ceiling, backoff)
+    end = days * 24 * 3600
+    time = 0
+    detected = []
+    changes = iter(player.changes[1:])
+    change = next(changes, None)
+    while time < end:
+        device = player.get(time)
+        while change is not None and change[0] <= time:
+            # every change since the previous poll is detected now
+            detected.append(time - change[0])
+            change = next(changes, None)
+        interval.update(device != "nothing", device)
+        time += interval.interval
+    return player.calls, detected
+
+
+if __name__ == "__main__":
+    days = int(sys.argv[1]) if len(sys.argv) > 1 else 7
+    fixed_calls, fixed_latency = simulate(days, 3, 3)
+    print("{} days, {} changes, fixed 3s polling: {} calls".format(
+        days, len(fixed_latency), fixed_calls))
+    print("{:>9}{:>10}{:>8}{:>14}{:>13}".format(
+        "ceiling", "calls", "saved", "mean latency", "max latency"))
+    for ceiling in (3, 30, 60, 300, 600):
+        calls, latency = simulate(days, 3, ceiling)
+        print("{:>8}s{:>10}{:>7.1f}%{:>13.1f}s{:>12.1f}s".format(
+            ceiling, calls, 100 * (1 - calls / fixed_calls),
+            sum(latency) / len(latency), max(latency)))
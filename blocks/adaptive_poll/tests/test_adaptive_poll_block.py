@@ -0,0 +1,89 @@
+from time import sleep
+
+from nio.signal.base import Signal
+from nio.testing.block_test_case import NIOBlockTestCase
+from nio.testing.modules.scheduler.scheduler import JumpAheadScheduler
+
+from ..adaptive_poll_block import AdaptiveInterval, AdaptivePollDriver
+
+
+class TestAdaptiveInterval(NIOBlockTestCase):
+
+    def test_backoff(self):
+        """ Idle polls back off up to the ceiling, activity resets it """
+        interval = AdaptiveInterval(3, 20, 2)
+        intervals = []
+        for _ in range(5):
+            interval.update(False, "nothing")
+            intervals.append(interval.interval)
+        # the first poll is a change from no device at all
+        self.assertEqual(intervals, [3, 6, 12, 20, 20])
+        self.assertFalse(interval.update(False, "nothing"))
+        self.assertTrue(interval.update(True, "Kitchen"))
+        self.assertEqual(interval.interval, 3)
+
+    def test_device_change(self):
+        """ A different device resets the interval """
+        interval = AdaptiveInterval(3, 20, 2)
+        interval.update(False, "Kitchen")
+        interval.update(False, "Kitchen")
+        self.assertEqual(interval.interval, 6)
+        self.assertTrue(interval.update(False, "Office"))
+        self.assertEqual(interval.interval, 3)
+
+
+class TestAdaptivePollDriver(NIOBlockTestCase):
+
+    def _start_block(self):
+        blk = AdaptivePollDriver()
+        self.configure_block(blk, {
+            "floor": {"seconds": 3},
+            "ceiling": {"seconds": 12},
+        })
+        blk.start()
+        return blk
+
+    def _jump_ahead(self, seconds):
+        JumpAheadScheduler.jump_ahead(seconds)
+        # targets run in their own thread
+        sleep(0.1)
+
+    def _feedback(self, blk, name):
+        blk.process_signals(
+            [Signal({"device": {"name": name}})], "activity")
+
+    def test_polls_at_floor(self):
+        """ Polls are driven at the floor until told otherwise """
+        blk = self._start_block()
+        self._jump_ahead(3)
+        self.assert_num_signals_notified(1)
+        self.assertDictEqual(self.last_notified["__default_terminal_value"][0]
+                             .to_dict(), {})
+        self._jump_ahead(3)
+        self.assert_num_signals_notified(2)
+        blk.stop()
+
+    def test_backs_off_while_idle(self):
+        """ Polls slow down while nothing is playing """
+        blk = self._start_block()
+        # the first idle poll still counts as a device change
+        for seconds in (3, 3, 6, 12, 12):
+            self._jump_ahead(seconds - 1)
+            notified = len(self.last_notified["__default_terminal_value"])
+            self._jump_ahead(1)
+            self.assert_num_signals_notified(notified + 1)
+            self._feedback(blk, "nothing")
+        blk.stop()
+
+    def test_activity_resets_interval(self):
+        """ Activity reschedules the next poll at the floor """
+        blk = self._start_block()
+        for seconds in (3, 3, 6):
+            self._jump_ahead(seconds)
+            self._feedback(blk, "nothing")
+        self.assert_num_signals_notified(3)
+        # next poll is 12 seconds away until a device becomes active
+        self._feedback(blk, "Kitchen")
+        self._jump_ahead(3)
+        self.assert_num_signals_notified(4)
+        blk.stop()
@@ -0,0 +1,78 @@
+""" Benchmark requests with and without keep-alive connection pooling
+
+A local HTTPS stand-in of the Spotify player endpoint runs in its own
+process, per request latency and client CPU time are measured.
+
+Run from the project root with (requires the openssl command):
+    python -m blocks.http_pool.benchmarks.bench_pool [requests]
+"""
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+from time import perf_counter, process_time
+
+import requests
+
+from ..session_pool import SessionPool
+from ..tests.stub_server import StubServer
+
+
+def serve(certfile, keyfile):
+    server = StubServer()
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(certfile, keyfile)
+    server.socket = context.wrap_socket(server.socket, server_side=True)
+    print(server.server_address[1], flush=True)
+    server.serve_forever()
+
+
+def _certificate(folder):
+    certfile = os.path.join(folder, "cert.pem")
+    keyfile = os.path.join(folder, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+         "-keyout", keyfile, "-out", certfile, "-days", "1",
+         "-subj", "/CN=localhost",
+         "-addext", "subjectAltName=DNS:localhost"],
+        check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return certfile, keyfile
+
+
+def bench(send, url, certfile, count):
+    # warm up, the pooled session connects once
+    send("GET", url, verify=certfile)
+    wall = perf_counter()
+    cpu = process_time()
+    for _ in range(count):
+        send("GET", url, verify=certfile).json()
+    return ((perf_counter() - wall) / count,
+            (process_time() - cpu) / count)
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--serve"]:
+        serve(*sys.argv[2:4])
+        sys.exit()
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    with tempfile.TemporaryDirectory() as folder:
+        certfile, keyfile = _certificate(folder)
+        server = subprocess.Popen(
+            [sys.executable, "-m", "blocks.http_pool.benchmarks.bench_pool",
+             "--serve", certfile, keyfile], stdout=subprocess.PIPE)
+        try:
+            url = "https://localhost:{}/v1/me/player".format(
+                int(server.stdout.readline()))
+            pool = SessionPool()
+            print("{} GET requests over HTTPS".format(count))
+            print("{:>10}{:>14}{:>12}".format("", "latency", "cpu"))
+            for name, send in (("fresh", requests.request),
+                               ("pooled", pool.request)):
+                latency, cpu = bench(send, url, certfile, count)
+                print("{:>10}{:>12.2f}ms{:>10.2f}ms".format(
+                    name, latency * 1000, cpu * 1000))
+            pool.close()
+        finally:
+            server.terminate()
+            server.wait()
@@ -0,0 +1,89 @@
+""" Benchmark polling with conditional requests and unchanged results
+
+Polls a local stand-in of the player endpoint whose state changes every
+100 polls, reports response bytes and signals entering the downstream
+chain.
+
+Run from the project root with:
+    python -m blocks.http_pool.benchmarks.bench_unchanged [polls]
+"""
+import sys
+from time import perf_counter
+
+from nio.block.context import BlockContext
+from nio.router.base import BlockRouter
+from nio.signal.base import Signal
+
+from ..pooled_http_requests_block import PooledHTTPRequests
+from ..tests.stub_server import StubServer
+
+
+class _Router(BlockRouter):
+
+    def __init__(self):
+        super().__init__()
+        self.notified = {}
+
+    def notify_signals(self, block, signals, output_id):
+        self.notified[output_id] = \
+            self.notified.get(output_id, 0) + len(signals)
+
+
+# a PlaybackStatus like response
+PLAYER = {
+    "device": {"id": "1", "name": "Kitchen", "is_active": True,
+               "type": "Speaker", "volume_percent": 50},
+    "item": {"name": "Song", "duration_ms": 200000,
+             "album": {"name": "Album", "images": [
+                 {"url": "https://i.scdn.co/image/{}".format(i)}
+                 for i in range(3)]},
+             "artists": [{"name": "Artist"}]},
+    "is_playing": True,
+    "shuffle_state": False,
+    "repeat_state": "off",
+}
+
+
+def bench(polls, properties):
+    server = StubServer(etags=True)
+    server.player = dict(PLAYER)
+    server.start()
+    router = _Router()
+    blk = PooledHTTPRequests()
+    properties = dict(properties, id="PlaybackStatus",
+                      url="{}/v1/me/player".format(server.url))
+    blk.configure(BlockContext(router, properties, "Bench", ""))
+    blk.start()
+    try:
+        start = perf_counter()
+        for poll in range(polls):
+            if poll % 100 == 99:
+                server.player = dict(server.player,
+                                     is_playing=not server.player[
+                                         "is_playing"])
+            blk.process_signals([Signal({"token": "token"})])
+        elapsed = perf_counter() - start
+    finally:
+        blk.stop()
+        server.stop()
+    return (server.body_bytes, router.notified.get(None, 0),
+            elapsed / polls)
+
+
+if __name__ == "__main__":
+    polls = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    fingerprint = "{{ ($device['id'], $device['is_active'], $is_playing) " \
+        "if hasattr($, 'device') else None }}"
+    print("{} polls, the player state changes every 100 polls".format(
+        polls))
+    print("{:>22}{:>12}{:>12}{:>10}".format(
+        "", "body bytes", "downstream", "ms/poll"))
+    for name, properties in (
+            ("every response", {}),
+            ("conditional", {"conditional": True}),
+            ("conditional + diff", {
+                "conditional": True, "suppress_unchanged": True,
+                "fingerprint": fingerprint})):
+        body_bytes, downstream, per_poll = bench(polls, properties)
+        print("{:>22}{:>12}{:>12}{:>10.2f}".format(
+            name, body_bytes, downstream, per_poll * 1000))
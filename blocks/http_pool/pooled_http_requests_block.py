@@ -0,0 +1,224 @@
+from copy import deepcopy
+from enum import Enum
+from threading import Lock
+from time import monotonic
+
+from nio.block.base import Block
+from nio.block.mixins.enrich.enrich_signals import EnrichSignals
+from nio.block.mixins.retry.retry import Retry
+from nio.block.terminals import output
+from nio.command import command
+from nio.properties import BoolProperty, IntProperty, ListProperty, \
+    ObjectProperty, Property, PropertyHolder, SelectProperty, \
+    StringProperty, TimeDeltaProperty, VersionProperty
+
+from .session_pool import SessionPool
+
+
+class HTTPMethod(Enum):
+    GET = "GET"
+    POST = "POST"
+    PUT = "PUT"
+    DELETE = "DELETE"
+    HEAD = "HEAD"
+    OPTIONS = "OPTIONS"
+    PATCH = "PATCH"
+
+
+class BasicAuthCreds(PropertyHolder):
+    username = StringProperty(title="Username", default=None,
+                              allow_none=True)
+    password = StringProperty(title="Password", default=None,
+                              allow_none=True)
+
+
+class Param(PropertyHolder):
+    key = StringProperty(title="Key", default="")
+    value = StringProperty(title="Value", default="")
+
+
+class Data(PropertyHolder):
+    params = ListProperty(Param, title="Parameters", default=[])
+    form_encode_data = BoolProperty(title="Form-Encode Data?",
+                                    default=False)
+
+
+class Header(PropertyHolder):
+    header = StringProperty(title="Header", default="")
+    value = StringProperty(title="Value", default="")
+
+
+@command("suppressed")
+@output("unchanged", label="unchanged")
+class PooledHTTPRequests(EnrichSignals, Retry, Block):
+
+    """ HTTPRequests through keep-alive connections shared by host
+
+    Configured like an HTTPRequests block, every PooledHTTPRequests block
+    of the instance sends its requests through the shared SessionPool.
+
+    Responses can be requested conditionally with the ETag of the previous
+    response from a url. Results whose fingerprint matches the previous
+    result from a url can be notified on the unchanged output instead of
+    the default one, until they have been for `max_suppression`.
+    """
+
+    version = VersionProperty("0.1.0")
+    url = StringProperty(title="URL Target",
+                         default="http://127.0.0.1:8181", order=0)
+    http_method = SelectProperty(HTTPMethod, title="HTTP Method",
+                                 default=HTTPMethod.GET, order=1)
+    basic_auth_creds = ObjectProperty(
+        BasicAuthCreds, title="Credentials (BasicAuth)",
+        default=BasicAuthCreds(), order=2)
+    data = ObjectProperty(Data, title="Parameters", default=Data(), order=3)
+    headers = ListProperty(Header, title="Headers", default=[], order=4)
+    require_json = BoolProperty(title="Require JSON", default=False,
+                                order=5)
+    verify = BoolProperty(title="Verify host's SSL certificate",
+                          default=True, order=6)
+    timeout = IntProperty(title="Connection Timeout", default=0, order=7)
+    pool_size = IntProperty(title="Connections Kept per Host", default=10,
+                            advanced=True, order=8)
+    idle_timeout = TimeDeltaProperty(title="Close Idle Connections After",
+                                     default={"minutes": 5}, advanced=True,
+                                     order=9)
+    conditional = BoolProperty(title="Send If-None-Match", default=False,
+                               advanced=True, order=10)
+    suppress_unchanged = BoolProperty(
+        title="Notify Unchanged Results Separately", default=False,
+        order=11)
+    fingerprint = Property(title="Result Fingerprint",
+                           default="{{ $to_dict() }}", allow_none=True,
+                           order=12)
+    max_suppression = TimeDeltaProperty(
+        title="Notify Unchanged Results Again After",
+        default={"minutes": 1}, order=13)
+
+    def __init__(self):
+        super().__init__()
+        self._pool = None
+        # (etag, response data) by url
+        self._etags = {}
+        # fingerprints of the last successful result notified on the
+        # default output, and when it was, by url
+        self._fingerprints = {}
+        self._lock = Lock()
+        self._suppressed = 0
+        self._not_modified = 0
+
+    def configure(self, context):
+        super().configure(context)
+        self._pool = SessionPool.shared(
+            self.pool_size(), self.idle_timeout().total_seconds())
+
+    def process_signals(self, signals, input_id=None):
+        changed = []
+        unchanged = []
+        for signal in signals:
+            url = self.url(signal)
+            try:
+                response = self.execute_with_retry(
+                    self._request, signal, url)
+            except Exception:
+                self.logger.exception("Request to {} failed".format(url))
+                continue
+            signals_data = self._response_data(url, response)
+            if not signals_data:
+                continue
+            output_signals = [self.get_output_signal(data, signal)
+                              for data in signals_data]
+            if self.suppress_unchanged() and response.status_code < 400 \
+                    and self._unchanged(url, output_signals):
+                unchanged.extend(output_signals)
+            else:
+                changed.extend(output_signals)
+        if changed:
+            self.notify_signals(changed)
+        if unchanged:
+            self.notify_signals(unchanged, "unchanged")
+
+    def suppressed(self):
+        """ Results notified on the unchanged output and responses that
+        were not modified """
+        with self._lock:
+            return {"suppressed": self._suppressed,
+                    "not_modified": self._not_modified}
+
+    def _unchanged(self, url, output_signals):
+        """ Find out if a result matches the previous one from a url """
+        fingerprints = [self.fingerprint(signal) for signal in output_signals]
+        now = monotonic()
+        with self._lock:
+            previous, notified_at = self._fingerprints.get(url, (None, now))
+            if previous == fingerprints and now - notified_at < \
+                    self.max_suppression().total_seconds():
+                self._suppressed += len(output_signals)
+                return True
+            # downstream blocks relying on repeated results, such as
+            # debounced warnings, see them again after max_suppression
+            self._fingerprints[url] = (fingerprints, now)
+            return False
+
+    def _request(self, signal, url):
+        kwargs = {
+            "headers": {header.header(signal): header.value(signal)
+                        for header in self.headers()},
+            "verify": self.verify(),
+            "timeout": self.timeout() or None,
+        }
+        username = self.basic_auth_creds().username(signal)
+        if username:
+            kwargs["auth"] = (
+                username, self.basic_auth_creds().password(signal))
+        data = {param.key(signal): param.value(signal)
+                for param in self.data().params()}
+        method = self.http_method(signal).value
+        if method in ("GET", "HEAD", "OPTIONS", "DELETE"):
+            kwargs["params"] = data
+        elif self.data().form_encode_data():
+            kwargs["data"] = data
+        else:
+            kwargs["json"] = data
+        if self.conditional() and method == "GET":
+            with self._lock:
+                etag = self._etags.get(url, (None,))[0]
+            if etag is not None:
+                kwargs["headers"]["If-None-Match"] = etag
+        response = self._pool.request(method, url, **kwargs)
+        if response.status_code >= 500:
+            # raised so that the request is retried
+            response.raise_for_status()
+        return response
+
+    def _response_data(self, url, response):
+        """ Signal data of a response, a list of dicts """
+        if response.status_code == 304:
+            with self._lock:
+                self._not_modified += 1
+                # the previous response stands
+                return deepcopy(self._etags.get(url, (None, [{}]))[1])
+        signals_data = self._parse_response(response)
+        etag = response.headers.get("ETag")
+        if self.conditional() and etag and response.ok:
+            with self._lock:
+                self._etags[url] = (etag, deepcopy(signals_data))
+        return signals_data
+
+    def _parse_response(self, response):
+        if not response.content:
+            return [{}]
+        try:
+            data = response.json()
+        except ValueError:
+            if self.require_json():
+                self.logger.warning(
+                    "Response from {} is not json".format(response.url))
+                return []
+            return [{"raw": response.text}]
+        if isinstance(data, list):
+            return [item if isinstance(item, dict) else {"value": item}
+                    for item in data]
+        if isinstance(data, dict):
+            return [data]
+        return [{"value": data}]
@@ -0,0 +1,138 @@
+from threading import Lock
+from time import monotonic
+from urllib.parse import urlsplit
+
+from requests import Session
+from requests.adapters import HTTPAdapter
+
+
+class _Entry(object):
+
+    __slots__ = ('session', 'last_used', 'in_use')
+
+    def __init__(self, session, now):
+        self.session = session
+        self.last_used = now
+        # requests currently going through the session
+        self.in_use = 0
+
+
+class SessionPool(object):
+
+    """ Keep-alive HTTP sessions shared by host
+
+    Each scheme and host gets a session keeping up to `pool_size`
+    connections alive, so that requests reuse connections and TLS sessions
+    instead of handshaking every time. Sessions idle for longer than
+    `idle_timeout` seconds are closed.
+    """
+
+    _shared = None
+    _shared_lock = Lock()
+
+    def __init__(self, pool_size=10, idle_timeout=300):
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self._entries = {}
+        self._lock = Lock()
+        self.created = 0
+        self.evictions = 0
+
+    @classmethod
+    def shared(cls, pool_size=None, idle_timeout=None):
+        """ Pool shared by every block of the instance
+
+        Args:
+            pool_size (int): connections kept per host, the shared pool
+                keeps the largest size requested
+            idle_timeout (float): seconds after which an unused session is
+                closed, the last value requested is used
+
+        Returns:
+            SessionPool
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            pool = cls._shared
+        pool.configure(pool_size, idle_timeout)
+        return pool
+
+    def configure(self, pool_size=None, idle_timeout=None):
+        with self._lock:
+            if idle_timeout is not None:
+                self.idle_timeout = idle_timeout
+            if pool_size is not None and pool_size > self.pool_size:
+                self.pool_size = pool_size
+                # sessions are created again with the larger pool
+                for entry in self._entries.values():
+                    if not entry.in_use:
+                        entry.session.close()
+                self._entries = {key: entry for key, entry
+                                 in self._entries.items() if entry.in_use}
+
+    def request(self, method, url, **kwargs):
+        """ Send a request through the session of the url host
+
+        Args:
+            method (str): HTTP method
+            url (str): request url
+            kwargs: keyword arguments of requests.Session.request
+
+        Returns:
+            requests.Response
+        """
+        entry = self._acquire(url)
+        try:
+            return entry.session.request(method, url, **kwargs)
+        finally:
+            with self._lock:
+                entry.in_use -= 1
+                entry.last_used = monotonic()
+
+    def _acquire(self, url):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.netloc)
+        now = monotonic()
+        with self._lock:
+            self._evict_idle(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry(
+                    self._create_session(), now)
+                self.created += 1
+            entry.in_use += 1
+            entry.last_used = now
+            return entry
+
+    def _create_session(self):
+        session = Session()
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return session
+
+    def _evict_idle(self, now):
+        """ Close idle sessions, must be called holding the lock """
+        for key, entry in list(self._entries.items()):
+            if not entry.in_use and \
+                    now - entry.last_used > self.idle_timeout:
+                entry.session.close()
+                del self._entries[key]
+                self.evictions += 1
+
+    def close(self):
+        """ Close every session, requests in progress are not waited for """
+        with self._lock:
+            for entry in self._entries.values():
+                entry.session.close()
+            self._entries = {}
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hosts": len(self._entries),
+                "sessions_created": self.created,
+                "evictions": self.evictions,
+            }
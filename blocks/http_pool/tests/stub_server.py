@@ -0,0 +1,77 @@
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Thread
+from zlib import crc32
+
+
+class _Handler(BaseHTTPRequestHandler):
+
+    # keep connections alive
+    protocol_version = "HTTP/1.1"
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        headers = {}
+        if self.path.startswith("/v1/me/player") and \
+                not self.path.startswith("/v1/me/player/pause") and \
+                self.server.player is not None:
+            body = json.dumps(self.server.player).encode()
+            status = 200
+            headers["Content-Type"] = "application/json"
+            if self.server.etags:
+                etag = '"{:x}"'.format(crc32(body))
+                headers["ETag"] = etag
+                if self.headers.get("If-None-Match") == etag:
+                    status, body = 304, b""
+        elif self.path.startswith("/raw"):
+            body = b"not json"
+            status = 200
+        else:
+            # nothing playing
+            body = b""
+            status = 204
+        self.send_response(status)
+        for header, value in headers.items():
+            self.send_header(header, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.server.body_bytes += len(body)
+
+    do_PUT = do_GET
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer(ThreadingHTTPServer):
+
+    """ Local stand-in of the Spotify player endpoints """
+
+    daemon_threads = True
+
+    def __init__(self, etags=False):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.connections = 0
+        self.body_bytes = 0
+        # current playback state, None when nothing is playing
+        self.player = {"device": {"name": "Kitchen"}, "is_playing": True}
+        self.etags = etags
+        self._thread = None
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}".format(self.server_address[1])
+
+    def start(self):
+        self._thread = Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
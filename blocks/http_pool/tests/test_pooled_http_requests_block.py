@@ -0,0 +1,177 @@
+import json
+import os
+from time import sleep
+
+from nio.signal.base import Signal
+from nio.testing.block_test_case import NIOBlockTestCase
+
+from ..pooled_http_requests_block import PooledHTTPRequests
+from .stub_server import StubServer
+
+
+class TestPooledHTTPRequests(NIOBlockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = StubServer()
+        self.server.start()
+
+    def tearDown(self):
+        self.server.stop()
+        super().tearDown()
+
+    def _block(self, path, **properties):
+        blk = PooledHTTPRequests()
+        properties["url"] = "{}{}".format(self.server.url, path)
+        self.configure_block(blk, properties)
+        blk.start()
+        return blk
+
+    def test_json_response(self):
+        """ Json responses are notified over a shared connection """
+        blk = self._block("/v1/me/player", headers=[
+            {"header": "Authorization", "value": "Bearer {{ $token }}"}])
+        blk.process_signals([Signal({"token": "abc"})] * 3)
+        self.assert_num_signals_notified(3)
+        self.assertDictEqual(self.last_signal_notified().to_dict(), {
+            "device": {"name": "Kitchen"}, "is_playing": True})
+        # every block shares keep-alive connections
+        self.assertEqual(self.server.connections, 1)
+        blk.stop()
+
+    def test_empty_response(self):
+        """ Nothing playing notifies a signal without a device """
+        blk = self._block("/v1/me/player/pause", http_method="PUT",
+                          enrich={"exclude_existing": False})
+        blk.process_signals([Signal({"token": "abc"})])
+        self.assertDictEqual(self.last_signal_notified().to_dict(),
+                             {"token": "abc"})
+        blk.stop()
+
+    def test_require_json(self):
+        """ Non json responses are wrapped unless json is required """
+        blk = self._block("/raw")
+        blk.process_signals([Signal()])
+        self.assertDictEqual(self.last_signal_notified().to_dict(),
+                             {"raw": "not json"})
+        blk = self._block("/raw", require_json=True)
+        blk.process_signals([Signal()])
+        self.assert_num_signals_notified(1)
+        blk.stop()
+
+
+class TestUnchangedResults(NIOBlockTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = StubServer(etags=True)
+        self.server.start()
+        self.blk = PooledHTTPRequests()
+        self.configure_block(self.blk, {
+            "url": "{}/v1/me/player".format(self.server.url),
+            "conditional": True,
+            "suppress_unchanged": True,
+            "fingerprint": "{{ $device['name'] if hasattr($, 'device') "
+                           "else None }}",
+            "max_suppression": {"milliseconds": 300},
+        })
+        self.blk.start()
+
+    def tearDown(self):
+        self.blk.stop()
+        self.server.stop()
+        super().tearDown()
+
+    def _poll(self):
+        self.blk.process_signals([Signal()])
+
+    def test_unchanged(self):
+        """ Results matching the previous one go to the unchanged output """
+        self._poll()
+        self._poll()
+        self.assertEqual(
+            len(self.notified_signals["__default_terminal_value"]), 1)
+        self.assertEqual(len(self.notified_signals["unchanged"]), 1)
+        # the previous response is reused when not modified
+        self.assertDictEqual(
+            self.last_signal_notified("unchanged").to_dict(),
+            self.server.player)
+        self.assertEqual(self.blk.suppressed(),
+                         {"suppressed": 1, "not_modified": 1})
+        # only fingerprinted fields matter
+        self.server.player["is_playing"] = False
+        self._poll()
+        self.assertEqual(self.blk.suppressed()["suppressed"], 2)
+        self.server.player["device"]["name"] = "Office"
+        self._poll()
+        self.assertEqual(self.blk.suppressed()["suppressed"], 2)
+        self.assertEqual(
+            self.last_signal_notified().device["name"], "Office")
+        self.server.player = None
+        self._poll()
+        self.assertFalse(hasattr(self.last_signal_notified(), "device"))
+
+    def test_max_suppression(self):
+        """ Results unchanged for max_suppression are notified again """
+        self._poll()
+        self._poll()
+        self.assertEqual(
+            len(self.notified_signals["__default_terminal_value"]), 1)
+        sleep(0.3)
+        self._poll()
+        self.assertEqual(
+            len(self.notified_signals["__default_terminal_value"]), 2)
+        # the window starts over
+        self._poll()
+        self.assertEqual(len(self.notified_signals["unchanged"]), 2)
+
+
+class TestPlaybackStatus(NIOBlockTestCase):
+
+    """ PlaybackStatus of the DeviceIndicator service, whose results on the
+    default output reach PubUnauth and publish bad_auth """
+
+    def setUp(self):
+        super().setUp()
+        self.server = StubServer(etags=True)
+        self.server.player = {
+            "device": {"id": "1", "name": "Kitchen", "is_active": True},
+            "is_playing": True,
+        }
+        self.server.start()
+        with open(os.path.join(os.path.dirname(__file__), "..", "..", "..",
+                               "etc", "blocks", "PlaybackStatus.cfg")) as f:
+            config = json.load(f)
+        config["url"] = "{}/v1/me/player".format(self.server.url)
+        config["max_suppression"] = {"milliseconds": 300}
+        self.blk = PooledHTTPRequests()
+        self.configure_block(self.blk, config)
+        self.blk.start()
+
+    def tearDown(self):
+        self.blk.stop()
+        self.server.stop()
+        super().tearDown()
+
+    def _poll(self):
+        self.blk.process_signals([Signal({"token": "abc"})])
+
+    def test_unauthorized_device_repeats(self):
+        """ An unauthorized device keeps being notified downstream """
+        self._poll()
+        self._poll()
+        self._poll()
+        self.assertEqual(
+            len(self.notified_signals["__default_terminal_value"]), 1)
+        self.assertEqual(
+            self.last_signal_notified().device["name"], "Kitchen")
+        # bad_auth is published again for the same device
+        sleep(0.3)
+        self._poll()
+        self.assertEqual(
+            len(self.notified_signals["__default_terminal_value"]), 2)
+        sleep(0.3)
+        self._poll()
+        self.assertEqual(
+            len(self.notified_signals["__default_terminal_value"]), 3)
+        self.assertEqual(len(self.notified_signals["unchanged"]), 2)
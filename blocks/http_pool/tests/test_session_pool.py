@@ -0,0 +1,44 @@
+from unittest import TestCase
+
+from ..session_pool import SessionPool
+from .stub_server import StubServer
+
+
+class TestSessionPool(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.server = StubServer()
+        self.server.start()
+        self.pool = SessionPool(pool_size=2, idle_timeout=60)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.stop()
+        super().tearDown()
+
+    def test_keep_alive(self):
+        """ Requests to a host reuse its connection """
+        for _ in range(5):
+            response = self.pool.request(
+                "GET", "{}/v1/me/player".format(self.server.url))
+            self.assertEqual(response.json()["device"]["name"], "Kitchen")
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.pool.stats(), {
+            "hosts": 1, "sessions_created": 1, "evictions": 0})
+
+    def test_idle_eviction(self):
+        """ Sessions idle for too long are closed """
+        self.pool.configure(idle_timeout=0)
+        for _ in range(3):
+            self.pool.request("GET", self.server.url)
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(self.pool.stats()["evictions"], 2)
+
+    def test_shared(self):
+        """ The shared pool is created once and grows as needed """
+        pool = SessionPool.shared(pool_size=4, idle_timeout=30)
+        self.assertIs(SessionPool.shared(pool_size=3), pool)
+        # the largest pool size is kept
+        self.assertGreaterEqual(pool.pool_size, 4)
+        self.assertEqual(pool.idle_timeout, 30)
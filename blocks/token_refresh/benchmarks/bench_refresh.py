@@ -0,0 +1,126 @@
+""" Simulate a day of polling with reactive and proactive token refresh
+
+Polls run every 3 seconds on the synchronous scheduler's virtual clock
+against a stand-in token service issuing tokens valid for an hour after
+half a second. The instance restarts once, half way through.
+
+    reactive   tokens are only fetched once a poll fails (auth_request)
+    proactive  tokens are fetched before they expire, as TokenRefresher
+               does, without persisting the expiry across the restart
+    persisted  proactive, a still valid token is reused after the restart
+
+Run from the project root with:
+    python -m blocks.token_refresh.benchmarks.bench_refresh [hours]
+"""
+import sys
+from datetime import timedelta
+
+from nio.modules.context import ModuleContext
+
+from service_tests.modules.module_scheduler_synchronous.scheduler import \
+    SynchronousSchedulerRunner
+
+POLL_INTERVAL = 3
+LIFETIME = 3600
+FETCH_LATENCY = 0.5
+REFRESH_BEFORE = 300
+
+
+class _Simulation(object):
+
+    def __init__(self, scheduler, strategy):
+        self._scheduler = scheduler
+        self._strategy = strategy
+        self._refresh_job = None
+        self.expires_at = None
+        self.fetching = False
+        self.fetches = 0
+        self.failed = 0
+        self.last_success = 0
+        self.max_gap = 0
+
+    def now(self):
+        return self._scheduler._get_time()
+
+    def start(self):
+        """ Start the instance, tokens held in memory are kept """
+        if self._strategy == "reactive":
+            # HoldToken reloads the last token, its expiry is unknown
+            return
+        if self._strategy == "persisted" and self.expires_at is not None \
+                and self.expires_at - REFRESH_BEFORE > self.now():
+            self._schedule_refresh()
+        else:
+            self.fetch()
+
+    def restart(self):
+        if self._refresh_job is not None:
+            self._scheduler.unschedule(self._refresh_job)
+            self._refresh_job = None
+        self.start()
+
+    def poll(self):
+        now = self.now()
+        if self.expires_at is None or now >= self.expires_at:
+            self.failed += 1
+            if self._strategy == "reactive":
+                # RequestError, FormatError and PubNewAuth
+                self.fetch()
+            return
+        self.max_gap = max(self.max_gap, now - self.last_success)
+        self.last_success = now
+
+    def fetch(self):
+        if self.fetching:
+            return
+        self.fetching = True
+        self.fetches += 1
+        self._scheduler.schedule_task(
+            self._token_received, timedelta(seconds=FETCH_LATENCY), False)
+
+    def _token_received(self):
+        self.fetching = False
+        self.expires_at = self.now() + LIFETIME
+        if self._strategy != "reactive":
+            self._schedule_refresh()
+
+    def _schedule_refresh(self):
+        self._refresh_job = self._scheduler.schedule_task(
+            self.fetch, timedelta(
+                seconds=self.expires_at - REFRESH_BEFORE - self.now()),
+            False)
+
+
+def simulate(strategy, hours):
+    context = ModuleContext()
+    context.min_interval = 0.01
+    context.resolution = 0.01
+    context.clock = SynchronousSchedulerRunner.Clock.virtual.value
+    scheduler = SynchronousSchedulerRunner()
+    scheduler.do_configure(context)
+    scheduler.do_start()
+    try:
+        simulation = _Simulation(scheduler, strategy)
+        # a token is fetched when the instance first starts
+        simulation.fetch()
+        scheduler.schedule_task(
+            simulation.poll, timedelta(seconds=POLL_INTERVAL), True)
+        scheduler.simulate(hours * 3600 / 2 + 17)
+        simulation.restart()
+        scheduler.simulate(hours * 3600 / 2 - 17)
+        return simulation
+    finally:
+        scheduler.do_stop()
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 24
+    print("{:.0f} h of {} s polls, tokens valid for {} s".format(
+        hours, POLL_INTERVAL, LIFETIME))
+    print("{:>10}{:>14}{:>10}{:>10}".format(
+        "", "failed polls", "max gap", "fetches"))
+    for strategy in ("reactive", "proactive", "persisted"):
+        simulation = simulate(strategy, hours)
+        print("{:>10}{:>14}{:>9.1f}s{:>10}".format(
+            strategy, simulation.failed, simulation.max_gap,
+            simulation.fetches))
@@ -0,0 +1,145 @@
+""" Simulate an auth_request storm with and without coalescing
+
+Three pollers run every 3 seconds, a second apart, on the synchronous
+scheduler's virtual clock. Twenty minutes in, the token in use stops being
+accepted and the token service rejects refreshes for half an hour, each
+failed poll publishes an auth_request.
+
+    per request  every auth_request fetches a token, as SubNewAuth feeding
+                 GetToken did, even while another fetch is in flight
+    coalesced    one fetch in flight, requests within 10 s of a new token
+                 are ignored and rejected fetches are retried after 30 s,
+                 doubling up to max_backoff, as TokenRefresher does
+
+Polls recover with the first fetch after the outage, when coalescing that
+is the pending retry, up to max_backoff after the outage ends.
+
+Run from the project root with:
+    python -m blocks.token_refresh.benchmarks.bench_storm [hours] \
+[max_backoff seconds]
+"""
+import sys
+from datetime import timedelta
+
+from nio.modules.context import ModuleContext
+
+from service_tests.modules.module_scheduler_synchronous.scheduler import \
+    SynchronousSchedulerRunner
+
+POLL_INTERVAL = 3
+POLLERS = 3
+FETCH_LATENCY = 0.5
+OUTAGE_START = 1200
+OUTAGE_END = 3000
+MIN_SPACING = 10
+RETRY_INTERVAL = 30
+MAX_BACKOFF = 300
+
+
+class _Simulation(object):
+
+    def __init__(self, scheduler, coalesce, max_backoff):
+        self._scheduler = scheduler
+        self._coalesce = coalesce
+        self._max_backoff = max_backoff
+        self._retry_job = None
+        self._spacing_until = 0
+        self._attempts = 0
+        self.token_valid = True
+        self.in_flight = False
+        self.requests = 0
+        self.fetches = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.recovered_at = None
+
+    def now(self):
+        return self._scheduler._get_time()
+
+    def poll(self):
+        if self.now() >= OUTAGE_START and self.recovered_at is None and \
+                self.token_valid:
+            # the token in use is no longer accepted
+            self.token_valid = False
+        if self.token_valid:
+            return
+        self.failed += 1
+        self.requests += 1
+        self.request()
+
+    def request(self, retry=False):
+        if self._coalesce and (
+                self.in_flight or
+                not retry and self.now() < self._spacing_until):
+            self.coalesced += 1
+            return
+        self.in_flight = True
+        self._attempts += 1
+        self.fetches += 1
+        self._scheduler.schedule_task(
+            self._token_received, timedelta(seconds=FETCH_LATENCY), False)
+        if self._coalesce:
+            self._schedule_retry()
+
+    def _retry(self):
+        self.in_flight = False
+        self.request(retry=True)
+
+    def _schedule_retry(self):
+        if self._retry_job is not None:
+            self._scheduler.unschedule(self._retry_job)
+        delay = min(RETRY_INTERVAL * 2 ** (self._attempts - 1),
+                    self._max_backoff)
+        self._retry_job = self._scheduler.schedule_task(
+            self._retry, timedelta(seconds=delay), False)
+
+    def _token_received(self):
+        if OUTAGE_START <= self.now() < OUTAGE_END:
+            # rejected, a coalesced fetch waits for its retry
+            return
+        if self._retry_job is not None:
+            self._scheduler.unschedule(self._retry_job)
+            self._retry_job = None
+        self.in_flight = False
+        self._attempts = 0
+        self._spacing_until = self.now() + MIN_SPACING
+        if not self.token_valid and self.now() >= OUTAGE_START:
+            self.recovered_at = self.now()
+        self.token_valid = True
+
+
+def simulate(coalesce, hours, max_backoff=MAX_BACKOFF):
+    context = ModuleContext()
+    context.min_interval = 0.01
+    context.resolution = 0.01
+    context.clock = SynchronousSchedulerRunner.Clock.virtual.value
+    scheduler = SynchronousSchedulerRunner()
+    scheduler.do_configure(context)
+    scheduler.do_start()
+    try:
+        simulation = _Simulation(scheduler, coalesce, max_backoff)
+        for poller in range(POLLERS):
+            scheduler.simulate(1)
+            scheduler.schedule_task(
+                simulation.poll, timedelta(seconds=POLL_INTERVAL), True)
+        scheduler.simulate(hours * 3600 - POLLERS)
+        return simulation
+    finally:
+        scheduler.do_stop()
+
+
+if __name__ == "__main__":
+    hours = float(sys.argv[1]) if len(sys.argv) > 1 else 1
+    max_backoff = float(sys.argv[2]) if len(sys.argv) > 2 else MAX_BACKOFF
+    print("{:.0f} h of {} pollers every {} s, refreshes rejected for "
+          "{} s, max_backoff {:.0f} s".format(
+              hours, POLLERS, POLL_INTERVAL, OUTAGE_END - OUTAGE_START,
+              max_backoff))
+    print("{:>12}{:>10}{:>10}{:>11}{:>10}{:>11}".format(
+        "", "requests", "fetches", "coalesced", "failed", "recovery"))
+    for name, coalesce in (("per request", False), ("coalesced", True)):
+        simulation = simulate(coalesce, hours, max_backoff)
+        print("{:>12}{:>10}{:>10}{:>11}{:>10}{:>10.1f}s".format(
+            name, simulation.requests, simulation.fetches,
+            simulation.coalesced, simulation.failed,
+            simulation.recovered_at - OUTAGE_END))
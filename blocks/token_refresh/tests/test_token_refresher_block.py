@@ -0,0 +1,159 @@
+from time import sleep
+
+from nio.signal.base import Signal
+from nio.testing.block_test_case import NIOBlockTestCase
+from nio.testing.modules.scheduler.scheduler import JumpAheadScheduler
+
+from ..token_refresher_block import TokenRefresher
+
+
+class TestTokenRefresher(NIOBlockTestCase):
+
+    def _start_block(self, block_id="RefreshToken"):
+        blk = TokenRefresher()
+        self.configure_block(blk, {
+            "id": block_id,
+            "refresh_before": {"seconds": 60},
+            "retry_interval": {"seconds": 10},
+        })
+        blk.start()
+        return blk
+
+    def _jump_ahead(self, seconds):
+        JumpAheadScheduler.jump_ahead(seconds)
+        # targets run in their own thread
+        sleep(0.1)
+
+    def _refreshes(self):
+        return len(self.notified_signals["refresh"])
+
+    def test_refresh_before_expiry(self):
+        """ A new token is asked for before expiry until one comes in """
+        blk = self._start_block()
+        # no token yet
+        self.assertEqual(self._refreshes(), 1)
+        blk.process_signals([Signal({"token": "abc", "expires_in": 600})])
+        self.assertDictEqual(self.last_signal_notified().to_dict(),
+                             {"token": "abc", "expires_in": 600})
+        self._jump_ahead(530)
+        self.assertEqual(self._refreshes(), 1)
+        self._jump_ahead(20)
+        self.assertEqual(self._refreshes(), 2)
+        # asked again until a token comes in
+        self._jump_ahead(10)
+        self.assertEqual(self._refreshes(), 3)
+        blk.process_signals([Signal({"token": "def", "expires_in": 3600})])
+        self._jump_ahead(3500)
+        self.assertEqual(self._refreshes(), 3)
+        blk.stop()
+
+    def test_reuse_persisted_token(self):
+        """ A persisted token still valid is reused on start """
+        blk = self._start_block("Reused")
+        blk.process_signals([Signal({"token": "abc", "expires_in": 600})])
+        blk.stop()
+        self.notified_signals.clear()
+        blk = self._start_block("Reused")
+        self.assertEqual(self._refreshes(), 0)
+        self.assertDictEqual(self.last_signal_notified().to_dict(),
+                             {"token": "abc", "expires_in": 600})
+        self._jump_ahead(550)
+        self.assertEqual(self._refreshes(), 1)
+        blk.stop()
+
+    def test_expired_persisted_token(self):
+        """ An expired persisted token is refreshed on start """
+        blk = self._start_block("Expired")
+        blk.process_signals([Signal({"token": "abc", "expires_in": 30})])
+        blk.stop()
+        self.notified_signals.clear()
+        blk = self._start_block("Expired")
+        self.assertEqual(self._refreshes(), 1)
+        self.assertNotIn("__default_terminal_value", self.notified_signals)
+        blk.stop()
+
+    def test_coalesce_requests(self):
+        """ Requests during a refresh or right after a token are coalesced """
+        blk = self._start_block("Coalesced")
+        # the refresh asked for on start is still in flight
+        blk.process_signals([Signal(), Signal()], "request")
+        blk.process_signals([Signal()], "request")
+        self.assertEqual(self._refreshes(), 1)
+        blk.process_signals([Signal({"token": "abc", "expires_in": 3600})])
+        self.notified_signals.clear()
+        # requests right after a new token can be from polls using the old
+        # one, only those get the new token again
+        blk.process_signals([Signal({"token": "abc"}), Signal()], "request")
+        self.assertEqual(self.notified_signals, {})
+        blk.process_signals([Signal({"token": "old"})], "request")
+        self.assertNotIn("refresh", self.notified_signals)
+        self.assertDictEqual(self.last_signal_notified().to_dict(),
+                             {"token": "abc", "expires_in": 3600})
+        self._jump_ahead(10)
+        blk.process_signals([Signal({"token": "abc"})], "request")
+        self.assertEqual(self._refreshes(), 1)
+        self.assertDictEqual(blk.coalesced(), {
+            "refreshes": 2, "coalesced": 6, "republished": 1,
+            "rejected": 0})
+        blk.stop()
+
+    def test_backoff_rejected_refresh(self):
+        """ Rejected refreshes are retried with a growing interval """
+        blk = self._start_block("Rejected")
+        blk.process_signals([Signal({"error": "invalid_client"})])
+        self.assertNotIn("__default_terminal_value", self.notified_signals)
+        # requests wait for the retry
+        blk.process_signals([Signal()], "request")
+        self._jump_ahead(9)
+        self.assertEqual(self._refreshes(), 1)
+        self._jump_ahead(1)
+        self.assertEqual(self._refreshes(), 2)
+        blk.process_signals([Signal({"token": ""})])
+        self._jump_ahead(19)
+        self.assertEqual(self._refreshes(), 2)
+        self._jump_ahead(1)
+        self.assertEqual(self._refreshes(), 3)
+        blk.process_signals([Signal({"token": "abc", "expires_in": 3600})])
+        self.assertEqual(self.last_signal_notified().token, "abc")
+        self.assertEqual(blk.coalesced()["rejected"], 2)
+        # an error is a rejected refresh even along with a token
+        blk.process_signals(
+            [Signal({"token": "def", "error": "invalid_grant"})])
+        self.assertEqual(self.last_signal_notified().token, "abc")
+        self.assertEqual(blk.coalesced()["rejected"], 3)
+        blk.stop()
+
+    def test_token_without_expiry(self):
+        """ A token without its expiry is assumed to last an hour """
+        blk = self._start_block("NoExpiry")
+        blk.process_signals([Signal({"token": "abc"})])
+        self.assertDictEqual(self.last_signal_notified().to_dict(),
+                             {"token": "abc"})
+        self.assertEqual(blk.coalesced()["rejected"], 0)
+        self._jump_ahead(3530)
+        self.assertEqual(self._refreshes(), 1)
+        self._jump_ahead(20)
+        self.assertEqual(self._refreshes(), 2)
+        blk.stop()
+
+    def test_backoff_while_tokens_fail(self):
+        """ Tokens refreshed again right away do not reset the backoff """
+        blk = self._start_block("Failing")
+        for retry in (20, 80, 300):
+            blk.process_signals(
+                [Signal({"token": "abc", "expires_in": 600})])
+            # the token fails as soon as requests are no longer coalesced
+            self._jump_ahead(10)
+            blk.process_signals([Signal({"token": "abc"})], "request")
+            refreshes = self._refreshes()
+            self._jump_ahead(retry - 1)
+            self.assertEqual(self._refreshes(), refreshes)
+            self._jump_ahead(1)
+            self.assertEqual(self._refreshes(), refreshes + 1)
+        # a token lasting until its refresh starts attempts over
+        blk.process_signals([Signal({"token": "abc", "expires_in": 600})])
+        self._jump_ahead(540)
+        refreshes = self._refreshes()
+        self._jump_ahead(10)
+        self.assertEqual(self._refreshes(), refreshes + 1)
+        blk.stop()
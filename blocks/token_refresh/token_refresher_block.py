@@ -0,0 +1,235 @@
+from datetime import timedelta
+from threading import RLock
+from time import time
+
+from nio.block.base import Block
+from nio.block.mixins.persistence.persistence import Persistence
+from nio.block.terminals import input, output
+from nio.command import command
+from nio.modules.scheduler import Job
+from nio.properties import BoolProperty, IntProperty, Property, \
+    TimeDeltaProperty, VersionProperty
+from nio.signal.base import Signal
+
+
+@command("coalesced")
+@input("request", label="request")
+@output("refresh", label="refresh")
+class TokenRefresher(Persistence, Block):
+
+    """ Pass tokens on and ask for a new one before they expire
+
+    Token signals are notified as they are, a signal is notified on the
+    refresh output `refresh_before` their expiry. Only one refresh is ever
+    in flight, signals on the request input while waiting for a token, or
+    within `min_spacing` of the last token, are coalesced into it. Requests
+    within `min_spacing` that failed with an older token than the last one
+    get the last token notified again. A refresh without an answer, or
+    whose response is rejected, is asked for again after `retry_interval`,
+    doubling with every attempt up to `max_backoff`. Attempts only start
+    over once a token lasts until it is refreshed before its expiry.
+
+    The last token is persisted with its expiry, a token that is still
+    valid is notified again when the block starts instead of asking for a
+    new one.
+    """
+
+    version = VersionProperty("0.1.0")
+    lifetime = IntProperty(
+        title="Token Lifetime (seconds)",
+        default="{{ $expires_in if hasattr($, 'expires_in') else 3600 }}",
+        order=0)
+    token_valid = BoolProperty(
+        title="Token Valid",
+        default="{{ hasattr($, 'token') and bool($token) and "
+                "not hasattr($, 'error') }}",
+        order=1)
+    refresh_before = TimeDeltaProperty(
+        title="Refresh Before Expiry", default={"minutes": 5}, order=2)
+    min_spacing = TimeDeltaProperty(
+        title="Minimum Time Between Refreshes", default={"seconds": 10},
+        order=3)
+    retry_interval = TimeDeltaProperty(
+        title="Retry Refresh Every", default={"seconds": 30}, order=4)
+    max_backoff = TimeDeltaProperty(
+        title="Maximum Retry Interval", default={"minutes": 5}, order=5)
+    used_token = Property(
+        title="Token Used",
+        default="{{ $token if hasattr($, 'token') else None }}",
+        allow_none=True, order=6)
+
+    def __init__(self):
+        super().__init__()
+        # data of the last token signal and its expiry, in epoch seconds
+        self._token = None
+        self._expires_at = None
+        self._refresh_job = None
+        # a refresh was asked for and no token came in yet
+        self._in_flight = False
+        # refreshes asked for since a token last lasted until its expiry
+        self._attempts = 0
+        # a token was received less than min_spacing ago
+        self._spacing = False
+        self._spacing_job = None
+        self._refreshes = 0
+        self._coalesced = 0
+        # valid tokens notified again for requests dropped after a refresh
+        self._republished = 0
+        self._rejected = 0
+        self._lock = RLock()
+
+    def persisted_values(self):
+        return ["_token", "_expires_at"]
+
+    def start(self):
+        super().start()
+        with self._lock:
+            delay = self._refresh_delay()
+            token = self._token
+            if token is None or delay <= 0:
+                token = None
+                self._request_refresh()
+            else:
+                self._schedule_refresh(delay)
+        if token is not None:
+            self.logger.info("Reusing a token valid for {:.0f} seconds"
+                             .format(self._expires_at - time()))
+            self.notify_signals([Signal(token)])
+
+    def stop(self):
+        with self._lock:
+            for job in (self._refresh_job, self._spacing_job):
+                if job is not None:
+                    job.cancel()
+            self._refresh_job = self._spacing_job = None
+        super().stop()
+
+    def coalesced(self):
+        """ Refreshes asked for, coalesced refresh requests, tokens notified
+        again for them and rejected tokens """
+        with self._lock:
+            return {"refreshes": self._refreshes,
+                    "coalesced": self._coalesced,
+                    "republished": self._republished,
+                    "rejected": self._rejected}
+
+    def process_signals(self, signals, input_id=None):
+        if input_id == "request":
+            for signal in signals:
+                self._request_refresh(signal)
+            return
+        tokens = []
+        with self._lock:
+            for signal in signals:
+                if not self.token_valid(signal):
+                    self._rejected += 1
+                    continue
+                tokens.append(signal)
+                self._token = signal.to_dict()
+                self._expires_at = time() + self.lifetime(signal)
+            if not tokens:
+                # keep coalescing requests until the retry is due
+                delay = self._retry_delay()
+                self.logger.warning("Token refresh rejected, retrying in "
+                                    "{:.0f} seconds".format(delay))
+                self._schedule_refresh(delay, self._retry)
+                return
+            self._in_flight = False
+            self._spacing = True
+            if self._spacing_job is not None:
+                self._spacing_job.cancel()
+            self._spacing_job = Job(
+                self._end_spacing, self.min_spacing(), False)
+            self._schedule_refresh(self._refresh_delay())
+        # keep the expiry of the new token across restarts
+        self._save()
+        self.notify_signals(tokens)
+
+    def _request_refresh(self, request=None):
+        """ Ask for a new token unless one was just asked for or received
+
+        A request coalesced into a refresh in flight gets its token once it
+        comes in. A request dropped right after a token came in gets that
+        token notified again, while it is still valid, if the request
+        failed with an older one.
+
+        Args:
+            request (Signal): signal of the request input asking for the
+                refresh, None for expiry or a retry
+        """
+        with self._lock:
+            if self._in_flight:
+                self._coalesced += 1
+                self.logger.debug("Token refresh request coalesced into "
+                                  "the refresh in flight")
+                return
+            token = refresh = None
+            if request is not None and self._spacing:
+                self._coalesced += 1
+                if self._token is not None and \
+                        self._expires_at > time() and \
+                        self._newer_token(request):
+                    token = self._token
+                    self._republished += 1
+                self.logger.debug(
+                    "Token refresh request dropped, a token was just "
+                    "received{}".format(
+                        ", notifying it again" if token is not None else ""))
+            else:
+                self._in_flight = True
+                self._attempts += 1
+                self._refreshes += 1
+                # ask again unless a token comes in meanwhile
+                self._schedule_refresh(self._retry_delay(), self._retry)
+                refresh = Signal({
+                    "refresh": "expiry" if request is None else "request"})
+        if token is not None:
+            self.notify_signals([Signal(token)])
+        if refresh is not None:
+            self.notify_signals([refresh], "refresh")
+
+    def _refresh_expiring(self):
+        with self._lock:
+            # the current token lasted, attempts start over
+            self._attempts = 0
+            self._request_refresh()
+
+    def _retry(self):
+        with self._lock:
+            self._in_flight = False
+            self._request_refresh()
+
+    def _end_spacing(self):
+        with self._lock:
+            self._spacing = False
+
+    def _retry_delay(self):
+        """ Seconds to wait for the current attempt, doubling each time """
+        return min(self.retry_interval().total_seconds() *
+                   2 ** max(self._attempts - 1, 0),
+                   self.max_backoff().total_seconds())
+
+    def _newer_token(self, request):
+        """ Find out if a request failed with another token than the last
+
+        Requests not telling which token they used are not answered, the
+        last token may be the one that failed.
+        """
+        used = self.used_token(request)
+        return used is not None and \
+            used != self.used_token(Signal(self._token))
+
+    def _refresh_delay(self):
+        """ Seconds until the current token should be refreshed """
+        if self._expires_at is None:
+            return 0
+        return self._expires_at - self.refresh_before().total_seconds() - \
+            time()
+
+    def _schedule_refresh(self, delay, target=None):
+        with self._lock:
+            if self._refresh_job is not None:
+                self._refresh_job.cancel()
+            self._refresh_job = Job(
+                target or self._refresh_expiring,
+                timedelta(seconds=max(delay, 0)), False)
@@ -0,0 +1,76 @@
+""" Benchmark asynchronous routing, thread per hop against a thread pool
+
+A burst of signal lists goes through a chain of blocks, the time for the
+whole burst to reach the last block and the mean latency of each list are
+reported.
+
+Run from the project root with:
+    python -m service_tests.benchmarks.bench_async_routing [lists]
+"""
+import sys
+from threading import Event
+from time import perf_counter
+
+from nio.router.context import RouterContext
+from nio.signal.base import Signal
+
+from ..router import ServiceTestRouter
+
+
+class _Block(object):
+
+    def __init__(self, name, router):
+        self._name = name
+        self._router = router
+
+    def name(self):
+        return self._name
+
+    def process_signals(self, signals, input_id=None):
+        self._router.notify_signals(self, signals, "__default_terminal_value")
+
+
+class _LastBlock(_Block):
+
+    def __init__(self, name, router, lists):
+        super().__init__(name, router)
+        self.latencies = []
+        self._lists = lists
+        self.done = Event()
+
+    def process_signals(self, signals, input_id=None):
+        self.latencies.append(perf_counter() - signals[0].sent)
+        if len(self.latencies) == self._lists:
+            self.done.set()
+
+
+def bench_async_routing(lists, workers, length=4):
+    router = ServiceTestRouter(
+        False, ServiceTestRouter.CopyStrategy.none, workers=workers,
+        queue_size=64)
+    names = ["block{}".format(i) for i in range(length)]
+    blocks = {name: _Block(name, router) for name in names[:-1]}
+    last = blocks[names[-1]] = _LastBlock(names[-1], router, lists)
+    execution = [{"name": name, "receivers": {"__default_terminal_value": [
+        {"name": receiver, "input": "__default_terminal_value"}]}}
+        for name, receiver in zip(names, names[1:])]
+    execution.append({"name": names[-1], "receivers": {}})
+    router.configure(RouterContext(execution=execution, blocks=blocks))
+    start = perf_counter()
+    for _ in range(lists):
+        router.notify_signals(blocks[names[0]], [Signal({
+            "sent": perf_counter()})], "__default_terminal_value")
+    last.done.wait(60)
+    elapsed = perf_counter() - start
+    router.shutdown()
+    print("{:>12}: {} lists in {:.3f}s ({:.0f} lists/s), "
+          "mean latency {:.2f}ms".format(
+              "{} workers".format(workers) if workers else "spawn",
+              lists, elapsed, lists / elapsed,
+              1000 * sum(last.latencies) / len(last.latencies)))
+
+
+if __name__ == "__main__":
+    lists = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for workers in (0, 1, 4):
+        bench_async_routing(lists, workers)
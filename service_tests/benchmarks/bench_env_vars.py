@@ -0,0 +1,76 @@
+""" Benchmark swapping environment variables out of block configs
+
+Run from the project root with:
+    python -m service_tests.benchmarks.bench_env_vars [variables]
+"""
+import json
+import os
+import re
+import sys
+from copy import deepcopy
+from time import perf_counter
+
+from ..env_vars import EnvVarReplacer
+
+
+def _replace_env_var(config, name, value):
+    """ Former substitution, the config is walked once per variable """
+    for property in config:
+        if isinstance(config[property], str):
+            config[property] = re.sub("\[\[" + name + "\]\]", str(value),
+                                      config[property])
+        elif isinstance(config[property], dict):
+            _replace_env_var(config[property], name, value)
+        elif isinstance(config[property], list):
+            new_list = []
+            for item in config[property]:
+                if isinstance(item, str):
+                    new_list.append(re.sub("\[\[" + name + "\]\]",
+                                           str(value), item))
+                elif isinstance(item, dict):
+                    new_list.append(_replace_env_var(item, name, value))
+            config[property] = new_list
+    return config
+
+
+def _block_configs():
+    folder = os.path.join(os.path.dirname(__file__), "..", "..", "etc",
+                          "blocks")
+    configs = []
+    for filename in sorted(os.listdir(folder)):
+        with open(os.path.join(folder, filename)) as f:
+            configs.append(json.load(f))
+    return configs
+
+
+def bench_per_variable(configs, env_vars):
+    configs = deepcopy(configs)
+    start = perf_counter()
+    for config in configs:
+        for name in env_vars:
+            config = _replace_env_var(config, name, env_vars[name])
+    return perf_counter() - start
+
+
+def bench_single_pass(configs, env_vars):
+    start = perf_counter()
+    replacer = EnvVarReplacer(env_vars)
+    for config in configs:
+        replacer.replace(config)
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 30
+    configs = _block_configs()
+    # variables the configs reference, then unused ones up to count
+    names = sorted(set(re.findall(r"\[\[([^\[\]]+)\]\]",
+                                  json.dumps(configs))))
+    names += ["VAR{}".format(i) for i in range(count - len(names))]
+    env_vars = {name: "value" for name in names}
+    print("{} block configs, {} variables".format(len(configs),
+                                                  len(env_vars)))
+    for name, bench in (("per variable", bench_per_variable),
+                        ("single pass", bench_single_pass)):
+        elapsed = min(bench(configs, env_vars) for _ in range(20))
+        print("{:>14}{:>10.2f} ms".format(name, elapsed * 1000))
@@ -0,0 +1,72 @@
+""" Benchmark router throughput by fan-out width and copy strategy
+
+Run from the project root with:
+    python -m service_tests.benchmarks.bench_fanout [signals per list]
+"""
+import os
+import sys
+from contextlib import redirect_stdout
+from time import perf_counter
+
+from nio.router.context import RouterContext
+from nio.signal.base import Signal
+
+from ..router import ServiceTestRouter
+
+
+class _Block(object):
+
+    def __init__(self, name):
+        self._name = name
+
+    def name(self):
+        return self._name
+
+    def process_signals(self, signals, input_id=None):
+        pass
+
+
+def _router(width, copy_strategy):
+    receivers = [_Block("receiver{}".format(i)) for i in range(width)]
+    router = ServiceTestRouter(True, copy_strategy)
+    execution = [{
+        "name": "sender",
+        "receivers": {"__default_terminal_value": [
+            {"name": block.name(), "input": "__default_terminal_value"}
+            for block in receivers]}
+    }]
+    execution.extend({"name": block.name(), "receivers": {}}
+                     for block in receivers)
+    blocks = {block.name(): block for block in receivers}
+    router.configure(RouterContext(execution=execution, blocks=blocks))
+    return router
+
+
+def bench_fanout(width, copy_strategy, size, duration=0.5):
+    router = _router(width, copy_strategy)
+    sender = _Block("sender")
+    # PlaybackStatus-like signals
+    signals = [Signal({
+        "device": {"id": str(i), "name": "Kitchen", "volume_percent": 50},
+        "item": {"name": "Song", "artists": [{"name": "Artist"}]},
+        "is_playing": True,
+    }) for i in range(size)]
+    notified = 0
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        start = perf_counter()
+        while perf_counter() - start < duration:
+            router.notify_signals(sender, signals, "__default_terminal_value")
+            notified += size
+        elapsed = perf_counter() - start
+    return notified / elapsed
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    print("signals/s by fan-out width, {} signals per list".format(size))
+    print("{:>14}".format("") +
+          "".join("{:>10}".format(width) for width in (1, 3, 8)))
+    for copy_strategy in ServiceTestRouter.CopyStrategy:
+        print("{:>14}".format(copy_strategy.name) + "".join(
+            "{:>10.0f}".format(bench_fanout(width, copy_strategy, size))
+            for width in (1, 3, 8)))
@@ -0,0 +1,136 @@
+""" Benchmark topic schema validation, per signal versus compiled validators
+
+Run from the project root with:
+    python -m service_tests.benchmarks.bench_schema [signals per topic]
+"""
+import json
+import os
+import sys
+import tempfile
+from time import perf_counter
+
+import jsonschema
+from nio.signal.base import Signal
+
+from ..fixture_cache import FixtureCache
+
+
+_AUTH = {
+    "type": "object",
+    "properties": {
+        "access_token": {"type": "string", "minLength": 1},
+        "token_type": {"type": "string"},
+        "expires_in": {"type": "integer", "minimum": 0},
+        "scope": {"type": "string"},
+    },
+    "required": ["access_token", "expires_in"],
+}
+# schema of the topics the spotify monitor services publish to
+SCHEMA = {
+    "bad_auth": {
+        "type": "object",
+        "properties": {
+            "status_code": {"type": "integer"},
+            "error": {"type": "object"},
+        },
+        "required": ["status_code"],
+    },
+    "handle_blink": {
+        "type": "object",
+        "properties": {
+            "device": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "name": {"type": "string"},
+                    "volume_percent": {"type": "integer",
+                                       "minimum": 0, "maximum": 100},
+                },
+                "required": ["id"],
+            },
+            "item": {
+                "type": "object",
+                "properties": {
+                    "name": {"type": "string"},
+                    "artists": {"type": "array", "items": {
+                        "type": "object",
+                        "properties": {"name": {"type": "string"}},
+                    }},
+                },
+            },
+            "is_playing": {"type": "boolean"},
+        },
+        "required": ["is_playing"],
+    },
+    "new_auth": _AUTH,
+    "auth_request": {
+        "type": "object",
+        "properties": {"refresh_token": {"type": "string", "minLength": 1}},
+        "required": ["refresh_token"],
+    },
+}
+
+
+def _signals(topic, size):
+    if topic == "bad_auth":
+        return [Signal({"status_code": 401,
+                        "error": {"message": "The access token expired"}})
+                for _ in range(size)]
+    if topic == "handle_blink":
+        return [Signal({
+            "device": {"id": str(i), "name": "Kitchen",
+                       "volume_percent": 50},
+            "item": {"name": "Song", "artists": [{"name": "Artist"}]},
+            "is_playing": True,
+        }) for i in range(size)]
+    if topic == "new_auth":
+        return [Signal({"access_token": "token{}".format(i),
+                        "token_type": "Bearer", "expires_in": 3600,
+                        "scope": "user-read-playback-state"})
+                for i in range(size)]
+    return [Signal({"refresh_token": "refresh{}".format(i)})
+            for i in range(size)]
+
+
+def bench_validate(signals_by_topic):
+    """ Former schema_validate, the schema is checked for every signal """
+    start = perf_counter()
+    for topic, signals in signals_by_topic.items():
+        for signal in signals:
+            jsonschema.validate(signal.to_dict(), SCHEMA[topic])
+    return perf_counter() - start
+
+
+def bench_compiled(signals_by_topic, validators, sample_rate=1):
+    """ Compiled validators, every sample_rate-th signal validated """
+    start = perf_counter()
+    for topic, signals in signals_by_topic.items():
+        validator = validators[topic]
+        for count, signal in enumerate(signals):
+            if count % sample_rate:
+                continue
+            error = jsonschema.exceptions.best_match(
+                validator.iter_errors(signal.to_dict()))
+            assert error is None
+    return perf_counter() - start
+
+
+if __name__ == "__main__":
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    signals_by_topic = {topic: _signals(topic, size) for topic in SCHEMA}
+    with tempfile.TemporaryDirectory() as folder:
+        file_path = os.path.join(folder, "topic_schema.json")
+        with open(file_path, "w") as f:
+            json.dump(SCHEMA, f)
+        start = perf_counter()
+        validators = FixtureCache().load_validators(file_path)
+        compile_time = perf_counter() - start
+    total = size * len(SCHEMA)
+    print("{} signals over {} topics, validators compiled in {:.4f}s"
+          .format(total, len(SCHEMA), compile_time))
+    for name, elapsed in (
+            ("per signal", bench_validate(signals_by_topic)),
+            ("compiled", bench_compiled(signals_by_topic, validators)),
+            ("sampled 1/10",
+             bench_compiled(signals_by_topic, validators, 10))):
+        print("{:>14}{:>12.0f} signals/s".format(name, total / elapsed))
@@ -0,0 +1,55 @@
+""" Benchmark the startup of a suite of service tests
+
+Builds a suite of 50 service tests for a service under etc/services and
+times it with the fixture cache shared across tests and with the cache
+cleared before every test, which is what loading used to cost.
+
+Run from the project root with:
+    python -m service_tests.benchmarks.bench_setup <service_name> [tests]
+"""
+import os
+import sys
+import unittest
+from time import perf_counter
+
+from ..service_test_case import NioServiceTestCase
+
+
+def _suite(service_name, tests):
+    class BenchServiceTest(NioServiceTestCase):
+
+        def test_setup(self):
+            pass
+
+    BenchServiceTest.service_name = service_name
+    BenchServiceTest.__module__ = "tests.bench_setup"
+    return unittest.TestSuite(
+        BenchServiceTest("test_setup") for _ in range(tests))
+
+
+def bench_setup(service_name, tests, shared):
+    NioServiceTestCase.fixtures.clear()
+    suite = _suite(service_name, tests)
+    if not shared:
+        for test in suite:
+            setup = test.setUp
+
+            def clear_then_setup(setup=setup):
+                NioServiceTestCase.fixtures.clear()
+                setup()
+
+            test.setUp = clear_then_setup
+    with open(os.devnull, "w") as devnull:
+        start = perf_counter()
+        result = unittest.TextTestRunner(stream=devnull).run(suite)
+        elapsed = perf_counter() - start
+    print("{:>8}: {} tests in {:.3f}s ({} failures, {} errors)".format(
+        "shared" if shared else "cleared", tests, elapsed,
+        len(result.failures), len(result.errors)))
+
+
+if __name__ == "__main__":
+    service_name = sys.argv[1]
+    tests = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    for shared in (False, True):
+        bench_setup(service_name, tests, shared)
@@ -0,0 +1,245 @@
+import json
+from collections import Counter, defaultdict, deque
+from enum import Enum
+from threading import Lock
+
+
+# tags lists apart from tuples in frozen values, as they never compare equal
+_LIST = object()
+
+
+def _freeze(value):
+    """ Hashable form of a value that compares equal when value does
+
+    Raises:
+        TypeError: when value holds something unhashable that can not be
+            frozen
+    """
+    if isinstance(value, dict):
+        return frozenset((key, _freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return _LIST, tuple(_freeze(item) for item in value)
+    if isinstance(value, tuple):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(value)
+    hash(value)
+    return value
+
+
+class SignalIndex(object):
+
+    """ Signal dicts indexed for exact and partial match lookups
+
+    Signals are indexed by a hashable form of their whole dict, and by each
+    of their attributes for partial matches. Signals holding values that
+    can not be hashed are kept aside and scanned.
+    """
+
+    def __init__(self):
+        # occurrences by frozen signal
+        self._signals = Counter()
+        # occurrences of frozen signals by attribute name and frozen value
+        self._attributes = defaultdict(Counter)
+        self._unindexed = []
+
+    def add(self, signal_dict):
+        """ Index a signal dict
+
+        Returns:
+            key to remove the signal with
+        """
+        try:
+            key = _freeze(signal_dict)
+        except TypeError:
+            self._unindexed.append(signal_dict)
+            return signal_dict
+        self._signals[key] += 1
+        for attribute in key:
+            self._attributes[attribute][key] += 1
+        return key
+
+    def remove(self, key):
+        if isinstance(key, dict):
+            for index, signal_dict in enumerate(self._unindexed):
+                if signal_dict is key:
+                    del self._unindexed[index]
+                    return
+            return
+        self._decrement(self._signals, key)
+        for attribute in key:
+            self._decrement(self._attributes[attribute], key)
+            if not self._attributes[attribute]:
+                del self._attributes[attribute]
+
+    @staticmethod
+    def _decrement(counter, key):
+        counter[key] -= 1
+        if counter[key] <= 0:
+            del counter[key]
+
+    def contains(self, signal_dict, partial=False):
+        """ Whether a signal matching signal_dict was indexed
+
+        Args:
+            signal_dict (dict): attributes to look for
+            partial (bool): match signals holding at least these attributes
+                rather than exactly these
+        """
+        if any(self._matches(indexed, signal_dict, partial)
+               for indexed in self._unindexed):
+            return True
+        try:
+            key = _freeze(signal_dict)
+        except TypeError:
+            # unhashable values are only found in unindexed signals
+            return False
+        if not partial:
+            return key in self._signals
+        if not key:
+            return bool(self._signals)
+        candidates = [self._attributes.get(attribute) for attribute in key]
+        if not all(candidates):
+            return False
+        candidates.sort(key=len)
+        return any(all(signal in others for others in candidates[1:])
+                   for signal in candidates[0])
+
+    @staticmethod
+    def _matches(indexed, signal_dict, partial):
+        if not partial:
+            return indexed == signal_dict
+        return all(name in indexed and indexed[name] == value
+                   for name, value in signal_dict.items())
+
+
+class SignalCapture(object):
+
+    """ Signals captured for assertions
+
+    Depending on its mode a capture keeps every signal (full), only the
+    most recent ones (ring), none (count) or writes them to a file as json
+    lines (stream). `count` is always the number of signals captured so
+    far, which is what counting assertions and waits rely on.
+
+    Retained signals can be iterated and indexed like a list, `contains`
+    tells whether one of them matches a signal dict. Indexed captures
+    answer it without scanning, in every mode: ring captures forget
+    signals as they drop them, other modes never do, so an indexed count
+    or stream capture holds every distinct signal it saw.
+    """
+
+    class Mode(Enum):
+        # keep every signal
+        full = 1
+        # keep the most recent signals
+        ring = 2
+        # only count signals
+        count = 3
+        # write signals to a file
+        stream = 4
+
+    def __init__(self, mode=Mode.full, size=1000, filename=None,
+                 index=False):
+        """ Create a capture
+
+        Args:
+            mode (Mode): what to do with captured signals
+            size (int): signals kept in ring mode
+            filename (str): file signals are written to in stream mode,
+                replacing its contents
+            index (bool): index captured signals for `contains`, signals
+                not retained by the capture mode are only found when indexed
+        """
+        self.mode = mode
+        self.count = 0
+        self._index = SignalIndex() if index else None
+        # index keys of signals in the ring, dropped along with them
+        self._index_keys = deque() \
+            if index and mode == SignalCapture.Mode.ring else None
+        self._lock = Lock()
+        self._file = None
+        if mode == SignalCapture.Mode.full:
+            self._signals = []
+        elif mode == SignalCapture.Mode.ring:
+            self._signals = deque(maxlen=size)
+        else:
+            self._signals = ()
+            if mode == SignalCapture.Mode.stream:
+                # signals of a previous run are not part of this one
+                self._file = open(filename, "w")
+
+    @property
+    def retains(self):
+        """ Whether captured signals can be looked at """
+        return self.mode in (SignalCapture.Mode.full,
+                             SignalCapture.Mode.ring)
+
+    @property
+    def indexed(self):
+        return self._index is not None
+
+    def extend(self, signals):
+        with self._lock:
+            if self._index is not None:
+                self._index_signals(signals)
+            if self.retains:
+                self._signals.extend(signals)
+            elif self._file is not None:
+                for signal in signals:
+                    self._file.write(json.dumps(
+                        signal.to_dict(), default=str, sort_keys=True))
+                    self._file.write("\n")
+            self.count += len(signals)
+
+    def _index_signals(self, signals):
+        for signal in signals:
+            key = self._index.add(signal.to_dict())
+            if self._index_keys is not None:
+                if len(self._index_keys) == self._signals.maxlen:
+                    self._index.remove(self._index_keys.popleft())
+                self._index_keys.append(key)
+
+    def contains(self, signal_dict, partial=False):
+        """ Whether a signal matching signal_dict was captured
+
+        Args:
+            signal_dict (dict): attributes to look for
+            partial (bool): match signals holding at least these attributes
+                rather than exactly these
+        """
+        with self._lock:
+            if self._index is not None:
+                return self._index.contains(signal_dict, partial)
+            signals = list(self._signals)
+        return any(SignalIndex._matches(signal.to_dict(), signal_dict, partial)
+                   for signal in signals)
+
+    def append(self, signal):
+        self.extend([signal])
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self):
+        return len(self._signals)
+
+    def __iter__(self):
+        return iter(list(self._signals))
+
+    def __getitem__(self, index):
+        if isinstance(index, slice) or self.mode != SignalCapture.Mode.full:
+            return list(self._signals)[index]
+        return self._signals[index]
+
+    def __eq__(self, other):
+        if isinstance(other, SignalCapture):
+            other = list(other)
+        return list(self._signals) == other
+
+    def __repr__(self):
+        return "SignalCapture({}, {} captured)".format(
+            self.mode.name, self.count)
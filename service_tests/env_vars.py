@@ -0,0 +1,80 @@
+import re
+
+
+# an environment variable reference in a config value, [[NAME]]
+_ENV_VAR = re.compile(r"\[\[([^\[\]]+)\]\]")
+
+
+class EnvVarReplacer(object):
+
+    """ Swaps environment variable references out of configs
+
+    Every string is substituted in a single pass, a variable value is never
+    searched for references itself. Configs are not altered, dicts and
+    lists are only copied when something in them is replaced and replaced
+    strings are memoized.
+
+    References to variables that are not set are left in place and their
+    names are kept in `unknown`.
+    """
+
+    def __init__(self, env_vars):
+        """ Create a replacer
+
+        Args:
+            env_vars (dict): variable values by name
+        """
+        self._env_vars = {name: str(value)
+                          for name, value in env_vars.items()}
+        self._strings = {}
+        self.unknown = set()
+
+    def replace(self, config):
+        """ Config with environment variables swapped out
+
+        Returns:
+            the config itself when it has no reference to a known variable,
+            a copy with the references replaced otherwise
+        """
+        if isinstance(config, str):
+            return self._replace_string(config)
+        if isinstance(config, dict):
+            replaced = None
+            for key, value in config.items():
+                new_value = self.replace(value)
+                if new_value is not value:
+                    if replaced is None:
+                        replaced = dict(config)
+                    replaced[key] = new_value
+            return config if replaced is None else replaced
+        if isinstance(config, list):
+            replaced = None
+            for index, value in enumerate(config):
+                new_value = self.replace(value)
+                if new_value is not value:
+                    if replaced is None:
+                        replaced = list(config)
+                    replaced[index] = new_value
+            return config if replaced is None else replaced
+        return config
+
+    def _replace_string(self, value):
+        replaced = self._strings.get(value)
+        if replaced is None:
+            if "[[" in value:
+                replaced = _ENV_VAR.sub(self._lookup, value)
+                if replaced == value:
+                    # keep the original so that containers are not copied
+                    replaced = value
+            else:
+                replaced = value
+            self._strings[value] = replaced
+        return replaced
+
+    def _lookup(self, match):
+        name = match.group(1)
+        try:
+            return self._env_vars[name]
+        except KeyError:
+            self.unknown.add(name)
+            return match.group(0)
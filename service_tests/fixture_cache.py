@@ -0,0 +1,118 @@
+import json
+import os
+from copy import deepcopy
+from threading import RLock
+
+import jsonschema
+
+from .modules.module_persistence_file.cache import FileCache
+from .modules.module_persistence_file.collection import LazyCollection
+
+
+def _compile_validator(schema):
+    """ Validator for a json schema, the schema error if it is invalid """
+    try:
+        validator_class = jsonschema.validators.validator_for(schema)
+        validator_class.check_schema(schema)
+        return validator_class(schema)
+    except jsonschema.exceptions.SchemaError as e:
+        return e
+
+
+class FixtureCache(object):
+
+    """ Process-wide cache of what service tests load for every test
+
+    Discovered block classes, parsed block and service configs and the
+    topic schema, along with a validator compiled for each of its topics,
+    are kept across test methods and classes. Configs and the schema are
+    keyed on the modification time of the file they come from and reloaded
+    when it changes. Callers get copies of cached configs so they are free
+    to alter them.
+
+    Block classes are discovered once per package for the whole process,
+    modules already imported are not imported again when their files
+    change, call `clear` and reload them to pick up edited blocks.
+    """
+
+    def __init__(self):
+        self._lock = RLock()
+        self._block_classes = {}
+        self._files = {}
+        self._validators = {}
+
+    def clear(self):
+        with self._lock:
+            self._block_classes = {}
+            self._files = {}
+            self._validators = {}
+
+    def block_classes(self, package, discover):
+        """ Block classes found in a package
+
+        Args:
+            package (str): package holding the blocks, e.g. 'blocks'
+            discover (callable): discovers the classes in package when they
+                are not cached
+
+        Returns:
+            list of block classes
+        """
+        with self._lock:
+            if package not in self._block_classes:
+                self._block_classes[package] = discover(package)
+            return self._block_classes[package]
+
+    def load_json(self, filename):
+        """ Parsed contents of a json file
+
+        Raises:
+            the error found parsing the file, which is not cached
+
+        Returns:
+            a copy of the file contents, None if the file does not exist
+        """
+        signature = FileCache.signature(filename)
+        if signature is None:
+            return None
+        with self._lock:
+            entry = self._files.get(filename)
+        if entry is None or entry[0] != signature:
+            with open(filename, "r") as f:
+                entry = (signature, json.load(f))
+            with self._lock:
+                self._files[filename] = entry
+        return deepcopy(entry[1])
+
+    def load_validators(self, filename):
+        """ Validators of a topic schema file
+
+        Validators are shared, they are not copied.
+
+        Raises:
+            the error found parsing the file
+
+        Returns:
+            dict of validators by topic, topics whose schema is invalid map
+            to the schema error instead
+        """
+        signature = FileCache.signature(filename)
+        with self._lock:
+            entry = self._validators.get(filename)
+        if entry is None or entry[0] != signature:
+            schema = self.load_json(filename) or {}
+            entry = (signature, {topic: _compile_validator(topic_schema)
+                                 for topic, topic_schema in schema.items()})
+            with self._lock:
+                self._validators[filename] = entry
+        return entry[1]
+
+    def load_collection(self, folder, extension=".cfg"):
+        """ Json files in a folder by name, parsed on first access """
+        pending = {}
+        if os.path.isdir(folder):
+            for filename in os.listdir(folder):
+                name, file_extension = os.path.splitext(filename)
+                if file_extension == extension:
+                    pending[name] = os.path.join(folder, filename)
+        return LazyCollection(self.load_json, pending)
@@ -0,0 +1,55 @@
+""" Benchmark loads per second with and without the file cache
+
+A block config of the project is saved in each format and loaded over and
+over, reading and decoding the file every time with the cache disabled and
+decoding the cached contents when it is enabled. The best of a few rounds
+is reported.
+
+Run from the project root with:
+    python -m service_tests.modules.module_persistence_file.benchmarks.\
+bench_loads [loads]
+"""
+import json
+import shutil
+import sys
+from tempfile import mkdtemp
+from time import perf_counter
+
+from nio.modules.context import ModuleContext
+
+from ..persistence import Persistence
+
+CONFIG = "etc/blocks/PlaybackStatus.cfg"
+
+
+def bench_loads(format, cache_size, loads, rounds=5):
+    with open(CONFIG) as f:
+        item = json.load(f)
+    folder = mkdtemp()
+    context = ModuleContext()
+    context.root_folder = folder
+    context.root_id = ''
+    context.format = format.value
+    context.cache_size = cache_size
+    Persistence.configure(context)
+    persistence = Persistence()
+    try:
+        persistence.save(item, "PlaybackStatus", "blocks")
+        elapsed = []
+        for _ in range(rounds):
+            start = perf_counter()
+            for _ in range(loads):
+                persistence.load("PlaybackStatus", "blocks")
+            elapsed.append(perf_counter() - start)
+    finally:
+        shutil.rmtree(folder)
+    print("{:>6} {:>8}: {:.1f} us/load".format(
+        format.name, "cached" if cache_size else "uncached",
+        min(elapsed) / loads * 1e6))
+
+
+if __name__ == "__main__":
+    loads = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    for format in Persistence.Format:
+        for cache_size in (0, 128):
+            bench_loads(format, cache_size, loads)
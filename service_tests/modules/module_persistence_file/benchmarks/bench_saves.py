@@ -0,0 +1,54 @@
+""" Benchmark saves per second for each durability mode
+
+Every fsync is delayed to mimic SD card storage. Files are written to
+/dev/shm when available so that the injected latency dominates.
+
+Run from the project root with:
+    python -m service_tests.modules.module_persistence_file.benchmarks.\
+bench_saves [fsync latency ms]
+"""
+import os
+import shutil
+import sys
+from tempfile import mkdtemp
+from time import perf_counter, sleep
+from unittest.mock import patch
+
+from nio.modules.context import ModuleContext
+
+from ..persistence import Persistence
+
+
+def bench_saves(durability, latency, saves=200):
+    folder = mkdtemp(dir="/dev/shm" if os.path.isdir("/dev/shm") else None)
+    context = ModuleContext()
+    context.root_folder = folder
+    context.root_id = ''
+    context.format = Persistence.Format.pickle.value
+    context.durability = durability.value
+    Persistence.configure(context)
+    persistence = Persistence()
+    fsync = os.fsync
+
+    def slow_fsync(fd):
+        sleep(latency)
+        fsync(fd)
+
+    try:
+        with patch("os.fsync", slow_fsync):
+            start = perf_counter()
+            for i in range(saves):
+                # token-like state saved by a handful of blocks
+                persistence.save({"access_token": str(i)},
+                                 str(i % 10), "tokens")
+            Persistence.flush()
+            elapsed = perf_counter() - start
+    finally:
+        shutil.rmtree(folder)
+    print("{:>6}: {:.0f} saves/s".format(durability.name, saves / elapsed))
+
+
+if __name__ == "__main__":
+    latency = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.005
+    for durability in Persistence.Durability:
+        bench_saves(durability, latency)
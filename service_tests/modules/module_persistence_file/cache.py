@@ -0,0 +1,134 @@
+import os
+from collections import OrderedDict
+from enum import Enum
+from threading import RLock
+
+
+class FileCache(object):
+
+    """ In-process cache of persistence file contents
+
+    Entries hold the encoded contents of a file, keyed by filename, and
+    remember the modification time and size of the file they were read
+    from or written to, an entry is only used while the file on disk still
+    matches it. Contents are decoded on every hit, which hands out a new
+    item each time and is cheaper than copying a decoded one.
+
+    Entries saved with write-behind are dirty, they are authoritative
+    until flushed to disk and are never evicted before being written.
+    """
+
+    class Eviction(Enum):
+        # evict least recently used entries first
+        lru = 1
+        # evict oldest entries first, regardless of use
+        fifo = 2
+
+    def __init__(self, size=128, eviction=Eviction.lru.value):
+        self._size = size
+        self._eviction = eviction
+        self._entries = OrderedDict()
+        self._dirty = dict()
+        self._lock = RLock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, filename):
+        """ Get the cached contents of a file
+
+        Returns:
+            tuple (found, data), data being the encoded file contents
+        """
+        with self._lock:
+            if filename in self._dirty:
+                self.hits += 1
+                return True, self._dirty[filename]
+            entry = self._entries.get(filename)
+            if entry is not None and entry[0] == self.signature(filename):
+                self.hits += 1
+                if self._eviction == FileCache.Eviction.lru.value:
+                    self._entries.move_to_end(filename)
+                return True, entry[1]
+            self.misses += 1
+            return False, None
+
+    def put(self, filename, data, signature):
+        """ Cache the contents just read from or written to a file
+
+        Args:
+            filename (str): file the contents belong to
+            data (bytes): encoded file contents
+            signature: file signature taken before reading the file or
+                after writing it
+        """
+        if not self._size or signature is None:
+            return
+        with self._lock:
+            self._entries[filename] = (signature, data)
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self._size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def put_dirty(self, filename, data):
+        """ Cache contents to be written to their file on the next flush """
+        with self._lock:
+            self._entries.pop(filename, None)
+            self._dirty[filename] = data
+
+    def dirty_items(self, folder):
+        """ Dirty contents whose file is directly under folder """
+        with self._lock:
+            return {filename: data
+                    for filename, data in self._dirty.items()
+                    if os.path.dirname(filename) == folder}
+
+    def dirty(self):
+        """ Every dirty file contents by filename """
+        with self._lock:
+            return dict(self._dirty)
+
+    def mark_clean(self, filename, data, signature):
+        """ Turn dirty contents that were just written into a regular entry
+
+        Nothing is done if the file was saved again while being written.
+        """
+        with self._lock:
+            if self._dirty.get(filename) is not data:
+                return
+            del self._dirty[filename]
+            self.put(filename, data, signature)
+
+    def discard(self, filename):
+        with self._lock:
+            self._entries.pop(filename, None)
+            self._dirty.pop(filename, None)
+
+    def discard_folder(self, folder):
+        with self._lock:
+            for filename in list(self._entries):
+                if os.path.dirname(filename) == folder:
+                    del self._entries[filename]
+            for filename in list(self._dirty):
+                if os.path.dirname(filename) == folder:
+                    del self._dirty[filename]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "pending_writes": len(self._dirty),
+            }
+
+    @staticmethod
+    def signature(filename):
+        """ Modification time and size of a file, None if missing """
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
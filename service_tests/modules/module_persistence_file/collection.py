@@ -0,0 +1,135 @@
+from collections.abc import ItemsView, KeysView, ValuesView
+from concurrent.futures import Future
+from copy import deepcopy
+from threading import RLock
+
+
+class LazyCollection(dict):
+
+    """ Collection whose items are loaded on first access
+
+    Behaves as the dict load_collection used to return, but items are only
+    read from their file when accessed. Pending items are either a filename
+    handed to `loader` on access or a Future already loading it.
+
+    Operations that need every value (comparison, copy, repr...) load all
+    pending items first. Copies and pickles are plain dicts, they share no
+    loading state with the collection.
+    """
+
+    def __init__(self, loader, pending, items=None):
+        """ Create a collection
+
+        Args:
+            loader (callable): loads an item given its filename
+            pending (dict): filename or Future by item name
+            items (dict): items already loaded, by name
+        """
+        super().__init__(items or {})
+        self._loader = loader
+        self._pending = {name: value for name, value in pending.items()
+                         if not dict.__contains__(self, name)}
+        self._lock = RLock()
+
+    def _load(self, name):
+        with self._lock:
+            pending = self._pending.get(name)
+            if pending is not None:
+                if isinstance(pending, Future):
+                    item = pending.result()
+                else:
+                    item = self._loader(pending)
+                dict.__setitem__(self, name, item)
+                del self._pending[name]
+        return dict.__getitem__(self, name)
+
+    def _load_all(self):
+        for name in list(self._pending):
+            self._load(name)
+
+    def __missing__(self, key):
+        if key in self._pending:
+            return self._load(key)
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return dict.__contains__(self, key) or key in self._pending
+
+    def __len__(self):
+        return dict.__len__(self) + len(self._pending)
+
+    def __iter__(self):
+        return iter(list(dict.keys(self)) + list(self._pending))
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            self._pending.pop(key, None)
+            dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        with self._lock:
+            if self._pending.pop(key, None) is None:
+                dict.__delitem__(self, key)
+
+    def __eq__(self, other):
+        self._load_all()
+        return dict.__eq__(self, other)
+
+    def __ne__(self, other):
+        self._load_all()
+        return dict.__ne__(self, other)
+
+    def __repr__(self):
+        self._load_all()
+        return dict.__repr__(self)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return KeysView(self)
+
+    def items(self):
+        return ItemsView(self)
+
+    def values(self):
+        return ValuesView(self)
+
+    def copy(self):
+        self._load_all()
+        return dict(dict.items(self))
+
+    def __copy__(self):
+        return self.copy()
+
+    def __deepcopy__(self, memo):
+        return deepcopy(self.copy(), memo)
+
+    def __reduce__(self):
+        return dict, (self.copy(),)
+
+    def pop(self, key, *args):
+        if key in self._pending:
+            self._load(key)
+        return dict.pop(self, key, *args)
+
+    def popitem(self):
+        self._load_all()
+        return dict.popitem(self)
+
+    def setdefault(self, key, default=None):
+        if key in self._pending:
+            return self._load(key)
+        return dict.setdefault(self, key, default)
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+            dict.clear(self)
@@ -17,6 +17,9 @@ class FilePersistenceModule(PersistenceModule):
         self.proxy_persistence_class(Persistence)
 
     def finalize(self):
+        # write items held back by write-behind
+        Persistence.flush()
+        Persistence.shutdown()
         super().finalize()
 
     def prepare_core_context(self):
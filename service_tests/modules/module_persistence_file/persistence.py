@@ -1,9 +1,24 @@
+import json
 import os
+import pickle as unsafepickle
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from tempfile import mkstemp
+from threading import Lock, Timer
+
+from safepickle import safepickle as pickle
 
-from nio.util.codec import load_pickle, load_json, save_pickle, save_json
 from nio.util.logging import get_nio_logger
 
+from .cache import FileCache
+from .collection import LazyCollection
+
+
+def read_file(path):
+    """ Read the encoded contents of a file """
+    with open(path, "rb") as f:
+        return f.read()
+
 
 class Persistence(object):
 
@@ -21,15 +36,55 @@ class Persistence(object):
     When item does not belong to a collection, its filename will be then:
     [root_folder]/[root_id]_[id] if root_id is not empty, otherwise:
     [root_folder]/[id]
+
+    File contents are kept in an in-process cache (see FileCache) that is
+    invalidated whenever a file changes on disk, they are decoded again on
+    every load. With write-behind enabled
+    saved items are only written to disk when the module is finalized or
+    `flush` is called.
+
+    Files are written atomically: items go to a temporary file in the same
+    folder which is synced and renamed over the target, so a crash leaves
+    either the previous or the new contents. With group commit durability
+    saves made within `commit_window` seconds are written together, each
+    temporary file is still synced on its own but each folder is synced
+    once for all of them.
+
+    Collections are loaded lazily, each item is read the first time it is
+    accessed. With prefetch loading every item starts loading in a thread
+    pool as soon as the collection is requested.
     """
 
     class Format(Enum):
         pickle = 1
         json = 2
 
+    class Durability(Enum):
+        # every save is synced to disk before returning
+        atomic = 1
+        # saves are synced to disk together after a short window
+        group = 2
+
+    class Loading(Enum):
+        # collection items are loaded on first access
+        lazy = 1
+        # collection items are loaded in a thread pool right away
+        prefetch = 2
+
     _root_id = ''
     _root_folder = None
     _format = Format.pickle
+    _cache = FileCache()
+    _write_behind = False
+    _durability = Durability.atomic.value
+    _commit_window = 0.05
+    _commit_timer = None
+    _commit_lock = Lock()
+    _flush_lock = Lock()
+    _loading = Loading.lazy.value
+    _prefetch_workers = 4
+    _prefetch_executor = None
+    _prefetch_lock = Lock()
 
     def __init__(self):
         """ Constructor for the Persistence module
@@ -46,6 +101,10 @@ class Persistence(object):
         implementation is proxied, since it makes use of cls which will always
         be the implementation.
         """
+        # items saved with write-behind are only held in the cache, write
+        # them with the current settings before replacing it
+        if cls._cache.dirty():
+            cls.flush()
         cls._root_id = context.root_id
         cls._root_folder = context.root_folder
         try:
@@ -54,6 +113,64 @@ class Persistence(object):
             # If the persistence target directory already exists, move on
             pass
         cls._format = context.format
+        # cache settings are optional in the context
+        cls._cache = FileCache(
+            getattr(context, "cache_size", 128),
+            getattr(context, "cache_eviction",
+                    FileCache.Eviction.lru.value))
+        cls._write_behind = getattr(context, "write_behind", False)
+        cls._durability = getattr(
+            context, "durability", Persistence.Durability.atomic.value)
+        cls._commit_window = getattr(context, "commit_window", 0.05)
+        cls._loading = getattr(
+            context, "loading", Persistence.Loading.lazy.value)
+        cls._prefetch_workers = getattr(context, "prefetch_workers", 4)
+
+    @classmethod
+    def shutdown(cls):
+        """ Stop the prefetch thread pool, if any """
+        with cls._prefetch_lock:
+            if cls._prefetch_executor is not None:
+                cls._prefetch_executor.shutdown()
+                cls._prefetch_executor = None
+
+    @classmethod
+    def flush(cls):
+        """ Write every item saved with write-behind or group commit
+
+        Items are written and synced to disk one by one and then every
+        folder involved is synced once. Removals wait for the flush so that
+        removed items are not written back.
+        """
+        with cls._commit_lock:
+            if cls._commit_timer is not None:
+                cls._commit_timer.cancel()
+                cls._commit_timer = None
+        with cls._flush_lock:
+            persistence = cls()
+            written = []
+            for filename, data in cls._cache.dirty().items():
+                if persistence._write_file(data, filename):
+                    written.append((filename, data))
+            persistence._sync_folders(
+                {os.path.dirname(filename) for filename, _ in written})
+            for filename, data in written:
+                cls._cache.mark_clean(
+                    filename, data, FileCache.signature(filename))
+
+    @classmethod
+    def _schedule_commit(cls):
+        """ Make sure a group commit is pending """
+        with cls._commit_lock:
+            if cls._commit_timer is None:
+                cls._commit_timer = Timer(cls._commit_window, cls.flush)
+                cls._commit_timer.daemon = True
+                cls._commit_timer.start()
+
+    @classmethod
+    def cache_stats(cls):
+        """ Provide cache hit/miss counters """
+        return cls._cache.stats()
 
     def load(self, id, collection=None, default=None):
         """ Load an item from the persistence store.
@@ -82,9 +199,10 @@ class Persistence(object):
             default: the value to return if the collection does not exist
 
         Returns:
-            items: The items associated with given collection
+            items: The items associated with given collection, loaded on
+                first access
         """
-        result = {}
+        pending = {}
         collection_folder = self._get_collection_folder(collection)
         extension = self._get_file_extension()
         if os.path.isdir(collection_folder):
@@ -92,10 +210,31 @@ class Persistence(object):
                 if os.path.splitext(filename)[1] != extension:
                     continue
                 name = os.path.splitext(os.path.basename(filename))[0]
-                result[name] = self._load_file(
-                    os.path.join(collection_folder, filename))
+                pending[name] = os.path.join(collection_folder, filename)
+        # include items saved with write-behind and not yet on disk
+        items = {}
+        for filename, data in \
+                self._cache.dirty_items(collection_folder).items():
+            name, file_extension = \
+                os.path.splitext(os.path.basename(filename))
+            if file_extension == extension:
+                items[name] = self._decode(data)
+        if self._loading == Persistence.Loading.prefetch.value:
+            executor = self._get_prefetch_executor()
+            pending = {name: executor.submit(self._load_file, filename)
+                       for name, filename in pending.items()
+                       if name not in items}
+        result = LazyCollection(self._load_file, pending, items)
         return result or default
 
+    @classmethod
+    def _get_prefetch_executor(cls):
+        with cls._prefetch_lock:
+            if cls._prefetch_executor is None:
+                cls._prefetch_executor = ThreadPoolExecutor(
+                    cls._prefetch_workers)
+            return cls._prefetch_executor
+
     def save(self, item, id, collection=None):
         """ Save the item to the persistence store.
 
@@ -136,10 +275,11 @@ class Persistence(object):
         """
         if collection is not None:
             filename = self._get_collection_item_filename(id, collection)
-            if os.path.isfile(filename):
-                os.remove(filename)
         else:
             filename = self._get_item_filename(id)
+        # wait for a commit in progress so it can not write the item back
+        with self._flush_lock:
+            self._cache.discard(filename)
             if os.path.isfile(filename):
                 os.remove(filename)
 
@@ -150,12 +290,15 @@ class Persistence(object):
             collection (str): Specifies the collection to remove
         """
         collection_folder = self._get_collection_folder(collection)
-        if os.path.isdir(collection_folder):
-            extension = self._get_file_extension()
-            for filename in os.listdir(collection_folder):
-                if os.path.splitext(filename)[1] != extension:
-                    continue
-                os.remove(os.path.join(collection_folder, filename))
+        # wait for a commit in progress so it can not write items back
+        with self._flush_lock:
+            self._cache.discard_folder(collection_folder)
+            if os.path.isdir(collection_folder):
+                extension = self._get_file_extension()
+                for filename in os.listdir(collection_folder):
+                    if os.path.splitext(filename)[1] != extension:
+                        continue
+                    os.remove(os.path.join(collection_folder, filename))
 
     def _get_collection_folder(self, collection, ensure_dirs=False):
         """ Find out folder location for given collection
@@ -228,29 +371,110 @@ class Persistence(object):
             out (dict): Dictionary of loaded file. If there is an error, the
                 message will be logged and an empty dict is returned.
         """
+        found, data = self._cache.get(filename)
+        # take signature before reading so that a concurrent write
+        # invalidates what is cached
+        signature = None if found else FileCache.signature(filename)
         try:
-            if self._format == Persistence.Format.pickle.value:
-                return load_pickle(filename)
-            else:
-                return load_json(filename)
+            if not found:
+                if signature is None:
+                    return {}
+                data = read_file(filename)
+            item = self._decode(data)
         except Exception:  # pragma: no cover
             self.logger.exception(
                 "Failed to parse {} file {}".format(self._format, filename))
+            return None
+        if not found:
+            self._cache.put(filename, data, signature)
+        return item
 
     def _save_file(self, item, filename):
         """ Saves an item to disk
 
-        If there is an error a message will be logged
+        If there is an error a message will be logged. With write-behind
+        the item is only cached until the next flush, with group commit
+        until the commit window ends.
 
         Args:
             item (dict): item information to save
             filename (str): Absolute path to filename
         """
         try:
-            if self._format == Persistence.Format.pickle.value:
-                save_pickle(filename, item)
-            else:
-                save_json(filename, item)
+            data = self._encode(item)
+        except Exception:  # pragma: no cover
+            self.logger.exception(
+                "Failed to save {} file {}".format(self._format, filename))
+            return
+        if self._write_behind:
+            self._cache.put_dirty(filename, data)
+        elif self._durability == Persistence.Durability.group.value:
+            self._cache.put_dirty(filename, data)
+            self._schedule_commit()
+        elif self._write_file(data, filename):
+            self._sync_folders([os.path.dirname(filename)])
+            self._cache.put(filename, data, FileCache.signature(filename))
+
+    def _encode(self, item):
+        """ Encode an item the way nio.util.codec saves it """
+        if self._format == Persistence.Format.pickle.value:
+            return pickle.dumps(item)
+        return json.dumps(item, indent=4, separators=(',', ': '),
+                          sort_keys=True).encode()
+
+    def _decode(self, data):
+        """ Decode file contents the way nio.util.codec loads them """
+        if self._format == Persistence.Format.pickle.value:
+            try:
+                return pickle.loads(data)
+            except Exception:
+                # files saved before safepickle was used
+                return unsafepickle.loads(data)
+        return json.loads(data.decode())
+
+    def _write_file(self, data, filename):
+        """ Atomically replaces a file with encoded contents
+
+        The contents are written and synced to a temporary file which is
+        then renamed over filename. The rename is only durable once the
+        folder is synced, see _sync_folders.
+
+        Returns:
+            True if the contents were written, False otherwise
+        """
+        temp_filename = None
+        try:
+            fd, temp_filename = mkstemp(
+                suffix=".tmp",
+                prefix=".{}".format(os.path.basename(filename)),
+                dir=os.path.dirname(filename))
+            with open(fd, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(temp_filename, filename)
+            return True
         except Exception:  # pragma: no cover
             self.logger.exception(
                 "Failed to save {} file {}".format(self._format, filename))
+            if temp_filename is not None:
+                try:
+                    os.remove(temp_filename)
+                except OSError:
+                    pass
+            return False
+
+    def _sync_folders(self, folders):
+        """ Syncs folders so that renames within them are durable """
+        for folder in folders:
+            try:
+                fd = os.open(folder, os.O_RDONLY)
+            except OSError:  # pragma: no cover
+                # folders can not be opened on some platforms
+                continue
+            try:
+                os.fsync(fd)
+            except OSError:  # pragma: no cover
+                self.logger.warning("Failed to sync folder {}".format(folder))
+            finally:
+                os.close(fd)
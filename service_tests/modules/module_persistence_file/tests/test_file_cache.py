@@ -0,0 +1,175 @@
+import os
+import shutil
+
+from nio.testing import NIOTestCase
+from nio.modules.persistence import Persistence
+from nio.modules.context import ModuleContext
+
+from ..cache import FileCache
+from ..persistence import Persistence as PersistenceModule
+from ..module import FilePersistenceModule
+
+
+class TestFileCache(NIOTestCase):
+
+    cfg_dir = "{}/{}/".format(os.path.dirname(__file__), "cache_test")
+    write_behind = False
+
+    def setUp(self):
+        try:
+            os.mkdir(self.cfg_dir)
+        except FileExistsError:  # pragma: no cover
+            # No problem, the directory already exists
+            pass
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.cfg_dir)
+
+    def get_context(self, module_name, module):
+        if module_name == "persistence":
+            context = ModuleContext()
+            context.root_folder = self.cfg_dir
+            context.root_id = ''
+            context.format = PersistenceModule.Format.json.value
+            context.cache_size = 2
+            context.write_behind = self.write_behind
+            return context
+        else:
+            return super().get_context(module_name, module)
+
+    def get_module(self, module_name):
+        """ Override to use the file persistence """
+        if module_name == "persistence":
+            return FilePersistenceModule()
+        else:
+            return super().get_module(module_name)
+
+    def get_test_modules(self):
+        return super().get_test_modules() | {'persistence'}
+
+    def test_load_hits_cache(self):
+        """ Loading a saved item again comes from the cache """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1")
+        self.assertEqual(persistence.load("id1"), {"field1": "value1"})
+        self.assertEqual(persistence.load("id1"), {"field1": "value1"})
+        stats = Persistence.cache_stats()
+        self.assertEqual(stats["hits"], 2)
+        self.assertEqual(stats["misses"], 0)
+
+    def test_loaded_item_is_a_copy(self):
+        """ Altering a loaded item leaves the cached one untouched """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1")
+        persistence.load("id1")["field1"] = "changed"
+        self.assertEqual(persistence.load("id1"), {"field1": "value1"})
+
+    def test_file_change_invalidates_entry(self):
+        """ Files changed on disk are read again """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1")
+        Persistence.flush()
+        filename = os.path.join(self.cfg_dir, "id1.cfg")
+        with open(filename, "w") as f:
+            f.write('{"field1": "value2!"}')
+        self.assertEqual(persistence.load("id1"), {"field1": "value2!"})
+        self.assertEqual(Persistence.cache_stats()["misses"], 1)
+
+    def test_eviction(self):
+        """ Entries beyond the cache size are evicted and read again """
+        persistence = Persistence()
+        for id in ("id1", "id2", "id3"):
+            persistence.save({"id": id}, id)
+        stats = Persistence.cache_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["entries"], 2)
+        # evicted item is read back from disk
+        self.assertEqual(persistence.load("id1"), {"id": "id1"})
+        self.assertEqual(Persistence.cache_stats()["misses"], 1)
+
+    def test_remove_discards_entry(self):
+        """ Removed items are no longer cached """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1", "col1")
+        persistence.remove("id1", "col1")
+        self.assertIsNone(persistence.load("id1", "col1"))
+
+
+class TestWriteBehindFileCache(TestFileCache):
+
+    write_behind = True
+
+    def test_eviction(self):
+        """ Flushed items are evicted once written """
+        persistence = Persistence()
+        for id in ("id1", "id2", "id3"):
+            persistence.save({"id": id}, id)
+        Persistence.flush()
+        stats = Persistence.cache_stats()
+        self.assertEqual(stats["evictions"], 1)
+        self.assertEqual(stats["entries"], 2)
+
+    def test_write_behind(self):
+        """ Saved items are only written on flush, loads see them """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1", "col1")
+        filename = os.path.join(self.cfg_dir, "col1", "id1.cfg")
+        self.assertFalse(os.path.isfile(filename))
+        self.assertEqual(Persistence.cache_stats()["pending_writes"], 1)
+        # pending items are seen by loads
+        self.assertEqual(persistence.load("id1", "col1"),
+                         {"field1": "value1"})
+        self.assertEqual(persistence.load_collection("col1"),
+                         {"id1": {"field1": "value1"}})
+        Persistence.flush()
+        self.assertTrue(os.path.isfile(filename))
+        self.assertEqual(Persistence.cache_stats()["pending_writes"], 0)
+
+    def test_dirty_items_are_not_evicted(self):
+        """ Items pending a write stay cached past the cache size """
+        persistence = Persistence()
+        for id in ("id1", "id2", "id3"):
+            persistence.save({"id": id}, id)
+        self.assertEqual(Persistence.cache_stats()["pending_writes"], 3)
+        Persistence.flush()
+        self.assertEqual(persistence.load("id1"), {"id": "id1"})
+        for id in ("id1", "id2", "id3"):
+            self.assertTrue(os.path.isfile(
+                os.path.join(self.cfg_dir, "{}.cfg".format(id))))
+
+    def test_reconfigure_keeps_pending_writes(self):
+        """ Items pending a write survive configuring the module again """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1")
+        PersistenceModule.configure(self.get_context(
+            "persistence", FilePersistenceModule()))
+        self.assertTrue(os.path.isfile(os.path.join(self.cfg_dir, "id1.cfg")))
+        self.assertEqual(Persistence.cache_stats()["pending_writes"], 0)
+        self.assertEqual(persistence.load("id1"), {"field1": "value1"})
+
+
+class TestFileCacheEviction(NIOTestCase):
+
+    def test_fifo(self):
+        """ Oldest entries are evicted first, regardless of hits """
+        cache = FileCache(2, FileCache.Eviction.fifo.value)
+        cache.put("a", 1, (1, 1))
+        cache.put("b", 2, (1, 1))
+        # a hit does not protect an entry from fifo eviction
+        cache.signature = lambda filename: (1, 1)
+        self.assertEqual(cache.get("a"), (True, 1))
+        cache.put("c", 3, (1, 1))
+        self.assertEqual(cache.get("a"), (False, None))
+
+    def test_lru(self):
+        """ Least recently used entries are evicted first """
+        cache = FileCache(2, FileCache.Eviction.lru.value)
+        cache.signature = lambda filename: (1, 1)
+        cache.put("a", 1, (1, 1))
+        cache.put("b", 2, (1, 1))
+        self.assertEqual(cache.get("a"), (True, 1))
+        cache.put("c", 3, (1, 1))
+        self.assertEqual(cache.get("a"), (True, 1))
+        self.assertEqual(cache.get("b"), (False, None))
@@ -0,0 +1,134 @@
+import json
+import os
+import pickle
+import shutil
+from copy import copy, deepcopy
+from unittest.mock import patch
+
+from nio.testing import NIOTestCase
+from nio.modules.persistence import Persistence
+from nio.modules.context import ModuleContext
+
+from ..persistence import Persistence as PersistenceModule, read_file
+from ..module import FilePersistenceModule
+
+
+class TestLazyCollection(NIOTestCase):
+
+    cfg_dir = "{}/{}/".format(os.path.dirname(__file__), "collection_test")
+    loading = PersistenceModule.Loading.lazy
+
+    def setUp(self):
+        os.makedirs(os.path.join(self.cfg_dir, "blocks"), exist_ok=True)
+        for i in range(20):
+            with open(os.path.join(
+                    self.cfg_dir, "blocks", "block{}.cfg".format(i)),
+                    "w") as f:
+                json.dump({"name": "block{}".format(i)}, f)
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.cfg_dir)
+
+    def get_context(self, module_name, module):
+        if module_name == "persistence":
+            context = ModuleContext()
+            context.root_folder = self.cfg_dir
+            context.root_id = ''
+            context.format = PersistenceModule.Format.json.value
+            context.loading = self.loading.value
+            return context
+        else:
+            return super().get_context(module_name, module)
+
+    def get_module(self, module_name):
+        """ Override to use the file persistence """
+        if module_name == "persistence":
+            return FilePersistenceModule()
+        else:
+            return super().get_module(module_name)
+
+    def get_test_modules(self):
+        return super().get_test_modules() | {'persistence'}
+
+    def _read_file_calls(self, method):
+        with patch(PersistenceModule.__module__ + ".read_file",
+                   side_effect=read_file) as read:
+            method()
+        return read.call_count
+
+    def test_items_load_on_access(self):
+        """ Only the items accessed are read from their file """
+        persistence = Persistence()
+
+        def use_two_blocks():
+            blocks = persistence.load_collection("blocks")
+            self.assertEqual(len(blocks), 20)
+            self.assertIn("block3", blocks)
+            self.assertEqual(blocks["block1"], {"name": "block1"})
+            self.assertEqual(blocks.get("block2"), {"name": "block2"})
+            self.assertIsNone(blocks.get("missing"))
+
+        self.assertEqual(self._read_file_calls(use_two_blocks), 2)
+
+    def test_behaves_as_dict(self):
+        """ Collections compare, iterate and update as dicts """
+        persistence = Persistence()
+        blocks = persistence.load_collection("blocks")
+        expected = {"block{}".format(i): {"name": "block{}".format(i)}
+                    for i in range(20)}
+        self.assertDictEqual(blocks, expected)
+        self.assertEqual(expected, persistence.load_collection("blocks"))
+        self.assertEqual(dict(persistence.load_collection("blocks")),
+                         expected)
+        self.assertEqual(sorted(persistence.load_collection("blocks")),
+                         sorted(expected))
+        blocks["block0"] = "changed"
+        del blocks["block1"]
+        self.assertEqual(len(blocks), 19)
+        self.assertEqual(blocks.pop("block2"), {"name": "block2"})
+        self.assertEqual(blocks["block0"], "changed")
+
+    def test_copies_are_dicts(self):
+        """ Copies hold every item and are independent of the collection """
+        persistence = Persistence()
+        expected = {"block{}".format(i): {"name": "block{}".format(i)}
+                    for i in range(20)}
+        for copier in (copy, deepcopy):
+            blocks = persistence.load_collection("blocks")
+            copied = copier(blocks)
+            self.assertIs(type(copied), dict)
+            self.assertEqual(copied, expected)
+            del copied["block0"]
+            self.assertIn("block0", blocks)
+        blocks = persistence.load_collection("blocks")
+        copied = deepcopy(blocks)
+        copied["block1"]["name"] = "changed"
+        self.assertEqual(blocks["block1"], {"name": "block1"})
+
+    def test_pickles_as_dict(self):
+        """ Pickled collections load back as plain dicts """
+        persistence = Persistence()
+        blocks = persistence.load_collection("blocks")
+        unpickled = pickle.loads(pickle.dumps(blocks))
+        self.assertIs(type(unpickled), dict)
+        self.assertEqual(len(unpickled), 20)
+        self.assertEqual(unpickled["block1"], {"name": "block1"})
+
+
+class TestPrefetchCollection(TestLazyCollection):
+
+    loading = PersistenceModule.Loading.prefetch
+
+    def test_items_load_on_access(self):
+        """ Every item is loaded once the collection is requested """
+        persistence = Persistence()
+
+        def load_all_blocks():
+            blocks = persistence.load_collection("blocks")
+            self.assertEqual(blocks["block1"], {"name": "block1"})
+            self.assertEqual(len(blocks.values()), 20)
+            list(blocks.values())
+
+        self.assertEqual(self._read_file_calls(load_all_blocks), 20)
@@ -0,0 +1,116 @@
+import os
+import shutil
+from threading import Event
+from time import sleep
+from unittest.mock import patch
+
+from nio.testing import NIOTestCase
+from nio.modules.persistence import Persistence
+from nio.modules.context import ModuleContext
+
+from ..persistence import Persistence as PersistenceModule
+from ..module import FilePersistenceModule
+
+
+class TestFileDurability(NIOTestCase):
+
+    cfg_dir = "{}/{}/".format(os.path.dirname(__file__), "durability_test")
+    durability = PersistenceModule.Durability.atomic
+
+    def setUp(self):
+        try:
+            os.mkdir(self.cfg_dir)
+        except FileExistsError:  # pragma: no cover
+            # No problem, the directory already exists
+            pass
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.cfg_dir)
+
+    def get_context(self, module_name, module):
+        if module_name == "persistence":
+            context = ModuleContext()
+            context.root_folder = self.cfg_dir
+            context.root_id = ''
+            context.format = PersistenceModule.Format.json.value
+            context.durability = self.durability.value
+            context.commit_window = 0.05
+            return context
+        else:
+            return super().get_context(module_name, module)
+
+    def get_module(self, module_name):
+        """ Override to use the file persistence """
+        if module_name == "persistence":
+            return FilePersistenceModule()
+        else:
+            return super().get_module(module_name)
+
+    def get_test_modules(self):
+        return super().get_test_modules() | {'persistence'}
+
+    def test_no_temporary_files_left(self):
+        """ Temporary files are renamed over their target """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1", "col1")
+        Persistence.flush()
+        self.assertEqual(
+            os.listdir(os.path.join(self.cfg_dir, "col1")), ["id1.cfg"])
+
+    def test_failed_write_keeps_previous_contents(self):
+        """ A failed write leaves the previous file contents """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1")
+        Persistence.flush()
+
+        # the temporary file is only partly written when syncing fails
+        with patch("os.fsync", side_effect=IOError("disk full")):
+            PersistenceModule()._write_file(b'{"field1": ',
+                                            os.path.join(self.cfg_dir,
+                                                         "id1.cfg"))
+        self.assertEqual(os.listdir(self.cfg_dir), ["id1.cfg"])
+        # read from disk rather than from the cache
+        Persistence.configure(self.get_context("persistence", None))
+        self.assertEqual(persistence.load("id1"), {"field1": "value1"})
+
+
+class TestGroupCommitDurability(TestFileDurability):
+
+    durability = PersistenceModule.Durability.group
+
+    def test_group_commit(self):
+        """ Saves within the commit window sync their folder once """
+        persistence = Persistence()
+        with patch("os.fsync") as fsync:
+            for id in range(10):
+                persistence.save({"id": id}, str(id), "col1")
+            # saves are visible before being committed
+            self.assertEqual(len(persistence.load_collection("col1")), 10)
+            sleep(0.2)
+            # one sync per file and a single sync for the folder
+            self.assertEqual(fsync.call_count, 11)
+        self.assertEqual(len(os.listdir(os.path.join(self.cfg_dir, "col1"))),
+                         10)
+        self.assertEqual(Persistence.cache_stats()["pending_writes"], 0)
+
+    def test_remove_during_commit(self):
+        """ An item removed while being committed is not written back """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1", "col1")
+        writing = Event()
+        fsync = os.fsync
+
+        def slow_fsync(fd):
+            writing.set()
+            sleep(0.1)
+            fsync(fd)
+
+        with patch("os.fsync", side_effect=slow_fsync):
+            # the commit is writing the item when it is removed
+            writing.wait(1)
+            persistence.remove("id1", "col1")
+            sleep(0.2)
+        self.assertIsNone(persistence.load("id1", "col1"))
+        self.assertEqual(os.listdir(os.path.join(self.cfg_dir, "col1")), [])
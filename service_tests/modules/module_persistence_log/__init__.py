@@ -0,0 +1,2 @@
+# shortcut to Persistence class
+from .persistence import Persistence
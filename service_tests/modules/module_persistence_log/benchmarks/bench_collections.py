@@ -0,0 +1,63 @@
+""" Benchmark collection operations against the per-file layout
+
+Run from the project root with:
+    python -m service_tests.modules.module_persistence_log.benchmarks.\
+bench_collections [items]
+"""
+import shutil
+import sys
+from tempfile import mkdtemp
+from time import perf_counter
+
+from nio.modules.context import ModuleContext
+
+from ...module_persistence_file.persistence import \
+    Persistence as FilePersistence
+from ..persistence import Persistence as LogPersistence
+
+
+def _context(folder):
+    context = ModuleContext()
+    context.root_folder = folder
+    context.root_id = 'service1'
+    context.format = FilePersistence.Format.pickle.value
+    # measure disk access rather than the file persistence cache
+    context.cache_size = 0
+    return context
+
+
+def bench_collections(persistence_class, items):
+    folder = mkdtemp()
+    try:
+        persistence_class.configure(_context(folder))
+        persistence = persistence_class()
+        # per-group states as saved by group_by blocks
+        states = {"group{}".format(i): {"state": i, "previous": None}
+                  for i in range(items)}
+        timings = []
+        start = perf_counter()
+        persistence.save_collection(states, "states")
+        timings.append(perf_counter() - start)
+        start = perf_counter()
+        for i in range(0, items, 10):
+            persistence.save({"state": -i}, "group{}".format(i), "states")
+        timings.append(perf_counter() - start)
+        start = perf_counter()
+        assert len(persistence.load_collection("states")) == items
+        timings.append(perf_counter() - start)
+        start = perf_counter()
+        persistence.remove_collection("states")
+        timings.append(perf_counter() - start)
+    finally:
+        if persistence_class is LogPersistence:
+            LogPersistence.close()
+        shutil.rmtree(folder)
+    print("{:>23}: save_collection {:.3f}s, save 10% {:.3f}s, "
+          "load_collection {:.3f}s, remove_collection {:.3f}s".format(
+              persistence_class.__module__.split(".")[-2], *timings))
+
+
+if __name__ == "__main__":
+    items = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    for persistence_class in (FilePersistence, LogPersistence):
+        bench_collections(persistence_class, items)
@@ -0,0 +1,259 @@
+import os
+import struct
+from threading import Lock, RLock
+from zlib import crc32
+
+from safepickle import safepickle as pickle
+
+from nio.util.logging import get_nio_logger
+from nio.util.threading import spawn
+
+
+_HEADER = struct.Struct("<II")
+
+# record operations
+_SET = "set"
+_DELETE = "delete"
+_DROP = "drop"
+
+
+def _scan(f, offset):
+    """ Read records from a log file
+
+    Reading stops at the end of the file or at the first record that is
+    incomplete or does not match its checksum, which is what a crash in the
+    middle of an append leaves behind.
+
+    Args:
+        f: log file opened for binary reading
+        offset (int): position of the first record to read
+
+    Yields:
+        tuple (offset, raw record bytes, decoded record)
+    """
+    f.seek(offset)
+    while True:
+        header = f.read(_HEADER.size)
+        if len(header) < _HEADER.size:
+            return
+        length, checksum = _HEADER.unpack(header)
+        payload = f.read(length)
+        if len(payload) < length or crc32(payload) != checksum:
+            return
+        try:
+            record = pickle.loads(payload)
+        except Exception:
+            return
+        yield offset, header + payload, record
+        offset += len(header) + length
+
+
+class LogStore(object):
+
+    """ Append-only log of persisted items with an in-memory index
+
+    Every save, remove and collection removal is appended to a single file
+    as a length prefixed, checksummed record. The index maps each live item
+    to the position of its latest record so loads read one record and
+    collection operations never touch the file system beyond the log.
+
+    When opened, the log is replayed to rebuild the index and any torn
+    record at its end is truncated. Once superseded records outweigh live
+    ones the log is compacted in a background thread, only holding the
+    store lock to copy records appended while compacting and to swap files.
+    """
+
+    def __init__(self, filename, sync=False, compaction_threshold=1 << 20):
+        """ Create a store backed by filename
+
+        Args:
+            filename (str): log file, created if missing
+            sync (bool): fsync the log after every append
+            compaction_threshold (int): minimum number of stale bytes
+                before the log is compacted
+        """
+        self.logger = get_nio_logger("LogStore")
+        self._filename = filename
+        self._sync = sync
+        self._compaction_threshold = compaction_threshold
+        self._lock = RLock()
+        self._compaction_lock = Lock()
+        self._compacting = False
+        self._index = {}
+        self._size = 0
+        self._live_bytes = 0
+        self._file = None
+        self._open()
+
+    def _open(self):
+        with open(self._filename, "a+b") as f:
+            for offset, raw, record in _scan(f, 0):
+                self._apply(self._index, offset, len(raw), record)
+                self._size = offset + len(raw)
+            if f.seek(0, os.SEEK_END) > self._size:
+                self.logger.warning(
+                    "Discarding {} bytes of incomplete records from {}".format(
+                        f.tell() - self._size, self._filename))
+                f.truncate(self._size)
+        self._live_bytes = self._count_live_bytes(self._index)
+        self._file = open(self._filename, "r+b")
+        self._file.seek(self._size)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    @staticmethod
+    def _apply(index, offset, length, record):
+        """ Update an index with a record read at offset """
+        operation, collection, id = record[:3]
+        if operation == _SET:
+            index.setdefault(collection, {})[id] = (offset, length)
+        elif operation == _DELETE:
+            items = index.get(collection)
+            if items is not None:
+                items.pop(id, None)
+                if not items:
+                    del index[collection]
+        elif operation == _DROP:
+            index.pop(collection, None)
+
+    @staticmethod
+    def _count_live_bytes(index):
+        return sum(length for items in index.values()
+                   for _, length in items.values())
+
+    def get(self, collection, id):
+        """ Latest item saved under id
+
+        Returns:
+            tuple (found, item)
+        """
+        with self._lock:
+            position = self._index.get(collection, {}).get(id)
+            if position is None:
+                return False, None
+            return True, self._read(*position)
+
+    def items(self, collection):
+        """ Every item in a collection, by id """
+        with self._lock:
+            positions = self._index.get(collection, {})
+            # read in file order so that the log is scanned forward
+            return {id: self._read(offset, length)
+                    for id, (offset, length) in
+                    sorted(positions.items(), key=lambda entry: entry[1])}
+
+    def put(self, collection, id, item):
+        self._append((_SET, collection, id, item))
+
+    def put_many(self, collection, items):
+        for id, item in items.items():
+            self._append((_SET, collection, id, item), False)
+        self._commit()
+
+    def delete(self, collection, id):
+        with self._lock:
+            if id in self._index.get(collection, {}):
+                self._append((_DELETE, collection, id))
+
+    def drop(self, collection):
+        with self._lock:
+            if collection in self._index:
+                self._append((_DROP, collection, None))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": self._size,
+                "live_bytes": self._live_bytes,
+                "items": sum(len(items) for items in self._index.values()),
+            }
+
+    def _read(self, offset, length):
+        self._file.seek(offset + _HEADER.size)
+        record = pickle.loads(self._file.read(length - _HEADER.size))
+        self._file.seek(self._size)
+        return record[3]
+
+    def _append(self, record, commit=True):
+        payload = pickle.dumps(record)
+        raw = _HEADER.pack(len(payload), crc32(payload)) + payload
+        with self._lock:
+            offset = self._size
+            self._file.write(raw)
+            self._size += len(raw)
+            previous = self._index.get(record[1], {})
+            stale = 0
+            if record[0] == _DROP:
+                stale = sum(length for _, length in previous.values())
+            elif record[2] in previous:
+                stale = previous[record[2]][1]
+            self._apply(self._index, offset, len(raw), record)
+            if record[0] == _SET:
+                self._live_bytes += len(raw)
+            self._live_bytes -= stale
+            if commit:
+                self._commit()
+
+    def _commit(self):
+        with self._lock:
+            self._file.flush()
+            if self._sync:
+                os.fsync(self._file.fileno())
+            stale_bytes = self._size - self._live_bytes
+            if not self._compacting and \
+                    stale_bytes >= self._compaction_threshold and \
+                    stale_bytes > self._live_bytes:
+                self._compacting = True
+                spawn(self.compact)
+
+    def compact(self):
+        """ Rewrite the log keeping only the latest record of live items """
+        with self._compaction_lock:
+            try:
+                self._compact()
+            finally:
+                self._compacting = False
+
+    def _compact(self):
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.flush()
+            positions = [(collection, id, position)
+                         for collection, items in self._index.items()
+                         for id, position in items.items()]
+            snapshot_end = self._size
+        positions.sort(key=lambda entry: entry[2])
+        compacted_filename = "{}.compact".format(self._filename)
+        index = {}
+        with open(self._filename, "rb") as src, \
+                open(compacted_filename, "wb") as dst:
+            offset = 0
+            # live records are copied without holding the store lock
+            for collection, id, (position, length) in positions:
+                src.seek(position)
+                dst.write(src.read(length))
+                index.setdefault(collection, {})[id] = (offset, length)
+                offset += length
+            with self._lock:
+                if self._file is None:
+                    return
+                # bring in whatever was appended while copying
+                self._file.flush()
+                for _, raw, record in _scan(src, snapshot_end):
+                    dst.write(raw)
+                    self._apply(index, offset, len(raw), record)
+                    offset += len(raw)
+                dst.flush()
+                os.fsync(dst.fileno())
+                self._file.close()
+                os.replace(compacted_filename, self._filename)
+                self._index = index
+                self._size = offset
+                self._live_bytes = self._count_live_bytes(index)
+                self._file = open(self._filename, "r+b")
+                self._file.seek(self._size)
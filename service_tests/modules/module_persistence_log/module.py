@@ -0,0 +1,40 @@
+import os
+from nio.modules.context import ModuleContext
+from nio.modules.persistence.module import PersistenceModule
+from nio.modules.settings import Settings
+from nio import discoverable
+
+from . import Persistence
+
+
+@discoverable
+class LogPersistenceModule(PersistenceModule):
+
+    def initialize(self, context):
+        super().initialize(context)
+        # Set up the implementation class vars before proxying
+        Persistence.configure(context)
+        self.proxy_persistence_class(Persistence)
+
+    def finalize(self):
+        Persistence.close()
+        super().finalize()
+
+    def prepare_core_context(self):
+        context = ModuleContext()
+        # a single log holds 'blocks' and 'services' collections
+        context.root_id = ''
+        # specify the root path for the log file
+        context.root_folder = os.path.abspath(Settings.get(
+            'persistence', 'configuration_data', fallback="etc"))
+        return context
+
+    def prepare_service_context(self, service_context=None):
+        context = ModuleContext()
+        # one log per service to avoid collisions when same block is used
+        # from different services
+        context.root_id = service_context.properties['name']
+        # specify the root path for block persistence logs
+        context.root_folder = os.path.abspath(Settings.get(
+            'persistence', 'data', fallback='etc/persist'))
+        return context
@@ -0,0 +1,125 @@
+import os
+
+from nio.util.logging import get_nio_logger
+
+from .log import LogStore
+
+
+class Persistence(object):
+
+    """ Log based persistence module implementation
+
+    This module implements the Persistence interface keeping every item in
+    a single append-only log file (see LogStore) instead of a file per
+    item, which keeps collection loads and removals cheap for collections
+    holding thousands of items.
+
+    The log file is [root_folder]/[root_id].log if root_id is not empty,
+    otherwise [root_folder]/persistence.log
+    """
+
+    _root_id = ''
+    _root_folder = None
+    _store = None
+
+    def __init__(self):
+        """ Constructor for the Persistence module
+        """
+        self.logger = get_nio_logger("Log-Persistence")
+
+    @classmethod
+    def configure(cls, context):
+        """  Configures the persistence - this will be called before proxying.
+
+        This method is called once in each process by the module implementation
+        and is expected to set the global information for the persistence
+        module. As a result, this method must be called before the
+        implementation is proxied, since it makes use of cls which will always
+        be the implementation.
+        """
+        cls._root_id = context.root_id
+        cls._root_folder = context.root_folder
+        try:
+            os.makedirs(cls._root_folder)
+        except OSError:
+            # If the persistence target directory already exists, move on
+            pass
+        cls.close()
+        # sync and compaction settings are optional in the context
+        cls._store = LogStore(
+            os.path.join(cls._root_folder,
+                         "{}.log".format(cls._root_id or "persistence")),
+            getattr(context, "sync", False),
+            getattr(context, "compaction_threshold", 1 << 20))
+
+    @classmethod
+    def close(cls):
+        """ Close the log file """
+        if cls._store is not None:
+            cls._store.close()
+            cls._store = None
+
+    def load(self, id, collection=None, default=None):
+        """ Load an item from the persistence store.
+
+        Args:
+            id (str): Specifies the identifier of the item to load.
+            collection (str): if provided, it specifies the collection the item
+                belongs to.
+            default: the value to return if the item does not exist
+
+        Returns:
+            item: The item associated with given id
+        """
+        _, item = self._store.get(collection, id)
+        return item or default
+
+    def load_collection(self, collection, default=None):
+        """ Load a collection from the persistence store.
+
+        Args:
+            collection (str): Specifies the collection to load
+            default: the value to return if the collection does not exist
+
+        Returns:
+            items: The items associated with given collection
+        """
+        return self._store.items(collection) or default
+
+    def save(self, item, id, collection=None):
+        """ Save the item to the persistence store.
+
+        Args:
+            item: Item to save
+            id (str): Specifies the identifier of the item to save.
+            collection (str): if provided, it specifies the collection the item
+                belongs to.
+        """
+        self._store.put(collection, id, item)
+
+    def save_collection(self, items, collection):
+        """ Save a collection to the persistence store.
+
+        Args:
+            items: Items to save
+            collection (str): Specifies the collection to save
+        """
+        self._store.put_many(collection, items)
+
+    def remove(self, id, collection=None):
+        """ Remove an item from the persistence store.
+
+        Args:
+            id (str): Specifies the identifier of the item to remove.
+            collection (str): if provided, it specifies the collection the item
+                belongs to.
+        """
+        self._store.delete(collection, id)
+
+    def remove_collection(self, collection):
+        """ Remove a collection from the persistence store.
+
+        Args:
+            collection (str): Specifies the collection to remove
+        """
+        self._store.drop(collection)
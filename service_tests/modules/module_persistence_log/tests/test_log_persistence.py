@@ -0,0 +1,81 @@
+import os
+import shutil
+
+from nio.testing import NIOTestCase
+from nio.modules.persistence import Persistence
+from nio.modules.context import ModuleContext
+
+from ..module import LogPersistenceModule
+from ..persistence import Persistence as LogPersistence
+
+
+class TestLogPersistence(NIOTestCase):
+
+    cfg_dir = "{}/{}/".format(os.path.dirname(__file__), "persist_test")
+
+    def setUp(self):
+        try:
+            os.mkdir(self.cfg_dir)
+        except FileExistsError:  # pragma: no cover
+            # No problem, the directory already exists
+            pass
+        super().setUp()
+
+    def tearDown(self):
+        super().tearDown()
+        shutil.rmtree(self.cfg_dir)
+
+    def get_context(self, module_name, module):
+        if module_name == "persistence":
+            context = ModuleContext()
+            context.root_folder = self.cfg_dir
+            context.root_id = 'service1'
+            return context
+        else:
+            return super().get_context(module_name, module)
+
+    def get_module(self, module_name):
+        """ Override to use the log persistence """
+        if module_name == "persistence":
+            return LogPersistenceModule()
+        else:
+            return super().get_module(module_name)
+
+    def get_test_modules(self):
+        return super().get_test_modules() | {'persistence'}
+
+    def test_save_load(self):
+        """ Items are saved to and loaded from a single log file """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1")
+        persistence.save({"field1": "value2"}, "id1", "col1")
+        self.assertEqual(persistence.load("id1"), {"field1": "value1"})
+        self.assertEqual(persistence.load("id1", "col1"),
+                         {"field1": "value2"})
+        self.assertEqual(persistence.load("id2", default={}), {})
+        self.assertEqual(os.listdir(self.cfg_dir), ["service1.log"])
+
+    def test_collection(self):
+        """ Collections are saved, updated and removed as a whole """
+        persistence = Persistence()
+        persistence.save_collection(
+            {"id1": {"field1": "value1"}, "id2": (1, 2)}, "col1")
+        persistence.save(3, "id3", "col1")
+        self.assertEqual(persistence.load_collection("col1"), {
+            "id1": {"field1": "value1"}, "id2": (1, 2), "id3": 3})
+        persistence.remove("id3", "col1")
+        self.assertEqual(len(persistence.load_collection("col1")), 2)
+        persistence.remove_collection("col1")
+        self.assertIsNone(persistence.load_collection("col1"))
+        self.assertEqual(persistence.load_collection("col1", {}), {})
+
+    def test_items_survive_restart(self):
+        """ Reopening the log replays saves and removals """
+        persistence = Persistence()
+        persistence.save({"field1": "value1"}, "id1", "col1")
+        persistence.save({"field1": "value2"}, "id2", "col1")
+        persistence.remove("id2", "col1")
+        # reopen the log as a restarted process would
+        LogPersistence.configure(self.get_context("persistence", None))
+        self.assertEqual(LogPersistence().load_collection("col1"),
+                         {"id1": {"field1": "value1"}})
@@ -0,0 +1,89 @@
+import os
+import shutil
+from tempfile import mkdtemp
+from unittest import TestCase
+
+from ..log import LogStore
+
+
+class TestLogStore(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.folder = mkdtemp()
+        self.filename = os.path.join(self.folder, "test.log")
+
+    def tearDown(self):
+        shutil.rmtree(self.folder)
+        super().tearDown()
+
+    def test_torn_record_is_truncated(self):
+        """ A partially appended record is discarded on recovery """
+        store = LogStore(self.filename)
+        store.put("col1", "id1", {"value": 1})
+        store.put("col1", "id2", {"value": 2})
+        store.close()
+        size = os.path.getsize(self.filename)
+        with open(self.filename, "r+b") as f:
+            f.truncate(size - 3)
+        store = LogStore(self.filename)
+        self.assertEqual(store.items("col1"), {"id1": {"value": 1}})
+        # appends continue after the last complete record
+        store.put("col1", "id3", {"value": 3})
+        store.close()
+        store = LogStore(self.filename)
+        self.assertEqual(len(store.items("col1")), 2)
+        store.close()
+
+    def test_corrupted_record_is_truncated(self):
+        """ Records failing their checksum end recovery """
+        store = LogStore(self.filename)
+        store.put(None, "id1", "first")
+        store.put(None, "id1", "second")
+        store.close()
+        with open(self.filename, "r+b") as f:
+            f.seek(-2, os.SEEK_END)
+            f.write(b"!!")
+        store = LogStore(self.filename)
+        self.assertEqual(store.get(None, "id1"), (True, "first"))
+        store.close()
+
+    def test_compaction(self):
+        """ Compaction drops superseded records """
+        store = LogStore(self.filename, compaction_threshold=0)
+        for value in range(100):
+            store.put("col1", "id1", value)
+        store.put("col1", "id2", "kept")
+        store.delete("col1", "id1")
+        store.compact()
+        stats = store.stats()
+        self.assertEqual(stats["items"], 1)
+        self.assertEqual(stats["size"], stats["live_bytes"])
+        self.assertEqual(os.path.getsize(self.filename), stats["size"])
+        self.assertEqual(store.items("col1"), {"id2": "kept"})
+        store.close()
+        store = LogStore(self.filename)
+        self.assertEqual(store.items("col1"), {"id2": "kept"})
+        store.close()
+
+    def test_background_compaction(self):
+        """ Writes keep working while the log compacts itself """
+        store = LogStore(self.filename, compaction_threshold=4096)
+        for value in range(2000):
+            store.put("col1", str(value % 10), value)
+        store.compact()
+        self.assertLess(store.stats()["size"], 4096 * 2)
+        self.assertEqual(
+            store.items("col1"),
+            {str(value % 10): value for value in range(1990, 2000)})
+        store.close()
+
+    def test_drop(self):
+        """ Dropping a collection removes only its items """
+        store = LogStore(self.filename)
+        store.put_many("col1", {"id1": 1, "id2": 2})
+        store.put("col2", "id1", 3)
+        store.drop("col1")
+        self.assertEqual(store.items("col1"), {})
+        self.assertEqual(store.stats()["items"], 1)
+        store.close()
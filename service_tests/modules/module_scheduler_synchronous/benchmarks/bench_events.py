@@ -0,0 +1,52 @@
+""" Measure allocations and time per schedule and per repeat fire
+
+Run from the project root with:
+    python -m service_tests.modules.module_scheduler_synchronous.benchmarks.\
+bench_events [jobs]
+"""
+import sys
+import tracemalloc
+from datetime import timedelta
+from time import perf_counter
+
+from .bench_unschedule import _noop, _start_scheduler
+
+
+def _measure(operation):
+    """ Run operation returning elapsed time and allocated blocks/bytes """
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    start = perf_counter()
+    operation()
+    elapsed = perf_counter() - start
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, "filename")
+    blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0)
+    size = sum(stat.size_diff for stat in stats if stat.size_diff > 0)
+    return elapsed, blocks, size
+
+
+def bench_events(jobs):
+    scheduler = _start_scheduler()
+    try:
+        # jobs repeat every 10 seconds, all of them at the same time
+        elapsed, blocks, size = _measure(lambda: [
+            scheduler.schedule_task(_noop, timedelta(seconds=10), True)
+            for _ in range(jobs)])
+        print("schedule: {:.2f}us, {:.1f} blocks, {:.0f} bytes per job"
+              .format(elapsed / jobs * 1e6, blocks / jobs, size / jobs))
+        # warm up so that every job has fired once
+        scheduler.jump_ahead(10)
+        fires = jobs * 10
+        elapsed, blocks, size = _measure(
+            lambda: scheduler.jump_ahead(100))
+        print("fire: {:.2f}us, {:.2f} blocks, {:.1f} bytes retained per "
+              "fire".format(elapsed / fires * 1e6, blocks / fires,
+                            size / fires))
+    finally:
+        scheduler.do_stop()
+
+
+if __name__ == "__main__":
+    bench_events(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,37 @@
+""" Benchmark jumping ahead a simulated day with interval jobs
+
+Run from the project root with:
+    python -m service_tests.modules.module_scheduler_synchronous.benchmarks.\
+bench_jump_ahead [jobs]
+"""
+import sys
+from datetime import timedelta
+from time import perf_counter
+
+from ..scheduler import SynchronousSchedulerRunner
+from .bench_unschedule import _start_scheduler
+
+
+def _target(fire_count=1):
+    pass
+
+
+def bench_jump_ahead(jobs, catch_up):
+    scheduler = _start_scheduler()
+    try:
+        for _ in range(jobs):
+            # PollDriver-like interval job
+            scheduler.schedule_task(_target, timedelta(seconds=3), True)
+        start = perf_counter()
+        scheduler.jump_ahead(24 * 3600, catch_up)
+        elapsed = perf_counter() - start
+    finally:
+        scheduler.do_stop()
+    print("{:>7} {} jobs: jumped 24h in {:.3f}s".format(
+        catch_up.name, jobs, elapsed))
+
+
+if __name__ == "__main__":
+    for catch_up in SynchronousSchedulerRunner.CatchUp:
+        bench_jump_ahead(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 1, catch_up)
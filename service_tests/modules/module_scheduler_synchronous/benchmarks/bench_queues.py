@@ -0,0 +1,57 @@
+""" Benchmark heap and timing wheel event queues
+
+Simulates a set of interval jobs firing and being rescheduled, the way the
+scheduler thread does with repeatable jobs.
+
+Run from the project root with:
+    python -m service_tests.modules.module_scheduler_synchronous.benchmarks.\
+bench_queues
+"""
+from random import Random
+from time import perf_counter
+
+from ..queues import HeapEventQueue, TimingWheelEventQueue
+from ..scheduler import QueueEvent
+
+RESOLUTION = 0.01
+SIMULATED_SECONDS = 60
+STEP = 0.1
+
+
+def _create_queues():
+    return [("heap", HeapEventQueue()),
+            ("timing_wheel", TimingWheelEventQueue(RESOLUTION))]
+
+
+def bench_queue(name, queue, jobs):
+    random = Random(0)
+    start = perf_counter()
+    for job in range(jobs):
+        # mix of fast pollers and long debounce timers
+        frequency = random.choice((3, 10, 1800))
+        queue.push(QueueEvent(random.uniform(0, frequency), job, None,
+                              frequency, (), {}))
+    push_elapsed = perf_counter() - start
+
+    fired = 0
+    now = 0
+    start = perf_counter()
+    while now < SIMULATED_SECONDS:
+        event = queue.pop_due(now)
+        while event is not None:
+            fired += 1
+            event.time += event.frequency
+            queue.push(event)
+            event = queue.pop_due(now)
+        queue.next_time()
+        now += STEP
+    fire_elapsed = perf_counter() - start
+    print("{:>12} {:>7} jobs: schedule {:.3f}s, {} fires in {:.3f}s "
+          "({:.0f} fires/s)".format(name, jobs, push_elapsed, fired,
+                                    fire_elapsed, fired / fire_elapsed))
+
+
+if __name__ == "__main__":
+    for jobs in (1000, 10000, 100000):
+        for name, queue in _create_queues():
+            bench_queue(name, queue, jobs)
@@ -0,0 +1,50 @@
+""" Benchmark job cancellation with a large number of pending jobs
+
+Run from the project root with:
+    python -m service_tests.modules.module_scheduler_synchronous.benchmarks.\
+bench_unschedule [pending_jobs]
+"""
+import sys
+from datetime import timedelta
+from time import perf_counter
+
+from nio.modules.context import ModuleContext
+
+from ..scheduler import SynchronousSchedulerRunner
+
+
+def _noop():
+    pass
+
+
+def _start_scheduler():
+    context = ModuleContext()
+    context.min_interval = 0.01
+    context.resolution = 0.01
+    scheduler = SynchronousSchedulerRunner()
+    scheduler.do_configure(context)
+    scheduler.do_start()
+    return scheduler
+
+
+def bench_unschedule(pending_jobs):
+    scheduler = _start_scheduler()
+    try:
+        # schedule far enough in the future that nothing fires
+        jobs = [scheduler.schedule_task(_noop, timedelta(hours=1 + i), False)
+                for i in range(pending_jobs)]
+        # cancel every other job, cancellation cost is measured against a
+        # queue that stays at least half full
+        start = perf_counter()
+        for job in jobs[::2]:
+            scheduler.unschedule(job)
+        elapsed = perf_counter() - start
+    finally:
+        scheduler.do_stop()
+    cancelled = len(jobs[::2])
+    print("{} pending jobs: cancelled {} in {:.3f}s ({:.0f} cancels/s)".format(
+        pending_jobs, cancelled, elapsed, cancelled / elapsed))
+
+
+if __name__ == "__main__":
+    bench_unschedule(int(sys.argv[1]) if len(sys.argv) > 1 else 100000)
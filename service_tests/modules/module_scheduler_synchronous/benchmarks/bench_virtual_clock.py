@@ -0,0 +1,125 @@
+""" Benchmark simulating a week of the spotify monitor services
+
+Stand-in blocks are routed as in etc/services with the synchronous router,
+on a virtual clock:
+    DeviceIndicator, polled every 3 seconds
+    UseWarning, a bad auth every hour debounced for 10 seconds and 30 minutes
+    Authorizer, a token refresh every hour
+
+Run from the project root with:
+    python -m service_tests.modules.module_scheduler_synchronous.benchmarks.\
+bench_virtual_clock [days]
+"""
+import json
+import os
+import sys
+from datetime import timedelta
+
+from nio.modules.context import ModuleContext
+from nio.router.context import RouterContext
+from nio.signal.base import Signal
+
+from ....capture import SignalCapture
+from ....router import ServiceTestRouter
+from ..scheduler import SynchronousSchedulerRunner
+
+
+class _Block(object):
+
+    """ Notifies the signals it processes on its first output """
+
+    def __init__(self, router, name, outputs):
+        self._router = router
+        self._name = name
+        self._output_id = next(iter(outputs or {}), None)
+
+    def name(self):
+        return self._name
+
+    def process_signals(self, signals, input_id=None):
+        if self._output_id is not None:
+            self._router.notify_signals(self, signals, self._output_id)
+
+
+class _Debounce(_Block):
+
+    """ Lets a signal through, then drops signals for an interval """
+
+    def __init__(self, router, name, outputs, scheduler, interval):
+        super().__init__(router, name, outputs)
+        self._scheduler = scheduler
+        self._interval = interval
+        self._waiting = False
+
+    def process_signals(self, signals, input_id=None):
+        if self._waiting:
+            return
+        self._waiting = True
+        self._scheduler.schedule_task(
+            self._reset, timedelta(seconds=self._interval), False)
+        super().process_signals(signals, input_id)
+
+    def _reset(self):
+        self._waiting = False
+
+
+def _service(scheduler, name, debounces=None):
+    folder = os.path.join(os.path.dirname(__file__), "..", "..", "..", "..",
+                          "etc", "services")
+    with open(os.path.join(folder, "{}.cfg".format(name))) as f:
+        execution = json.load(f)["execution"]
+    # soak settings, processed signals are only counted
+    router = ServiceTestRouter(
+        True, ServiceTestRouter.CopyStrategy.copy_on_write,
+        capture=lambda block_name, input_id: SignalCapture(
+            SignalCapture.Mode.count))
+    blocks = {}
+    for block in execution:
+        interval = (debounces or {}).get(block["name"])
+        blocks[block["name"]] = \
+            _Debounce(router, block["name"], block["receivers"], scheduler,
+                      interval) if interval else \
+            _Block(router, block["name"], block["receivers"])
+    router.configure(RouterContext(execution=execution, blocks=blocks))
+    return blocks
+
+
+def _notify(block, signal):
+    block.process_signals([signal])
+
+
+def bench_virtual_clock(days):
+    context = ModuleContext()
+    context.min_interval = 0.01
+    context.resolution = 0.01
+    context.clock = SynchronousSchedulerRunner.Clock.virtual.value
+    scheduler = SynchronousSchedulerRunner()
+    scheduler.do_configure(context)
+    scheduler.do_start()
+    try:
+        device_indicator = _service(scheduler, "DeviceIndicator")
+        use_warning = _service(scheduler, "UseWarning", {
+            "Wait10Seconds": 10, "Wait30Minutes": 1800})
+        authorizer = _service(scheduler, "Authorizer")
+        scheduler.schedule_task(
+            _notify, timedelta(seconds=3), True,
+            device_indicator["PollDriver"], Signal({"poll": True}))
+        scheduler.schedule_task(
+            _notify, timedelta(hours=1), True,
+            use_warning["SubBadAuth"], Signal({"status_code": 401}))
+        scheduler.schedule_task(
+            _notify, timedelta(hours=1), True,
+            authorizer["SubNewAuth"], Signal({"refresh_token": "token"}))
+        return scheduler.simulate(days * 24 * 3600)
+    finally:
+        scheduler.do_stop()
+
+
+if __name__ == "__main__":
+    days = float(sys.argv[1]) if len(sys.argv) > 1 else 7
+    report = bench_virtual_clock(days)
+    print("simulated {:.0f} days, {} events in {:.2f}s: "
+          "{:.0f} events/s, {:.0f}x real time".format(
+              days, report["events"], report["elapsed"],
+              report["events_per_second"],
+              report["simulated_seconds"] / report["elapsed"]))
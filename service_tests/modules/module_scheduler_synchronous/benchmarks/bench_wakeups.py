@@ -0,0 +1,38 @@
+""" Measure scheduler thread wakeups and firing lateness in real time
+
+Run from the project root with:
+    python -m service_tests.modules.module_scheduler_synchronous.benchmarks.\
+bench_wakeups [jobs]
+"""
+import sys
+from datetime import timedelta
+from random import Random
+from time import sleep
+
+from .bench_unschedule import _noop, _start_scheduler
+
+
+def bench_wakeups(jobs):
+    random = Random(0)
+    scheduler = _start_scheduler()
+    try:
+        # a far away job the scheduler should not be polling for
+        scheduler.schedule_task(_noop, timedelta(minutes=30), False)
+        sleep(1)
+        idle = scheduler.get_stats()["wakeups"]
+        for _ in range(jobs):
+            scheduler.schedule_task(
+                _noop, timedelta(seconds=random.uniform(0.01, 1)), False)
+        sleep(1.5)
+        stats = scheduler.get_stats()
+    finally:
+        scheduler.do_stop()
+    print("idle wakeups over 1s: {}".format(idle))
+    print("{} jobs: {} wakeups, mean lateness {:.3f}ms, max lateness "
+          "{:.3f}ms".format(stats["executed"], stats["wakeups"] - idle,
+                            stats["mean_lateness"] * 1000,
+                            stats["max_lateness"] * 1000))
+
+
+if __name__ == "__main__":
+    bench_wakeups(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
@@ -10,10 +10,14 @@ class Job(object):
     def cancel(self):
         SyncScheduler.unschedule(self._job)
 
-    def jump_ahead(self, seconds):
+    def configure(self, max_concurrent_runs=None, coalesce=None):
+        """ Override worker pool execution policies for this job """
+        SyncScheduler.configure_job(self._job, max_concurrent_runs, coalesce)
+
+    def jump_ahead(self, seconds, catch_up=None):
         """ Jump the scheudler forward a certain number of seconds.
 
         This is useful in tests to simulate time passing for event-driven
         logic and temporal assertions.
         """
-        SyncScheduler.jump_ahead(seconds)
+        SyncScheduler.jump_ahead(seconds, catch_up)
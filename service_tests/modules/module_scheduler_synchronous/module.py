@@ -24,4 +24,11 @@ class SynchronousSchedulerModule(SchedulerModule):
         # set a fine resolution during tests
         context.min_interval = 0.01
         context.resolution = 0.01
+        # binary heap queue, faster than SyncScheduler.QueueType.timing_wheel
+        # at every number of pending jobs measured by bench_queues
+        context.queue_type = SyncScheduler.QueueType.heap.value
+        # run targets on the scheduler thread so tests stay deterministic
+        context.execution_mode = SyncScheduler.ExecutionMode.inline.value
+        # fire every missed tick when jumping ahead, see jump_ahead
+        context.catch_up = SyncScheduler.CatchUp.replay.value
         return context
@@ -1,41 +1,157 @@
-import heapq
-from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from enum import Enum
+from itertools import count
 from threading import Event, RLock
-from time import monotonic
-from uuid import uuid4
+from time import monotonic, perf_counter
 
 from nio.modules.module import ModuleNotInitialized
 from nio.util.logging import get_nio_logger
 from nio.util.runner import RunnerStatus, Runner
 from nio.util.threading import spawn
 
-QueueEvent = namedtuple('Event', 'time, id, target, frequency, args, kwargs')
+from .queues import HeapEventQueue, TimingWheelEventQueue
+
+
+class QueueEvent(object):
+
+    """ A scheduled event
+
+    Repeatable events are updated in place and pushed back into the queue
+    every time they fire. Events are ordered by time and then by the order
+    in which they were queued.
+    """
+
+    __slots__ = ('time', 'seq', 'id', 'target', 'frequency', 'args',
+                 'kwargs', 'queued')
+
+    def __init__(self, time, id, target, frequency, args, kwargs):
+        self.time = time
+        self.seq = 0
+        self.id = id
+        self.target = target
+        self.frequency = frequency
+        self.args = args
+        self.kwargs = kwargs
+        # False while the event is popped to be executed
+        self.queued = False
+
+    def __lt__(self, other):
+        if self.time == other.time:
+            return self.seq < other.seq
+        return self.time < other.time
+
+    def __repr__(self):
+        return "QueueEvent(time={}, id={}, target={})".format(
+            self.time, self.id, self.target)
 
 
 class SynchronousSchedulerRunner(Runner):
 
+    class QueueType(Enum):
+        heap = 1
+        timing_wheel = 2
+
+    class ExecutionMode(Enum):
+        # targets run on the scheduler thread, deterministic for tests
+        inline = 1
+        # targets run on a bounded pool of worker threads
+        pool = 2
+
+    class CatchUp(Enum):
+        # missed ticks of repeatable jobs are fired one by one in time order
+        replay = 1
+        # all missed ticks of a job are fired back to back
+        batch = 2
+        # a single call per job receiving the number of missed ticks in the
+        # 'fire_count' keyword argument
+        count = 3
+
+    class Clock(Enum):
+        # monotonic time plus the jump_ahead offset, events also fire as
+        # time passes
+        real = 1
+        # time only advances through jump_ahead, advance or simulate, there
+        # is no scheduler thread
+        virtual = 2
+
     def __init__(self):
         super().__init__()
         self._sched_min_delta = 0.1
         self._sched_resolution = 0.1
+        self._queue_type = SynchronousSchedulerRunner.QueueType.heap.value
+        self._wheel_size = 64
+        self._execution_mode = \
+            SynchronousSchedulerRunner.ExecutionMode.inline.value
+        self._max_workers = 10
+        # default job policies, see configure_job
+        self._max_concurrent_runs = 1
+        self._coalesce = False
+        self._catch_up = SynchronousSchedulerRunner.CatchUp.replay.value
+        self._clock = SynchronousSchedulerRunner.Clock.real.value
+        self._job_policies = dict()
+        self._executor = None
+        # runs currently submitted to the pool, by event id
+        self._running = dict()
+        self._running_lock = RLock()
         self.logger = get_nio_logger("Custom Scheduler")
-        self._queue = []
+        self._queue = HeapEventQueue()
         self._queue_lock = RLock()
         self._stop_event = Event()
         self._events = dict()
         self._events_lock = RLock()
+        # job ids and queueing order of events
+        self._job_ids = count(1)
+        self._sequence = count()
         self._process_events_thread = None
+        # number of cancelled events still sitting in the queue, these are
+        # discarded lazily when they reach the head of the queue or when the
+        # queue is compacted
+        self._cancelled_count = 0
+        # compact the queue once cancelled events outnumber live ones and
+        # there are at least this many of them
+        self._compaction_threshold = 64
         self.offset = 0
-        # event used to wait for next task to execute and/or wait at scheduler
-        # resolution
+        # event used to wait for next task to execute, it is set whenever
+        # the earliest scheduled event changes so that the scheduler thread
+        # can recalculate its wait
         self._sleep_interrupt_event = Event()
+        # instrumentation, see get_stats
+        self._wakeups = 0
+        self._executed = 0
+        self._total_lateness = 0
+        self._max_lateness = 0
+        self._pool_queue_depth = 0
+        self._pool_executed = 0
+        self._total_execution_lag = 0
+        self._max_execution_lag = 0
+        self._skipped_runs = 0
+        self._coalesced_ticks = 0
+        # targets called, including those fired through jump_ahead
+        self._fired = 0
 
     def configure(self, context):
         # Load in the minimum delta and resolution from the config
-        self._reset_scheduler()
         self._sched_min_delta = context.min_interval
         self._sched_resolution = context.resolution
+        # queue implementation is optional in the context, keep the binary
+        # heap by default
+        self._queue_type = getattr(
+            context, "queue_type",
+            SynchronousSchedulerRunner.QueueType.heap.value)
+        self._wheel_size = getattr(context, "wheel_size", self._wheel_size)
+        # execution of targets is inline unless a pool is requested
+        self._execution_mode = getattr(
+            context, "execution_mode",
+            SynchronousSchedulerRunner.ExecutionMode.inline.value)
+        self._max_workers = getattr(context, "max_workers", self._max_workers)
+        self._max_concurrent_runs = getattr(
+            context, "max_concurrent_runs", self._max_concurrent_runs)
+        self._coalesce = getattr(context, "coalesce", self._coalesce)
+        self._catch_up = getattr(context, "catch_up", self._catch_up)
+        self._clock = getattr(
+            context, "clock", SynchronousSchedulerRunner.Clock.real.value)
+        self._reset_scheduler()
 
     def _reset_scheduler(self):
         """ Reset the scheduler to the basic state.
@@ -44,14 +160,36 @@ class SynchronousSchedulerRunner(Runner):
         restarted or start fresh. It will clear out the queue, reset the
         stop event, etc.
         """
-        self._queue[:] = []
+        self._cancelled_count = 0
         # Set and then clear the event to trigger any needed stops
         self._stop_event.set()
+        self._sleep_interrupt_event.set()
         self._stop_event.clear()
         self._events.clear()
+        self._job_policies.clear()
         if self._process_events_thread is not None:
             self._process_events_thread.join(self._sched_resolution)
         self.offset = 0
+        self._queue = self._create_queue()
+        self._wakeups = 0
+        self._executed = 0
+        self._total_lateness = 0
+        self._max_lateness = 0
+        self._pool_queue_depth = 0
+        self._pool_executed = 0
+        self._total_execution_lag = 0
+        self._max_execution_lag = 0
+        self._skipped_runs = 0
+        self._coalesced_ticks = 0
+        self._fired = 0
+
+    def _create_queue(self):
+        """ Create an empty event queue of the configured type """
+        if self._queue_type == \
+                SynchronousSchedulerRunner.QueueType.timing_wheel.value:
+            return TimingWheelEventQueue(
+                self._sched_resolution, self._wheel_size, self._get_time())
+        return HeapEventQueue()
 
     def schedule_task(self, target, delta, repeatable, *args, **kwargs):
         """ Add the given task to the Scheduler.
@@ -91,19 +229,26 @@ class SynchronousSchedulerRunner(Runner):
             # it to be
             frequency = 0
 
-        event_id = uuid4().hex
+        event_id = next(self._job_ids)
         event = QueueEvent(
             self._get_time() + delta, event_id, target,
             frequency, args, kwargs)
 
-        # add to queue
-        with self._queue_lock:
-            heapq.heappush(self._queue, event)
-
-        # add to events
+        # add to events, before queueing it so that it is never mistaken
+        # for a cancelled event
         with self._events_lock:
             self._events[event_id] = event
 
+        # add to queue
+        with self._queue_lock:
+            next_time = self._queue.next_time()
+            event.seq = next(self._sequence)
+            event.queued = True
+            self._queue.push(event)
+            if next_time is None or self._queue.next_time() < next_time:
+                # new event is now the earliest, wake up scheduler thread
+                self._sleep_interrupt_event.set()
+
         return event_id
 
     def unschedule(self, job):
@@ -120,53 +265,158 @@ class SynchronousSchedulerRunner(Runner):
 
         """
         self.logger.debug("Un-scheduling %s" % job)
-        # remove it from events dictionary
-        event = None
+        # remove it from events dictionary, the queued event is left in
+        # place as a tombstone and discarded once it reaches the queue head
         with self._events_lock:
-            if job in self._events:
-                event = self._events.pop(job)
-        if event:
-            try:
-                with self._queue_lock:
-                    if event in self._queue:
-                        self._queue.remove(event)
-                        heapq.heapify(self._queue)
-                self.logger.debug('Success cancelling event')
-                return True
-            except Exception:
-                self.logger.debug('Failure to remove event {0} from queue'
-                                  ' while cancelling a job'.format(event))
-        return False
+            event = self._events.pop(job, None)
+            self._job_policies.pop(job, None)
+        if event is None:
+            return False
+        with self._queue_lock:
+            # an event popped to be executed is not pushed back, only
+            # queued events leave a tombstone
+            if event.queued:
+                self._cancelled_count += 1
+                if self._queue.peek() is event:
+                    # earliest event was cancelled, wake up scheduler thread
+                    self._sleep_interrupt_event.set()
+                if self._cancelled_count >= self._compaction_threshold and \
+                        self._cancelled_count * 2 > len(self._queue):
+                    self._compact_queue()
+        self.logger.debug('Success cancelling event')
+        return True
+
+    def configure_job(self, job, max_concurrent_runs=None, coalesce=None):
+        """ Override execution policies for a scheduled job
+
+        Args:
+            job: The ID of the job to configure
+            max_concurrent_runs (int): maximum number of runs of this job
+                allowed to execute at the same time in the worker pool, runs
+                due while the limit is reached are skipped.
+            coalesce (bool): when True, a repeatable job that fell behind
+                schedule runs once instead of once per missed tick.
+        """
+        with self._events_lock:
+            if job not in self._events:
+                return
+            policy = self._job_policies.setdefault(job, dict())
+            if max_concurrent_runs is not None:
+                policy["max_concurrent_runs"] = max_concurrent_runs
+            if coalesce is not None:
+                policy["coalesce"] = coalesce
+
+    def _job_policy(self, job, name):
+        return self._job_policies.get(job, {}).get(
+            name, getattr(self, "_{}".format(name)))
+
+    def _is_cancelled(self, event):
+        """ Find out if a queued event has been cancelled
+
+        An event is live only while it is the one registered under its id,
+        anything else left in the queue is a tombstone.
+        """
+        return self._events.get(event.id) is not event
+
+    def _compact_queue(self):
+        """ Remove all cancelled events from the queue
+
+        Must be called while holding the queue lock.
+        """
+        with self._events_lock:
+            self._queue.compact(lambda event: not self._is_cancelled(event))
+        self._cancelled_count = 0
+
+    def _discard_cancelled_head(self):
+        """ Drop cancelled events sitting at the head of the queue
+
+        Must be called while holding the queue lock.
+        """
+        with self._events_lock:
+            event = self._queue.peek()
+            while event is not None and self._is_cancelled(event):
+                self._queue.pop()
+                self._cancelled_count = max(0, self._cancelled_count - 1)
+                event = self._queue.peek()
+
+    def get_stats(self):
+        """ Provide scheduler thread instrumentation
+
+        Returns:
+            dict with the number of times the scheduler thread woke up, the
+            number of events it executed and how late (in seconds) those
+            events were executed. Events executed through jump_ahead are
+            not included.
+            When running targets in a worker pool it also includes the
+            number of runs waiting for a worker, how long (in scheduler
+            time) runs waited after being due until a worker started them,
+            runs skipped because of max_concurrent_runs and ticks dropped
+            because of coalesce.
+            'fired' counts every target call, jump_ahead included.
+        """
+        return {
+            "wakeups": self._wakeups,
+            "executed": self._executed,
+            "max_lateness": self._max_lateness,
+            "mean_lateness":
+                self._total_lateness / self._executed if self._executed
+                else 0,
+            "pool_queue_depth": self._pool_queue_depth,
+            "max_execution_lag": self._max_execution_lag,
+            "mean_execution_lag":
+                self._total_execution_lag / self._pool_executed
+                if self._pool_executed else 0,
+            "skipped_runs": self._skipped_runs,
+            "coalesced_ticks": self._coalesced_ticks,
+            "fired": self._fired,
+        }
 
     def stop(self):
         self._stop_event.set()
-        # do not join indefinitely, allow a reasonable time
-        self._process_events_thread.join(10 * self._sched_resolution)
-        if self._process_events_thread.is_alive():
-            self.logger.warning("Scheduler thread did not end properly, "
-                                "it timed out")
+        self._sleep_interrupt_event.set()
+        if self._process_events_thread is not None:
+            # do not join indefinitely, allow a reasonable time
+            self._process_events_thread.join(10 * self._sched_resolution)
+            if self._process_events_thread.is_alive():
+                self.logger.warning("Scheduler thread did not end properly, "
+                                    "it timed out")
+            self._process_events_thread = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
 
     def start(self):
-        self._process_events_thread = spawn(self._process_events)
+        if self._execution_mode == \
+                SynchronousSchedulerRunner.ExecutionMode.pool.value:
+            self._executor = ThreadPoolExecutor(
+                max_workers=self._max_workers,
+                thread_name_prefix="scheduler")
+        if self._clock == SynchronousSchedulerRunner.Clock.real.value:
+            self._process_events_thread = spawn(self._process_events)
 
     def _process_events(self):
         """ Process scheduled events
 
         Starts a loop that runs indefinitely until stop_event is set.
         Uses recommended-time returned from _execute_pending_tasks to wait
-            for next pending tasks execution
+            for next pending tasks execution, the wait is interrupted when
+            the earliest scheduled event changes
         Any exception that may arise is logged while loop continues execution
         """
 
         while not self._stop_event.is_set():
             try:
-                next_try_time = self._execute_pending_tasks()
+                self._sleep_interrupt_event.clear()
+                next_try_time = self._execute_pending_tasks(
+                    record_lateness=True)
                 self._sleep_interrupt_event.wait(next_try_time)
+                self._wakeups += 1
             except Exception:
                 # log any exception, do not leave loop
                 self.logger.exception('Exception caught')
 
-    def _execute_pending_tasks(self):
+    def _execute_pending_tasks(self, record_lateness=False,
+                               catch_up=CatchUp.replay.value):
         """ Executes pending tasks
 
         This method will execute pending tasks, as soon as no task is ready for
@@ -174,10 +424,16 @@ class SynchronousSchedulerRunner(Runner):
 
         General characteristics:
             Scheduler tasks are launched asynchronously
-            When not a single event is scheduled, method will return the
-            resolution time, however, when events are present the next wait
-            time is calculated as the minimum between scheduler's resolution
-            and next event scheduled time.
+            When not a single event is scheduled, method will return None so
+            that the scheduler thread waits until an event is scheduled,
+            however, when events are present the next wait time is
+            calculated from next event scheduled time.
+
+        Args:
+            record_lateness (bool): if True, how late events are executed
+                is recorded for instrumentation
+            catch_up (int): CatchUp value, how repeatable events that missed
+                more than one tick are fired
 
         Returns:
             recommended time to wait before events are next considered
@@ -186,56 +442,145 @@ class SynchronousSchedulerRunner(Runner):
             with self._queue_lock:
                 # is queue empty?
                 if not self._queue:
-                    # amount of time recommended to wait before trying again
-                    return self._sched_resolution
-                # have access to first event in queue
-                event = heapq.heappop(self._queue)
-
-            # check event's time to see if it is up for execution.
-            event_time, event_id, target, frequency, args, kwargs = event
-            # get time to compare event against
-            now = self._get_time()
-            if now < event_time:
-                # event is in the future so push it back and recommend time
-                # to wait before trying again
-                with self._queue_lock:
-                    heapq.heappush(self._queue, event)
-                return min(event_time - now, self._sched_resolution)
-            else:
-                # time is up, execute
-                try:
-                    self.logger.debug("Executing: {0}".format(target))
-                    # launch target task from a different thread thus
-                    # making scheduler independent from task duration
-                    target(*args, **kwargs)
-                except Exception:
-                    self.logger.exception('Calling: {0}'.format(target))
-
+                    # nothing to wait for until an event is scheduled
+                    return None
+                # get time to compare events against
+                now = self._get_time()
+                # have access to first event in queue if it is due
+                event = self._queue.pop_due(now)
+                if event is None:
+                    # next event is in the future, recommend time to wait
+                    # before trying again
+                    self._discard_cancelled_head()
+                    if not self._queue:
+                        return None
+                    return self._queue.next_time() - now
+                event.queued = False
                 with self._events_lock:
-                    # before processing any further, make sure event has
-                    # not been cancelled
-                    if event_id in self._events:
-                        # is it repeatable?
-                        if frequency:
-                            # reschedule it back, adding frequency to
-                            # event time
-                            event = QueueEvent(event_time + frequency,
-                                               event_id,
-                                               target,
-                                               frequency,
-                                               args, kwargs)
-                            # housekeeping new event in
-                            with self._queue_lock:
-                                heapq.heappush(self._queue, event)
-                            self._events[event_id] = event
-                        else:
-                            # remove event when not repeatable
-                            del self._events[event_id]
+                    cancelled = self._is_cancelled(event)
+                if cancelled:
+                    # discard tombstone left behind by unschedule
+                    self._cancelled_count = max(0, self._cancelled_count - 1)
+                    continue
+
+            # time is up, execute
+            event_time = event.time
+            event_id = event.id
+            frequency = event.frequency
+            if record_lateness:
+                lateness = now - event_time
+                self._executed += 1
+                self._total_lateness += lateness
+                self._max_lateness = max(self._max_lateness, lateness)
+            ticks = 1
+            replay = SynchronousSchedulerRunner.CatchUp.replay.value
+            if frequency and catch_up != replay:
+                # number of ticks missed up to now, including this one
+                ticks = int((now - event_time) // frequency) + 1
+            self._fire(event, ticks, catch_up)
+
+            with self._events_lock:
+                # before processing any further, make sure event has
+                # not been cancelled
+                if event_id in self._events:
+                    # is it repeatable?
+                    if frequency:
+                        next_time = event_time + ticks * frequency
+                        now = self._get_time()
+                        if next_time <= now and \
+                                self._job_policy(event_id, "coalesce"):
+                            # fell behind schedule, skip the missed ticks
+                            missed = int((now - next_time) // frequency) + 1
+                            next_time += missed * frequency
+                            self._coalesced_ticks += missed
+                        # reschedule it back, adding frequency to
+                        # event time, the event is no longer in the queue
+                        # so it can be updated in place
+                        event.time = next_time
                     else:
-                        self.logger.debug("Event: {0} was cancelled".
-                                          format(event_id))
-
-    def jump_ahead(self, seconds):
+                        # remove event when not repeatable
+                        del self._events[event_id]
+                        self._job_policies.pop(event_id, None)
+                        event = None
+                else:
+                    self.logger.debug("Event: {0} was cancelled".
+                                      format(event_id))
+                    event = None
+            if event is not None:
+                # queue lock is never taken while holding the events lock,
+                # the scheduler thread takes them in the opposite order
+                with self._queue_lock:
+                    with self._events_lock:
+                        # unscheduled since, never queue it as a tombstone
+                        cancelled = self._is_cancelled(event)
+                    if not cancelled:
+                        event.seq = next(self._sequence)
+                        event.queued = True
+                        self._queue.push(event)
+
+    def _fire(self, event, ticks, catch_up):
+        """ Execute an event's target for the given number of ticks """
+        kwargs = event.kwargs
+        if ticks > 1 and \
+                catch_up == SynchronousSchedulerRunner.CatchUp.count.value:
+            kwargs = dict(kwargs, fire_count=ticks)
+            ticks = 1
+        for _ in range(ticks):
+            self._fired += 1
+            if self._executor is None:
+                self._run_target(event, kwargs)
+            else:
+                # launch target task from a different thread thus
+                # making scheduler independent from task duration
+                self._submit_target(event, kwargs)
+            if ticks > 1 and event.id not in self._events:
+                # target cancelled its own job, drop remaining ticks
+                break
+
+    def _run_target(self, event, kwargs):
+        try:
+            # formatted lazily, this runs for every fired event
+            self.logger.debug("Executing: %s", event.target)
+            event.target(*event.args, **kwargs)
+        except Exception:
+            self.logger.exception('Calling: {0}'.format(event.target))
+
+    def _submit_target(self, event, kwargs):
+        """ Hand an event's target over to the worker pool
+
+        The run is skipped when the job already has as many runs in the
+        pool as its max_concurrent_runs policy allows.
+        """
+        with self._running_lock:
+            running = self._running.get(event.id, 0)
+            if running >= self._job_policy(event.id, "max_concurrent_runs"):
+                self.logger.debug(
+                    "Skipping {0}, too many concurrent runs".format(
+                        event.target))
+                self._skipped_runs += 1
+                return
+            self._running[event.id] = running + 1
+            self._pool_queue_depth += 1
+        # event is updated in place once rescheduled, keep its due time
+        self._executor.submit(
+            self._run_pooled_target, event, event.time, kwargs)
+
+    def _run_pooled_target(self, event, due_time, kwargs):
+        with self._running_lock:
+            self._pool_queue_depth -= 1
+            lag = self._get_time() - due_time
+            self._pool_executed += 1
+            self._total_execution_lag += lag
+            self._max_execution_lag = max(self._max_execution_lag, lag)
+        try:
+            self._run_target(event, kwargs)
+        finally:
+            with self._running_lock:
+                self._running[event.id] -= 1
+                if not self._running[event.id]:
+                    del self._running[event.id]
+
+    def jump_ahead(self, seconds, catch_up=None):
         """ Simulate a jump forward in time
 
         This will update the scheduler's offset a certain number of seconds
@@ -250,6 +595,12 @@ class SynchronousSchedulerRunner(Runner):
 
         Args:
             seconds (float): How many seconds to simulate passing in time.
+            catch_up (CatchUp): How repeatable jobs that missed several ticks
+                during the jump are fired, defaults to the configured value.
+                With 'replay' every tick is fired one at a time interleaved
+                with other jobs' ticks, 'batch' fires all of a job's ticks
+                back to back and 'count' calls the target once with the
+                number of ticks as the 'fire_count' keyword argument.
 
         Raises:
             ValueError: If seconds is negative - can't go back in time
@@ -257,14 +608,91 @@ class SynchronousSchedulerRunner(Runner):
         if float(seconds) < 0:
             raise ValueError("Cannot jump backwards in time")
 
+        if catch_up is None:
+            catch_up = self._catch_up
+        elif isinstance(catch_up, SynchronousSchedulerRunner.CatchUp):
+            catch_up = catch_up.value
+
         self.offset += seconds
 
         # have scheduler execute tasks that might be ready after this jump
-        self._execute_pending_tasks()
+        self._execute_pending_tasks(catch_up=catch_up)
+        # scheduler thread wait is based on the time before the jump
+        self._sleep_interrupt_event.set()
+
+    def advance(self):
+        """ Advance time to the next scheduled event and fire it
+
+        Every event due at that time fires, events they schedule for that
+        same time included.
+
+        Returns:
+            the scheduler time reached, None when no event is left to fire
+            or the scheduler is stopped
+        """
+        fired = self._fired
+        while self._fired == fired:
+            if self._stop_event.is_set():
+                # stopped schedulers never fire, do not wait for an event
+                return None
+            with self._queue_lock:
+                self._discard_cancelled_head()
+                # the timing wheel may only tell when a bucket is due
+                next_time = self._queue.next_time()
+            if next_time is None:
+                return None
+            self.offset += max(0, next_time - self._get_time())
+            self._execute_pending_tasks()
+        self._sleep_interrupt_event.set()
+        return self._get_time()
+
+    def simulate(self, seconds):
+        """ Advance time event by event over a number of seconds
+
+        Unlike jump_ahead, time only moves up to each event before it fires,
+        targets see the time they were scheduled for and every job they
+        schedule fires in order. Meant for the virtual clock, with the real
+        clock time keeps passing while events fire.
+
+        Args:
+            seconds (float): How many seconds to simulate
+
+        Returns:
+            dict report of the simulated seconds, events fired, real time
+            elapsed and simulated events per second
+
+        Raises:
+            ValueError: If seconds is negative - can't go back in time
+        """
+        if float(seconds) < 0:
+            raise ValueError("Cannot jump backwards in time")
+        end = self._get_time() + seconds
+        fired = self._fired
+        start = perf_counter()
+        while not self._stop_event.is_set():
+            with self._queue_lock:
+                self._discard_cancelled_head()
+                next_time = self._queue.next_time()
+            if next_time is None or next_time > end:
+                break
+            self.offset += max(0, next_time - self._get_time())
+            self._execute_pending_tasks()
+        self.offset += max(0, end - self._get_time())
+        self._sleep_interrupt_event.set()
+        elapsed = perf_counter() - start
+        events = self._fired - fired
+        return {
+            "simulated_seconds": seconds,
+            "events": events,
+            "elapsed": elapsed,
+            "events_per_second": events / elapsed if elapsed else 0,
+        }
 
     def _get_time(self):
         """ Time retrieval method to use when comparing against event time
         """
+        if self._clock == SynchronousSchedulerRunner.Clock.virtual.value:
+            return self.offset
         # Use a clock that cannot go backwards.
         # This clock is not affected by system clock updates
         return monotonic() + self.offset
@@ -0,0 +1,82 @@
+from collections import namedtuple
+from random import Random
+from unittest import TestCase
+
+from ..queues import HeapEventQueue, TimingWheelEventQueue
+from ..scheduler import QueueEvent
+
+Event = namedtuple('Event', 'time, id')
+
+
+class TestEventQueues(TestCase):
+
+    def _queues(self):
+        return [HeapEventQueue(), TimingWheelEventQueue(0.01, 8, 0)]
+
+    def _drain(self, queue, until, step):
+        popped = []
+        now = 0
+        while now <= until:
+            event = queue.pop_due(now)
+            while event is not None:
+                self.assertLessEqual(event.time, now)
+                popped.append(event)
+                event = queue.pop_due(now)
+            now += step
+        return popped
+
+    def test_pop_due_order(self):
+        """ Events come out in time order no further than their time """
+        random = Random(42)
+        events = [Event(random.uniform(0, 100), i) for i in range(500)]
+        for queue in self._queues():
+            for event in events:
+                queue.push(event)
+            self.assertEqual(len(queue), len(events))
+            popped = self._drain(queue, 101, 0.7)
+            self.assertEqual(popped, sorted(events))
+            self.assertEqual(len(queue), 0)
+            self.assertIsNone(queue.next_time())
+
+    def test_pop_due_single_jump(self):
+        """ A single large time step releases every due event in order """
+        random = Random(7)
+        events = [Event(random.uniform(0, 1000), i) for i in range(200)]
+        for queue in self._queues():
+            for event in events:
+                queue.push(event)
+            self.assertIsNone(queue.pop_due(-1))
+            popped = self._drain(queue, 1000, 1000)
+            self.assertEqual(popped, sorted(events))
+
+    def test_next_time(self):
+        """ Next time never goes past the earliest pending event """
+        for queue in self._queues():
+            queue.push(Event(5.123, 'a'))
+            queue.push(Event(2.5, 'b'))
+            self.assertLessEqual(queue.next_time(), 2.5)
+            self.assertIsNone(queue.pop_due(2.4))
+            self.assertEqual(queue.pop_due(2.5).id, 'b')
+            self.assertLessEqual(queue.next_time(), 5.123)
+
+    def test_compact(self):
+        """ Compaction removes rejected events """
+        for queue in self._queues():
+            for i in range(10):
+                queue.push(Event(i + 0.5, i))
+            queue.compact(lambda event: event.id % 2)
+            self.assertEqual(len(queue), 5)
+            popped = self._drain(queue, 11, 1)
+            self.assertEqual([event.id for event in popped], [1, 3, 5, 7, 9])
+
+    def test_same_time_fifo(self):
+        """ Events due at the same time come out in the order queued """
+        for queue in self._queues():
+            events = []
+            for seq in range(25):
+                event = QueueEvent(3.5, seq, None, None, (), {})
+                event.seq = seq
+                events.append(event)
+                queue.push(event)
+            popped = self._drain(queue, 4, 1)
+            self.assertEqual([event.id for event in popped], list(range(25)))
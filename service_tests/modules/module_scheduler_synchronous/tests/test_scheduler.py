@@ -0,0 +1,317 @@
+from datetime import timedelta
+from threading import Event
+from time import sleep
+from unittest import TestCase
+
+from nio.modules.context import ModuleContext
+
+from ..scheduler import SynchronousSchedulerRunner
+
+
+class SchedulerTestCase(TestCase):
+
+    queue_type = SynchronousSchedulerRunner.QueueType.heap
+    execution_mode = SynchronousSchedulerRunner.ExecutionMode.inline
+    clock = SynchronousSchedulerRunner.Clock.real
+
+    def setUp(self):
+        super().setUp()
+        self.times_called = 0
+        context = ModuleContext()
+        context.min_interval = 0.01
+        context.resolution = 0.01
+        context.queue_type = self.queue_type.value
+        context.execution_mode = self.execution_mode.value
+        context.clock = self.clock.value
+        self.scheduler = SynchronousSchedulerRunner()
+        self.scheduler.do_configure(context)
+        self.scheduler.do_start()
+
+    def tearDown(self):
+        self.scheduler.do_stop()
+        super().tearDown()
+
+    def _callback(self):
+        self.times_called += 1
+
+    def _schedule(self, seconds, repeatable=False):
+        return self.scheduler.schedule_task(
+            self._callback, timedelta(seconds=seconds), repeatable)
+
+
+class TestSynchronousScheduler(SchedulerTestCase):
+
+    def test_unschedule(self):
+        """ Cancelled jobs never fire """
+        job = self._schedule(5)
+        self.assertTrue(self.scheduler.unschedule(job))
+        self.scheduler.jump_ahead(10)
+        self.assertEqual(self.times_called, 0)
+        # cancelling again has no effect
+        self.assertFalse(self.scheduler.unschedule(job))
+
+    def test_unschedule_leaves_tombstone(self):
+        """ Cancelled events are discarded lazily from the queue """
+        cancelled = self._schedule(20)
+        self._schedule(5)
+        self.scheduler.unschedule(cancelled)
+        self.assertEqual(len(self.scheduler._queue), 2)
+        self.assertEqual(self.scheduler._cancelled_count, 1)
+        self.scheduler.jump_ahead(10)
+        self.assertEqual(self.times_called, 1)
+        # tombstone is dropped once it reaches the head of the queue
+        self.scheduler.jump_ahead(15)
+        self.assertEqual(len(self.scheduler._queue), 0)
+        self.assertEqual(self.scheduler._cancelled_count, 0)
+        self.assertEqual(self.times_called, 1)
+
+    def test_unschedule_compacts_queue(self):
+        """ Queue is compacted once cancelled events dominate it """
+        self.scheduler._compaction_threshold = 4
+        jobs = [self._schedule(5 + i) for i in range(6)]
+        for job in jobs[:-4:-1]:
+            self.scheduler.unschedule(job)
+        self.assertEqual(len(self.scheduler._queue), 6)
+        # fourth cancellation crosses the threshold
+        self.scheduler.unschedule(jobs[-4])
+        self.assertEqual(len(self.scheduler._queue), 2)
+        self.assertEqual(self.scheduler._cancelled_count, 0)
+        self.scheduler.jump_ahead(20)
+        self.assertEqual(self.times_called, 2)
+
+    def test_unschedule_repeatable(self):
+        """ Repeatable jobs stop firing after being cancelled """
+        job = self._schedule(5, repeatable=True)
+        self.scheduler.jump_ahead(11)
+        self.assertEqual(self.times_called, 2)
+        self.scheduler.unschedule(job)
+        self.scheduler.jump_ahead(20)
+        self.assertEqual(self.times_called, 2)
+        self.assertEqual(len(self.scheduler._queue), 0)
+
+    def test_unschedule_executing(self):
+        """ Jobs cancelled while executing leave no tombstone behind """
+        jobs = []
+
+        def _cancel():
+            self._callback()
+            self.scheduler.unschedule(jobs[0])
+        jobs.append(self.scheduler.schedule_task(
+            _cancel, timedelta(seconds=5), True))
+        self.scheduler.jump_ahead(6)
+        self.assertEqual(self.times_called, 1)
+        self.assertEqual(self.scheduler._cancelled_count, 0)
+        self.assertEqual(len(self.scheduler._queue), 0)
+
+    def test_earlier_job_wakes_scheduler(self):
+        """ Scheduling a new earliest job interrupts the scheduler wait """
+        self._schedule(3600)
+        sleep(0.05)
+        wakeups = self.scheduler.get_stats()["wakeups"]
+        self._schedule(0.05)
+        sleep(0.3)
+        self.assertEqual(self.times_called, 1)
+        stats = self.scheduler.get_stats()
+        self.assertEqual(stats["executed"], 1)
+        self.assertLess(stats["max_lateness"], 0.25)
+        # woken up once by the new job, once more to execute it
+        self.assertLessEqual(stats["wakeups"] - wakeups, 3)
+
+    def test_idle_scheduler_sleeps(self):
+        """ Scheduler thread does not poll while waiting for a far job """
+        self._schedule(3600)
+        sleep(0.2)
+        self.assertLessEqual(self.scheduler.get_stats()["wakeups"], 2)
+
+    def test_coalesce(self):
+        """ Coalescing jobs run once after falling behind schedule """
+        job = self._schedule(5, repeatable=True)
+        self.scheduler.configure_job(job, coalesce=True)
+        self.scheduler.jump_ahead(21)
+        self.assertEqual(self.times_called, 1)
+        self.assertEqual(self.scheduler.get_stats()["coalesced_ticks"], 3)
+        # back on schedule at 25 seconds
+        self.scheduler.jump_ahead(4)
+        self.assertEqual(self.times_called, 2)
+
+    def test_jump_ahead_batch(self):
+        """ Batch catch up fires every missed tick """
+        self._schedule(5, repeatable=True)
+        self.scheduler.jump_ahead(
+            21, SynchronousSchedulerRunner.CatchUp.batch)
+        self.assertEqual(self.times_called, 4)
+        # next tick is still at 25 seconds
+        self.scheduler.jump_ahead(3.9)
+        self.assertEqual(self.times_called, 4)
+        self.scheduler.jump_ahead(0.2)
+        self.assertEqual(self.times_called, 5)
+
+    def test_jump_ahead_count(self):
+        """ Count catch up calls target once with the missed ticks """
+        fire_counts = []
+        self.scheduler.schedule_task(
+            lambda fire_count=1: fire_counts.append(fire_count),
+            timedelta(seconds=3), True)
+        self.scheduler.jump_ahead(
+            24 * 3600, SynchronousSchedulerRunner.CatchUp.count)
+        self.assertEqual(fire_counts, [28800])
+        self.scheduler.jump_ahead(3)
+        self.assertEqual(fire_counts, [28800, 1])
+
+
+class TestTimingWheelScheduler(TestSynchronousScheduler):
+
+    queue_type = SynchronousSchedulerRunner.QueueType.timing_wheel
+
+    def test_jump_repeatable(self):
+        """ Every missed repeat fires when jumping ahead """
+        self._schedule(5, repeatable=True)
+        self.scheduler.jump_ahead(6)
+        self.assertEqual(self.times_called, 1)
+        self.scheduler.jump_ahead(15)
+        self.assertEqual(self.times_called, 4)
+
+    def test_far_future_job(self):
+        """ Jobs beyond the finest wheel cascade down and fire on time """
+        self._schedule(3600)
+        self.scheduler.jump_ahead(3599.9)
+        self.assertEqual(self.times_called, 0)
+        self.scheduler.jump_ahead(0.2)
+        self.assertEqual(self.times_called, 1)
+
+
+class TestVirtualClockScheduler(TestSynchronousScheduler):
+
+    clock = SynchronousSchedulerRunner.Clock.virtual
+
+    def test_earlier_job_wakes_scheduler(self):
+        """ Jobs never fire while time stands still """
+        self._schedule(0.05)
+        sleep(0.1)
+        self.assertEqual(self.times_called, 0)
+        self.assertIsNone(self.scheduler._process_events_thread)
+
+    def test_idle_scheduler_sleeps(self):
+        """ There is no scheduler thread to wake up """
+        self._schedule(3600)
+        self.assertEqual(self.scheduler.get_stats()["wakeups"], 0)
+
+    def test_advance(self):
+        """ Time advances to the next event, which fires """
+        self.assertIsNone(self.scheduler.advance())
+        self._schedule(5, repeatable=True)
+        self._schedule(7)
+        times = [self.scheduler.advance() for _ in range(3)]
+        self.assertEqual(times, [5, 7, 10])
+        self.assertEqual(self.times_called, 3)
+
+    def test_advance_stopped(self):
+        """ Advancing a stopped scheduler fires nothing and returns """
+        self._schedule(5)
+        self.scheduler.stop()
+        self.assertIsNone(self.scheduler.advance())
+        self.assertEqual(self.times_called, 0)
+
+    def test_simulate(self):
+        """ Events fire in order and see the time they were due """
+        times = []
+
+        def _debounce():
+            times.append(self.scheduler._get_time())
+            # jobs scheduled by targets fire within the same simulation
+            self.scheduler.schedule_task(
+                lambda: times.append(self.scheduler._get_time()),
+                timedelta(seconds=10), False)
+
+        self.scheduler.schedule_task(
+            _debounce, timedelta(seconds=30), True)
+        report = self.scheduler.simulate(75)
+        self.assertEqual(times, [30, 40, 60, 70])
+        self.assertEqual(report["events"], 4)
+        self.assertEqual(report["simulated_seconds"], 75)
+        self.assertEqual(self.scheduler._get_time(), 75)
+        # fires next at 90 seconds
+        self.scheduler.simulate(14.9)
+        self.assertEqual(len(times), 4)
+        self.scheduler.simulate(0.1)
+        self.assertEqual(len(times), 5)
+
+    def test_same_deadline_fifo(self):
+        """ Jobs due at the same time fire in the order they were queued """
+        order = []
+        for i in range(25):
+            self.scheduler.schedule_task(
+                order.append, timedelta(seconds=5), False, i)
+        self.scheduler.advance()
+        self.assertEqual(order, list(range(25)))
+
+
+class TestVirtualClockTimingWheel(TestVirtualClockScheduler):
+
+    queue_type = SynchronousSchedulerRunner.QueueType.timing_wheel
+
+
+class TestPooledScheduler(SchedulerTestCase):
+
+    execution_mode = SynchronousSchedulerRunner.ExecutionMode.pool
+
+    def _callback(self):
+        super()._callback()
+        self.called_event.set()
+
+    def setUp(self):
+        self.called_event = Event()
+        super().setUp()
+
+    def _jump_and_wait(self, seconds):
+        self.called_event.clear()
+        self.scheduler.jump_ahead(seconds)
+        self.called_event.wait(1)
+        # let the worker finish its bookkeeping
+        sleep(0.05)
+
+    def test_jump_ahead(self):
+        """ Targets run in the worker pool """
+        self._schedule(5)
+        self._jump_and_wait(6)
+        self.assertEqual(self.times_called, 1)
+        stats = self.scheduler.get_stats()
+        self.assertEqual(stats["pool_queue_depth"], 0)
+        self.assertGreaterEqual(stats["max_execution_lag"], 1)
+
+    def test_unschedule_repeatable(self):
+        """ Repeatable jobs stop firing after being cancelled """
+        job = self._schedule(5, repeatable=True)
+        self._jump_and_wait(6)
+        self.scheduler.unschedule(job)
+        self._jump_and_wait(20)
+        self.assertEqual(self.times_called, 1)
+
+    def test_coalesce(self):
+        """ Coalescing jobs run once after falling behind schedule """
+        job = self._schedule(5, repeatable=True)
+        self.scheduler.configure_job(job, coalesce=True)
+        self._jump_and_wait(21)
+        self.assertEqual(self.times_called, 1)
+        self.assertEqual(self.scheduler.get_stats()["coalesced_ticks"], 3)
+
+    def test_slow_job_does_not_stall(self):
+        """ A slow target does not delay other targets """
+        release = Event()
+        self.scheduler.schedule_task(
+            release.wait, timedelta(seconds=0.01), False, 1)
+        self._schedule(0.05)
+        self.assertTrue(self.called_event.wait(0.5))
+        self.assertFalse(release.is_set())
+        release.set()
+
+    def test_max_concurrent_runs(self):
+        """ Runs due while the job is still running are skipped """
+        release = Event()
+        job = self.scheduler.schedule_task(
+            release.wait, timedelta(seconds=5), True, 1)
+        self.scheduler.configure_job(job, max_concurrent_runs=1)
+        self.scheduler.jump_ahead(16)
+        stats = self.scheduler.get_stats()
+        self.assertEqual(stats["skipped_runs"], 2)
+        release.set()
@@ -0,0 +1,133 @@
+import json
+from collections import defaultdict
+from contextlib import contextmanager
+from threading import Lock, local
+from time import perf_counter, thread_time
+
+
+class _Stats(object):
+
+    """ Profile of a block input """
+
+    __slots__ = ('calls', 'wall_time', 'cpu_time', 'wall_histogram',
+                 'signals_in', 'copy_time')
+
+    def __init__(self):
+        self.calls = 0
+        self.wall_time = 0.0
+        self.cpu_time = 0.0
+        # call count by wall time bucket, buckets are powers of two in
+        # microseconds
+        self.wall_histogram = defaultdict(int)
+        self.signals_in = 0
+        self.copy_time = 0.0
+
+    def to_dict(self):
+        return {
+            "calls": self.calls,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "wall_histogram_us": {
+                str(1 << bucket): count for bucket, count in
+                sorted(self.wall_histogram.items())},
+            "signals_in": self.signals_in,
+            "copy_time": self.copy_time,
+        }
+
+
+class BlockProfiler(object):
+
+    """ Records where service tests spend time processing signals
+
+    Per block and input it counts calls and signals in, and keeps wall and
+    CPU time totals, a histogram of wall times and the time spent copying
+    signals for the block. Signals out are counted per block and output.
+
+    Nested calls, a block notifying signals processed synchronously by the
+    next one, are tracked as stacks whose self time can be exported in the
+    collapsed format flame graph tools take.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._stats = defaultdict(_Stats)
+        self._signals_out = defaultdict(int)
+        self._stacks = defaultdict(float)
+        self._thread = local()
+
+    @contextmanager
+    def profile(self, block_name, input_id, signals):
+        """ Profile a block processing signals
+
+        Args:
+            block_name (str): block processing signals
+            input_id (str): input signals came through, None for default
+            signals (int): number of signals processed
+        """
+        stack = getattr(self._thread, "stack", None)
+        if stack is None:
+            stack = self._thread.stack = []
+        # entries are block name and time spent in nested calls
+        stack.append([block_name, 0.0])
+        start_cpu = thread_time()
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            wall_time = perf_counter() - start
+            cpu_time = thread_time() - start_cpu
+            path = ";".join(entry[0] for entry in stack)
+            _, nested_time = stack.pop()
+            if stack:
+                stack[-1][1] += wall_time
+            with self._lock:
+                stats = self._stats[(block_name, input_id)]
+                stats.calls += 1
+                stats.wall_time += wall_time
+                stats.cpu_time += cpu_time
+                stats.wall_histogram[int(wall_time * 1e6).bit_length()] += 1
+                stats.signals_in += signals
+                self._stacks[path] += wall_time - nested_time
+
+    def record_signals_out(self, block_name, output_id, signals):
+        with self._lock:
+            self._signals_out[(block_name, output_id)] += signals
+
+    def record_copy(self, block_name, input_id, copy_time):
+        """ Record time spent copying signals for a block input """
+        with self._lock:
+            self._stats[(block_name, input_id)].copy_time += copy_time
+
+    def report(self):
+        """ Profile by block
+
+        Returns:
+            dict with inputs (stats by input id) and outputs (signals out by
+            output id) for each block
+        """
+        report = defaultdict(lambda: {"inputs": {}, "outputs": {}})
+        with self._lock:
+            for (block_name, input_id), stats in self._stats.items():
+                report[block_name]["inputs"][str(input_id)] = \
+                    stats.to_dict()
+            for (block_name, output_id), signals in \
+                    self._signals_out.items():
+                report[block_name]["outputs"][str(output_id)] = signals
+        return dict(report)
+
+    def write_json(self, filename):
+        """ Write the report as json """
+        with open(filename, "w") as f:
+            json.dump(self.report(), f, indent=4, sort_keys=True)
+
+    def write_collapsed(self, filename):
+        """ Write self time by stack, in microseconds, as collapsed stacks
+
+        Lines look like `Subscriber;Filter;SetColor 1250`, ready for
+        flamegraph.pl or speedscope.
+        """
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        with open(filename, "w") as f:
+            for path, self_time in stacks:
+                f.write("{} {}\n".format(path, int(self_time * 1e6)))
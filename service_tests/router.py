@@ -1,59 +1,313 @@
-from collections import defaultdict
+from collections import defaultdict, deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
 from copy import copy, deepcopy
-from threading import Event
+from enum import Enum
+from threading import Condition, Event, Lock, local
+from time import monotonic, perf_counter
 
 from nio.router.base import BlockRouter
+from nio.util.logging import get_nio_logger
 from nio.util.threading import spawn
 
+from .capture import SignalCapture
+
+
+# a signal list going from a block output to a block input
+Hop = namedtuple(
+    "Hop", ["time", "sender", "output_id", "receiver", "input_id", "count"])
+
+
+class _Captures(dict):
+
+    """ Signal captures created on first use """
+
+    def __init__(self, create):
+        super().__init__()
+        self._create = create
+        self._lock = Lock()
+
+    def __missing__(self, key):
+        with self._lock:
+            if key not in self:
+                self[key] = self._create(key)
+            return dict.__getitem__(self, key)
+
+
+class SharedSignalMutation(AssertionError):
+    """ A receiver altered signals it shares with other blocks """
+    pass
+
+
+class _BlockQueue(object):
+
+    """ Signal lists waiting for a block, processed in order """
+
+    __slots__ = ('items', 'scheduled')
+
+    def __init__(self):
+        self.items = deque()
+        # a worker is draining this queue
+        self.scheduled = False
+
 
 class ServiceTestRouter(BlockRouter):
 
-    def __init__(self, synchronous):
+    # input id of captures holding the signals of every input of a block
+    ALL_INPUTS = "*"
+
+    class CopyStrategy(Enum):
+        # every receiver gets the notified list itself
+        none = 1
+        # every receiver gets its own list of the notified signals
+        shallow = 2
+        # every receiver gets its own copy of each signal, attribute values
+        # are shared so setting an attribute only affects that receiver
+        copy_on_write = 3
+        # every receiver gets a deep copy of the notified signals
+        deep = 4
+
+    # signal lists a worker processes for a block before letting other
+    # blocks have the worker
+    _drain_batch = 32
+
+    def __init__(self, synchronous, copy_strategy=CopyStrategy.deep,
+                 guard_mutations=False, trace_size=0, workers=0,
+                 queue_size=0, profiler=None, capture=None):
+        """ Create a router
+
+        Args:
+            synchronous (bool): receivers process signals in the notifying
+                thread
+            copy_strategy (CopyStrategy): how signals are copied for each
+                receiver
+            guard_mutations (bool): raise SharedSignalMutation when a
+                receiver alters signals that are not deep copied, only
+                checked when synchronous
+            trace_size (int): number of most recent hops kept in `trace`,
+                hops are not traced when 0
+            workers (int): when not synchronous, size of the thread pool
+                processing signals, a thread is spawned per hop when 0
+            queue_size (int): signal lists each block may have waiting in
+                the pool before notifying blocks wait, unbounded when 0
+            profiler (BlockProfiler): records the time blocks spend
+                processing signals, when given
+            capture (callable): creates the SignalCapture of processed
+                signals given a block name and input id, ALL_INPUTS for
+                the capture of every input, full captures by default
+        """
         super().__init__()
+        self.logger = get_nio_logger("ServiceTestRouter")
         self._execution = []
+        # receivers by block name and output id, see _compile_routes
+        self._routes = {}
+        self.trace = deque(maxlen=trace_size) if trace_size else None
         self._synchronous = synchronous
+        self._copy_strategy = copy_strategy
+        self._guard_mutations = guard_mutations and synchronous and \
+            copy_strategy != ServiceTestRouter.CopyStrategy.deep
+        self.profiler = profiler
+        self._workers = 0 if synchronous else workers
+        self._queue_size = queue_size
+        self._executor = None
+        self._queues = defaultdict(_BlockQueue)
+        self._queues_changed = Condition()
+        self._worker_state = local()
         self._blocks = {}
-        self._processed_signals = defaultdict(list)
-        self.processed_signals_input = \
-            defaultdict(lambda: defaultdict(list))
+        capture = capture or (lambda block_name, input_id: SignalCapture())
+        self._processed_signals = _Captures(
+            lambda block_name: capture(block_name, self.ALL_INPUTS))
+        self.processed_signals_input = _Captures(
+            lambda block_name: _Captures(
+                lambda input_id: capture(block_name, input_id)))
 
     def configure(self, context):
         self._execution = context.execution
         self._blocks = context.blocks
+        self._routes = self._compile_routes(self._execution)
         self._setup_processed()
+        if self._workers and self._executor is None:
+            self._executor = ThreadPoolExecutor(self._workers)
+
+    def shutdown(self, timeout=None):
+        """ Stop the worker pool once queued signals are processed
+
+        Args:
+            timeout (float): seconds to wait for queues to drain
+        """
+        if self._executor is None:
+            return
+        with self._queues_changed:
+            self._queues_changed.wait_for(
+                lambda: not any(queue.scheduled
+                                for queue in self._queues.values()),
+                timeout)
+            executor = self._executor
+            self._executor = None
+        executor.shutdown(wait=False)
+
+    @staticmethod
+    def _compile_routes(execution):
+        """ Map each block and output to the (receiver, input) it feeds
+
+        Outputs without receivers of their own are routed as the default
+        output.
+
+        Returns:
+            dict of receiver lists by output id, by block name
+        """
+        routes = {}
+        for block in execution:
+            if block["name"] in routes:
+                # only the first entry of a block is ever used
+                continue
+            all_receivers = block["receivers"]
+            routes[block["name"]] = {
+                output_id: [(receiver["name"], receiver["input"])
+                            for receiver in receivers]
+                for output_id, receivers in (all_receivers or {}).items()}
+        return routes
 
     def notify_signals(self, block, signals, output_id):
         if not signals:
             print("Block {} notified an empty signal list".format(block))
             return
         from_block_name = block.name()
-        all_receivers = [block["receivers"] for block in self._execution
-                         if block["name"] == from_block_name][0]
-        if not all_receivers:
+        outputs = self._routes[from_block_name]
+        if not outputs:
             return
         # If output_id isn't in receivers, then use default output
-        receivers = all_receivers.get(
-            output_id, all_receivers.get("__default_terminal_value", []))
-        for receiver in receivers:
-            receiver_name = receiver["name"]
-            input_id = receiver["input"]
+        receivers = outputs.get(output_id)
+        if receivers is None:
+            receivers = outputs.get("__default_terminal_value", [])
+        if self.profiler is not None:
+            self.profiler.record_signals_out(
+                from_block_name, output_id, len(signals))
+        if self._guard_mutations:
+            fingerprint = self._fingerprint(signals)
+        for receiver_name, input_id in receivers:
             to_block = self._blocks[receiver_name]
-            print("{} -> {}".format(from_block_name, receiver_name))
-            try:
-                cloned_signals = deepcopy(signals)
-            except:
-                cloned_signals = copy(signals)
+            if self.trace is not None:
+                self.trace.append(Hop(
+                    monotonic(), from_block_name, output_id, receiver_name,
+                    input_id, len(signals)))
+            if self.profiler is not None:
+                start = perf_counter()
+                cloned_signals = self._copy_signals(signals)
+                self.profiler.record_copy(
+                    receiver_name,
+                    None if input_id == "__default_terminal_value"
+                    else input_id, perf_counter() - start)
+            else:
+                cloned_signals = self._copy_signals(signals)
             if input_id == "__default_terminal_value":
                 # don't include input_id if it's default terminal
-                if self._synchronous:
-                    to_block.process_signals(cloned_signals)
-                else:
-                    spawn(to_block.process_signals, cloned_signals)
+                args = (cloned_signals,)
             else:
-                if self._synchronous:
-                    to_block.process_signals(cloned_signals, input_id)
-                else:
-                    spawn(to_block.process_signals, cloned_signals, input_id)
+                args = (cloned_signals, input_id)
+            if self._synchronous:
+                to_block.process_signals(*args)
+            elif self._workers:
+                self._enqueue(receiver_name, args)
+            else:
+                spawn(to_block.process_signals, *args)
+            if self._guard_mutations and \
+                    self._fingerprint(signals) != fingerprint:
+                raise SharedSignalMutation(
+                    "Block {} altered signals shared with other blocks, "
+                    "use a deep copy strategy or copy signals before "
+                    "changing them".format(receiver_name))
+
+    def _enqueue(self, block_name, args):
+        """ Queue process_signals arguments for a block in the pool
+
+        Notifying threads outside of the pool wait while the block queue is
+        full. Workers never wait, a worker blocked on a queue only another
+        worker can drain could otherwise deadlock the pool.
+        """
+        with self._queues_changed:
+            queue = self._queues[block_name]
+            if self._queue_size and \
+                    not getattr(self._worker_state, "active", False):
+                while len(queue.items) >= self._queue_size:
+                    self._queues_changed.wait()
+            if self._executor is None:
+                # signals notified after shutdown
+                spawn(self._blocks[block_name].process_signals, *args)
+                return
+            queue.items.append(args)
+            if queue.scheduled:
+                return
+            queue.scheduled = True
+            self._executor.submit(self._drain, block_name)
+
+    def _drain(self, block_name):
+        """ Process signals queued for a block, in order """
+        self._worker_state.active = True
+        process_signals = self._blocks[block_name].process_signals
+        while True:
+            for _ in range(self._drain_batch):
+                with self._queues_changed:
+                    queue = self._queues[block_name]
+                    if not queue.items:
+                        queue.scheduled = False
+                        self._queues_changed.notify_all()
+                        return
+                    args = queue.items.popleft()
+                    self._queues_changed.notify_all()
+                try:
+                    process_signals(*args)
+                except Exception:
+                    self.logger.exception(
+                        "Block {} failed to process signals".format(
+                            block_name))
+            # let other blocks have this worker, the queue stays scheduled
+            # so that no other worker processes this block meanwhile
+            with self._queues_changed:
+                if self._executor is not None:
+                    self._executor.submit(self._drain, block_name)
+                    return
+            # the pool is shutting down, finish in this worker
+
+    def _copy_signals(self, signals):
+        """ Provide the signals a receiver gets as per copy strategy """
+        if self._copy_strategy == ServiceTestRouter.CopyStrategy.deep:
+            try:
+                return deepcopy(signals)
+            except:
+                return copy(signals)
+        if self._copy_strategy == ServiceTestRouter.CopyStrategy.shallow:
+            return list(signals)
+        if self._copy_strategy == \
+                ServiceTestRouter.CopyStrategy.copy_on_write:
+            return [self._copy_signal(signal) for signal in signals]
+        return signals
+
+    @staticmethod
+    def _copy_signal(signal):
+        """ Copy a signal sharing its attribute values """
+        try:
+            clone = signal.__class__.__new__(signal.__class__)
+            clone.__dict__.update(signal.__dict__)
+            return clone
+        except (AttributeError, TypeError):
+            return copy(signal)
+
+    @staticmethod
+    def _fingerprint(signals):
+        """ Representation of signals that changes when they are altered
+
+        The list itself is fingerprinted too since receivers may share it.
+        """
+        return repr([(id(signal), getattr(signal, "__dict__", signal))
+                     for signal in signals])
+
+    def close_captures(self):
+        """ Close processed signal captures streaming to files """
+        for capture in self._processed_signals.values():
+            capture.close()
+        for captures in self.processed_signals_input.values():
+            for capture in captures.values():
+                capture.close()
 
     def _processed_signals_set(self, block_name):
         self._blocks[block_name]._processed_event.set()
@@ -65,7 +319,12 @@ class ServiceTestRouter(BlockRouter):
         """
         def process_wrapper(*args, **kwargs):
             input_id = args[1] if len(args) > 1 else None
-            process_signals(*args, **kwargs)
+            if self.profiler is not None:
+                with self.profiler.profile(
+                        block_name, input_id, len(args[0])):
+                    process_signals(*args, **kwargs)
+            else:
+                process_signals(*args, **kwargs)
             self._processed_signals[block_name].extend(args[0])
             self.processed_signals_input[block_name][input_id].extend(args[0])
             self._processed_signals_set(block_name)
@@ -1,8 +1,8 @@
-import json
 import jsonschema
 import os
-import re
 import sys
+import tempfile
+from collections import defaultdict
 from threading import Event
 from unittest.mock import MagicMock
 
@@ -17,6 +17,10 @@ from nio.util.discovery import is_class_discoverable as _is_class_discoverable
 from nio.util.runner import RunnerStatus
 from niocore.core.loader.discover import Discover
 
+from .capture import SignalCapture
+from .env_vars import EnvVarReplacer
+from .fixture_cache import FixtureCache
+from .profiler import BlockProfiler
 from .router import ServiceTestRouter
 from .modules.module_persistence_file.module import FilePersistenceModule
 from .modules.module_persistence_file.persistence import Persistence
@@ -49,33 +53,93 @@ class NioServiceTestCase(NIOTestCase):
         * Mock blocks with `mock_blocks` by mapping block names to mocked
             process_signals method for that block.
         * Test by notifying signals from a block with `notify_signals`
+        * Bound memory used by processed and published signals in long
+            tests with `capture_mode`, `capture_modes` and
+            `published_capture_mode`
+        * Avoid copying signals for every receiving block by overriding
+            `copy_strategy`, set `guard_signal_mutations` to catch blocks
+            altering shared signals
     """
 
     service_name = None
     auto_start = True
     synchronous = True
+    # block classes, configs and topic schema shared by every test
+    fixtures = FixtureCache()
+    # how signals are copied for each receiving block
+    copy_strategy = ServiceTestRouter.CopyStrategy.deep
+    # fail when a block alters signals shared with other blocks
+    guard_signal_mutations = False
+    # number of most recent signal hops kept in `signal_trace`
+    trace_size = 0
+    # asynchronous tests process signals in a pool of this many threads
+    # instead of a thread per hop when set
+    router_workers = 0
+    # signal lists waiting per block before publishing waits, 0 is unbounded
+    router_queue_size = 0
+    # record time spent by each block in `block_profile`
+    profile_blocks = False
+    # folder where block profiles are written after each test when set
+    profile_dir = None
+    # what is kept of processed signals, see `capture_modes`
+    capture_mode = SignalCapture.Mode.full
+    # what is kept of published signals
+    published_capture_mode = SignalCapture.Mode.full
+    # signals kept by ring captures
+    capture_size = 1000
+    # folder stream captures write to, the system temp folder when not set
+    capture_dir = None
+    # index published signals for assert_signal_published, by default only
+    # with the full and ring published capture modes, set it to index them
+    # with count and stream modes too
+    index_published_signals = None
+    # validate only every Nth signal of each topic against the topic schema
+    schema_sample_rate = 1
+    # time only advances through the scheduler's jump_ahead, advance and
+    # simulate, requires synchronous
+    virtual_clock = False
 
     def __init__(self, methodName='runTests'):
         super().__init__(methodName)
         self._blocks = {}
-        self._router = ServiceTestRouter(self.synchronous)
+        self._router = ServiceTestRouter(
+            self.synchronous, self.copy_strategy, self.guard_signal_mutations,
+            self.trace_size, self.router_workers, self.router_queue_size,
+            BlockProfiler() if self.profile_blocks else None,
+            self._create_capture)
         # Set this Scheduler object to be used in tests for jump_ahead
         self._scheduler = SyncScheduler if self.synchronous else None
         # Subscribe to publishers in the service
         self._subscribers = {}
         # Capture published signals for assertions
-        self.published_signals = []
+        self.published_signals = SignalCapture(
+            index=self._index_published(SignalCapture.Mode.full))
         # Set an event when those publishers publish signals
         self._publisher_event = Event()
         # Allow tests to publish signals to any subscriber
         self._publishers = {}
         # Json schema for publisher and subscriber validation
         self._schema = {}
+        # Compiled schema validators by topic
+        self._validators = {}
+        # Signals seen by topic, for schema validation sampling
+        self._schema_signal_counts = defaultdict(int)
 
     @property
     def processed_signals(self):
         return self._router._processed_signals
 
+    @property
+    def block_profile(self):
+        """BlockProfiler of this test, when `profile_blocks` is set"""
+        return self._router.profiler
+
+    @property
+    def signal_trace(self):
+        """Most recent signal hops between blocks, when `trace_size` is set
+        """
+        return list(self._router.trace or [])
+
     def publisher_topics(self):
         """Topics this service publishes to"""
         return []
@@ -107,6 +171,35 @@ class NioServiceTestCase(NIOTestCase):
         """
         return {}
 
+    def capture_modes(self):
+        """Optionally choose what is kept of each block's processed signals
+        Return:
+            dict(block_name, SignalCapture.Mode): blocks not included use
+                `capture_mode`
+        """
+        return {}
+
+    def _create_capture(self, block_name, input_id):
+        filename = "{}.{}.jsonl".format(self.id(), block_name) \
+            if input_id == ServiceTestRouter.ALL_INPUTS else \
+            "{}.{}.{}.jsonl".format(self.id(), block_name, input_id)
+        return SignalCapture(
+            self.capture_modes().get(block_name, self.capture_mode),
+            self.capture_size,
+            os.path.join(self.capture_dir or tempfile.gettempdir(), filename))
+
+    def _create_published_capture(self):
+        return SignalCapture(
+            self.published_capture_mode, self.capture_size,
+            os.path.join(self.capture_dir or tempfile.gettempdir(),
+                         "{}.published.jsonl".format(self.id())),
+            index=self._index_published(self.published_capture_mode))
+
+    def _index_published(self, mode):
+        if self.index_published_signals is None:
+            return mode in (SignalCapture.Mode.full, SignalCapture.Mode.ring)
+        return self.index_published_signals
+
     def override_block_configs(self):
         """Optionally override block config for the tests"""
         return {}
@@ -118,17 +211,30 @@ class NioServiceTestCase(NIOTestCase):
     def setUp(self):
         super().setUp()
         self._invalid_topics = {}
-        persistence = Persistence()
-        self.block_configs = persistence.load_collection("blocks")
-        self.service_configs = persistence.load_collection("services")
+        self._env_var_replacer = EnvVarReplacer(self.env_vars())
+        self.published_signals = self._create_published_capture()
+        self.block_configs = self._load_configs("blocks")
+        self.service_configs = self._load_configs("services")
         self.service_config = self.service_configs.get(self.service_name, {})
         self._setup_blocks()
         self._setup_pubsub()
         self._setup_json_schema()
+        if self._env_var_replacer.unknown:
+            print("Unknown environment variables: {}".format(
+                ", ".join(sorted(self._env_var_replacer.unknown))))
         # Start blocks
         if self.auto_start:
             self.start()
 
+    def _load_configs(self, collection):
+        """ Load a config collection through the fixture cache """
+        persistence = Persistence()
+        if Persistence._format != Persistence.Format.json.value:
+            return persistence.load_collection(collection, {})
+        return self.fixtures.load_collection(
+            persistence._get_collection_folder(collection),
+            persistence._get_file_extension())
+
     def get_test_modules(self):
         return {'settings', 'scheduler', 'persistence', 'communication'}
 
@@ -142,6 +248,11 @@ class NioServiceTestCase(NIOTestCase):
             context.root_id = ''
             context.format = Persistence.Format.json.value
             return context
+        elif module_name == "scheduler" and self.synchronous:
+            context = super().get_context(module_name, module)
+            if self.virtual_clock:
+                context.clock = SyncScheduler.Clock.virtual.value
+            return context
         else:
             return super().get_context(module_name, module)
 
@@ -156,7 +267,9 @@ class NioServiceTestCase(NIOTestCase):
 
     def _setup_blocks(self):
         # Instantiate and configure blocks
-        blocks = Discover.discover_classes('blocks', Base, is_class_discoverable)
+        blocks = self.fixtures.block_classes(
+            'blocks', lambda package: Discover.discover_classes(
+                package, Base, is_class_discoverable))
         service_block_names = [service_block["name"] for service_block in
                                self.service_config.get("execution", [])]
         service_block_mappings = {}
@@ -210,41 +323,27 @@ class NioServiceTestCase(NIOTestCase):
 
     def _replace_env_vars(self, config):
         """Return config with environment variables swapped out"""
-        for var in self.env_vars():
-            config = \
-                self._replace_env_var(config, var, self.env_vars()[var])
-        return config
-
-    def _replace_env_var(self, config, name, value):
-        for property in config:
-            if isinstance(config[property], str):
-                config[property] = re.sub("\[\[" + name + "\]\]",
-                                          str(value),
-                                          config[property])
-            elif isinstance(config[property], dict):
-                self._replace_env_var(config[property], name, value)
-            elif isinstance(config[property], list):
-                new_list = []
-                for item in config[property]:
-                    if isinstance(item, str):
-                        new_list.append(re.sub("\[\[" + name + "\]\]",
-                                               str(value),
-                                               item))
-                    elif isinstance(item, dict):
-                        new_list.append(
-                                self._replace_env_var(item, name, value))
-                config[property] = new_list
-        return config
+        return self._env_var_replacer.replace(config)
 
     def tearDown(self):
         # Tear down publishers and subscribers for tests
         self._teardown_pubsub()
+        # Let pooled routing finish with queued signals
+        self._router.shutdown(timeout=1)
         # Stop blocks
         for block in self._blocks:
             self._blocks[block].stop()
 
         # set runner status
         self._router.status = RunnerStatus.stopped
+        self._router.close_captures()
+
+        if self.block_profile is not None and self.profile_dir:
+            os.makedirs(self.profile_dir, exist_ok=True)
+            filename = os.path.join(self.profile_dir, self.id())
+            self.block_profile.write_json("{}.json".format(filename))
+            self.block_profile.write_collapsed(
+                "{}.collapsed".format(filename))
 
         super().tearDown()
 
@@ -268,7 +367,9 @@ class NioServiceTestCase(NIOTestCase):
             self._publishers[publisher].open()
 
     def _teardown_pubsub(self):
-        self.published_signals = []
+        self.published_signals.close()
+        self.published_signals = SignalCapture(
+            index=self._index_published(SignalCapture.Mode.full))
         for subscriber in self._subscribers:
             self._subscribers[subscriber].close()
         for publisher in self._publishers:
@@ -303,7 +404,7 @@ class NioServiceTestCase(NIOTestCase):
                     self._router.processed_signals_input[block_name][input_id]
             else:
                 signal_list = self._router._processed_signals[block_name]
-            while count > len(signal_list):
+            while count > signal_list.count:
                 if not self._blocks[block_name]._processed_event.wait(timeout):
                     return
 
@@ -321,7 +422,7 @@ class NioServiceTestCase(NIOTestCase):
             self._publisher_event.wait(timeout)
         else:
             # Wait for specified number of signals
-            while count > len(self.published_signals):
+            while count > self.published_signals.count:
                 if not self._publisher_event.wait(timeout):
                     return
 
@@ -353,14 +454,14 @@ class NioServiceTestCase(NIOTestCase):
                          os.path.join(__file__, "../../../", file_name))]
         for file_path in file_paths:
             if os.path.isfile(file_path):
-                with open(file_path, 'r') as json_file:
-                    try:
-                        self._schema = json.load(json_file)
-                    except Exception as e:
-                        self.fail(
-                            "Problem parsing topic validation file located at "
-                            "{}: {}".format(file_path, e))
-                    break
+                try:
+                    self._schema = self.fixtures.load_json(file_path)
+                    validators = self.fixtures.load_validators(file_path)
+                except Exception as e:
+                    self.fail(
+                        "Problem parsing topic validation file located at "
+                        "{}: {}".format(file_path, e))
+                break
         else:
             print('Could not find a topic schema file. If you wish to '
                   'do publisher/subscriber topic validation, put a '
@@ -369,30 +470,46 @@ class NioServiceTestCase(NIOTestCase):
 
         # replace env vars for schema topics
         if self._schema:
-            self._schema = {self._replace_env_vars({'topic': topic})['topic']:
-                            self._schema[topic] for topic in self._schema}
+            topics = {topic: self._replace_env_vars({'topic': topic})['topic']
+                      for topic in self._schema}
+            self._schema = {topics[topic]: self._schema[topic]
+                            for topic in self._schema}
+            self._validators = {topics[topic]: validators[topic]
+                                for topic in validators}
 
     def schema_validate(self, signals, topic=None):
         """validate each signal in a list against the given json schema.
-        Update any error information to be collected at the end of the test."""
-        if topic in self._schema:
-            for signal in signals:
-                try:
-                    jsonschema.validate(signal.to_dict(), self._schema[topic])
-                except Exception as e:
-                    print("Topic {} received an invalid signal: {}"
-                          .format(topic, signal))
+        Update any error information to be collected at the end of the test.
 
-                    self._invalid_topics.update(
-                        {topic: " ".join(str(e).replace("\n", " ").split())}
-                    )
+        Only every `schema_sample_rate`th signal of a topic is validated.
+        """
+        validator = self._validators.get(topic)
+        if validator is None:
+            return
+        for signal in signals:
+            self._schema_signal_counts[topic] += 1
+            if (self._schema_signal_counts[topic] - 1) % \
+                    self.schema_sample_rate:
+                continue
+            if isinstance(validator, Exception):
+                error = validator
+            else:
+                error = jsonschema.exceptions.best_match(
+                    validator.iter_errors(signal.to_dict()))
+            if error is not None:
+                print("Topic {} received an invalid signal: {}"
+                      .format(topic, signal))
+
+                self._invalid_topics.update(
+                    {topic: " ".join(str(error).replace("\n", " ").split())}
+                )
 
     def assert_num_signals_published(self, expected):
         """asserts that the amount of published signals is equal to expected"""
         if not isinstance(expected, int):
             raise TypeError('Amount of published signals can only be an int. '
                             'Got type {}: {}'.format(type(expected), expected))
-        actual = len(self.published_signals)
+        actual = self.published_signals.count
         if not actual == expected:
             raise AssertionError('Amount of published signals not equal to {}.'
                                  ' Actual: {}'.format(expected, actual))
@@ -408,20 +525,25 @@ class NioServiceTestCase(NIOTestCase):
 
         if input_id is not None:
             actual = \
-                len(self._router.processed_signals_input[block_name][input_id])
+                self._router.processed_signals_input[block_name][
+                    input_id].count
         else:
-            actual = len(self.processed_signals[block_name])
+            actual = self.processed_signals[block_name].count
         if not actual == expected:
             raise AssertionError('Amount of processed signals not equal to {}.'
                                  ' Actual: {}'.format(expected, actual))
 
-    def assert_signal_published(self, signal_dict):
-        """asserts signal_dict is in the list of published signals"""
-        for published_signal in self.published_signals:
-            try:
-                self.assertDictEqual(published_signal.to_dict(), signal_dict)
-                return
-            except:
-                # Check next signal
-                continue
-        self.fail("Signal has not been published: {}".format(signal_dict))
+    def assert_signal_published(self, signal_dict, partial=False):
+        """asserts signal_dict is in the list of published signals
+
+        With partial, asserts a published signal holds at least the
+        attributes in signal_dict.
+        """
+        if not self.published_signals.indexed and \
+                not self.published_signals.retains:
+            raise AssertionError(
+                "Published signals are not kept with {} capture mode, set "
+                "index_published_signals".format(
+                    self.published_signals.mode.name))
+        if not self.published_signals.contains(signal_dict, partial):
+            self.fail("Signal has not been published: {}".format(signal_dict))
@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from nio.signal.base import Signal
+
+from ..capture import SignalCapture, SignalIndex
+
+
+class TestSignalIndex(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.index = SignalIndex()
+        self.index.add({"device": {"id": "1", "volume": 50},
+                        "artists": ["a", "b"], "is_playing": True})
+        self.index.add({"device": {"id": "2", "volume": 10},
+                        "is_playing": False})
+
+    def test_exact(self):
+        """ Exact matches compare as dicts do """
+        self.assertTrue(self.index.contains(
+            {"is_playing": False, "device": {"volume": 10, "id": "2"}}))
+        self.assertFalse(self.index.contains({"is_playing": False}))
+        # lists and tuples never compare equal
+        self.assertFalse(self.index.contains(
+            {"device": {"id": "1", "volume": 50},
+             "artists": ("a", "b"), "is_playing": True}))
+        # numbers compare as they do in dicts
+        self.assertTrue(self.index.contains(
+            {"device": {"id": "2", "volume": 10.0}, "is_playing": 0}))
+
+    def test_partial(self):
+        """ Partial matches need at least the given attributes """
+        self.assertTrue(self.index.contains({"is_playing": False}, True))
+        self.assertTrue(self.index.contains(
+            {"device": {"id": "1", "volume": 50}, "is_playing": True}, True))
+        self.assertFalse(self.index.contains(
+            {"device": {"id": "1", "volume": 50}, "is_playing": False},
+            True))
+        self.assertFalse(self.index.contains({"missing": 1}, True))
+        self.assertTrue(self.index.contains({}, True))
+
+    def test_remove(self):
+        """ Removed signals are no longer found """
+        key = self.index.add({"is_playing": None})
+        self.assertTrue(self.index.contains({"is_playing": None}))
+        self.index.remove(key)
+        self.assertFalse(self.index.contains({"is_playing": None}))
+        self.assertFalse(self.index.contains({"is_playing": None}, True))
+
+    def test_unhashable_values(self):
+        """ Signals with unhashable values are scanned """
+        value = bytearray(b"x")
+        key = self.index.add({"data": value})
+        self.assertTrue(self.index.contains({"data": bytearray(b"x")}))
+        self.assertTrue(self.index.contains({"data": value}, True))
+        self.index.remove(key)
+        self.assertFalse(self.index.contains({"data": value}))
+
+
+class TestIndexedCapture(TestCase):
+
+    def test_ring_forgets_dropped_signals(self):
+        """ Signals dropped from the ring are dropped from the index """
+        capture = SignalCapture(SignalCapture.Mode.ring, 2, index=True)
+        for index in range(3):
+            capture.append(Signal({"index": index}))
+        self.assertFalse(capture.contains({"index": 0}))
+        self.assertTrue(capture.contains({"index": 2}))
+
+    def test_count_mode(self):
+        """ Indexed count captures find signals they do not keep """
+        capture = SignalCapture(SignalCapture.Mode.count, index=True)
+        capture.extend([Signal({"index": 0}), Signal({"index": 1})])
+        self.assertEqual(len(capture), 0)
+        self.assertTrue(capture.contains({"index": 1}))
+
+    def test_not_indexed_by_default(self):
+        """ Unindexed captures scan retained signals and keep no index """
+        for mode in (SignalCapture.Mode.full, SignalCapture.Mode.ring,
+                     SignalCapture.Mode.count):
+            self.assertFalse(SignalCapture(mode, 2).indexed)
+        capture = SignalCapture(SignalCapture.Mode.ring, 2)
+        for index in range(3):
+            capture.append(Signal({"index": index, "is_playing": True}))
+        self.assertFalse(capture.contains({"index": 0}, True))
+        self.assertTrue(capture.contains({"index": 2, "is_playing": True}))
+        self.assertTrue(capture.contains({"index": 1}, True))
+        self.assertFalse(capture.contains({"index": 1}))
@@ -0,0 +1,48 @@
+from unittest import TestCase
+
+from ..env_vars import EnvVarReplacer
+
+
+class TestEnvVarReplacer(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.replacer = EnvVarReplacer({
+            "CLIENT_ID": "id", "PORT": 443, "NESTED": "[[CLIENT_ID]]"})
+
+    def test_replace(self):
+        """ Variables are replaced throughout a copy of the config """
+        config = {
+            "name": "Auth",
+            "url": "https://host:[[PORT]]/[[CLIENT_ID]]",
+            "headers": [{"id": "[[CLIENT_ID]]"}, "[[PORT]]", 3, ["[[PORT]]"]],
+        }
+        self.assertEqual(self.replacer.replace(config), {
+            "name": "Auth",
+            "url": "https://host:443/id",
+            "headers": [{"id": "id"}, "443", 3, ["443"]],
+        })
+        # the config itself is left alone
+        self.assertEqual(config["url"],
+                         "https://host:[[PORT]]/[[CLIENT_ID]]")
+
+    def test_single_pass(self):
+        """ Replaced values are not replaced again """
+        self.assertEqual(self.replacer.replace("[[NESTED]]"),
+                         "[[CLIENT_ID]]")
+
+    def test_unchanged_subtrees(self):
+        """ Parts of the config without variables are shared """
+        unchanged = {"list": ["a", 1], "dict": {"b": "[[MISSING]]"}}
+        config = {"unchanged": unchanged, "changed": {"c": "[[PORT]]"}}
+        replaced = self.replacer.replace(config)
+        self.assertIsNot(replaced, config)
+        self.assertIs(replaced["unchanged"], unchanged)
+        self.assertIs(self.replacer.replace(unchanged), unchanged)
+
+    def test_unknown(self):
+        """ Unknown variables are left in place and reported """
+        self.assertEqual(
+            self.replacer.replace({"a": "[[MISSING]] [[PORT]] [[OTHER]]"}),
+            {"a": "[[MISSING]] 443 [[OTHER]]"})
+        self.assertEqual(self.replacer.unknown, {"MISSING", "OTHER"})
@@ -0,0 +1,119 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import Mock, patch
+
+from ..fixture_cache import FixtureCache
+
+
+class TestSchemaValidators(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, "topic_schema.json")
+        self._write({
+            "new_auth": {"type": "object",
+                         "required": ["access_token"]},
+            "bad_auth": {"type": "not a type"},
+        })
+        self.fixtures = FixtureCache()
+
+    def tearDown(self):
+        self.folder.cleanup()
+        super().tearDown()
+
+    def _write(self, schema, mtime=None):
+        with open(self.file_path, "w") as f:
+            json.dump(schema, f)
+        if mtime is not None:
+            os.utime(self.file_path, (mtime, mtime))
+
+    def test_validators(self):
+        """ Topics get a validator, invalid schemas their error """
+        validators = self.fixtures.load_validators(self.file_path)
+        self.assertTrue(validators["new_auth"].is_valid(
+            {"access_token": "token"}))
+        self.assertFalse(validators["new_auth"].is_valid({}))
+        # invalid topic schema are reported instead of raised
+        self.assertIsInstance(validators["bad_auth"], Exception)
+
+    def test_compiled_once(self):
+        """ Validators are compiled again only when the file changes """
+        validators = self.fixtures.load_validators(self.file_path)
+        self.assertIs(self.fixtures.load_validators(self.file_path),
+                      validators)
+        # validators are compiled again when the file changes
+        self._write({"new_auth": {"type": "object"}}, mtime=1)
+        validators = self.fixtures.load_validators(self.file_path)
+        self.assertEqual(list(validators), ["new_auth"])
+        self.assertTrue(validators["new_auth"].is_valid({}))
+
+
+class TestFixtureCache(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.folder = tempfile.TemporaryDirectory()
+        self.file_path = os.path.join(self.folder.name, "Block.cfg")
+        self._write({"name": "Block", "interval": {"seconds": 3}})
+        self.fixtures = FixtureCache()
+
+    def tearDown(self):
+        self.folder.cleanup()
+        super().tearDown()
+
+    def _write(self, config, mtime=None):
+        with open(self.file_path, "w") as f:
+            json.dump(config, f)
+        if mtime is not None:
+            os.utime(self.file_path, (mtime, mtime))
+
+    def test_load_json_cached(self):
+        """ A config file is parsed once while it is unchanged """
+        with patch("json.load", side_effect=json.load) as load:
+            for _ in range(3):
+                self.assertEqual(self.fixtures.load_json(self.file_path),
+                                 {"name": "Block",
+                                  "interval": {"seconds": 3}})
+        self.assertEqual(load.call_count, 1)
+
+    def test_load_json_edited(self):
+        """ An edited config file is parsed again """
+        self.fixtures.load_json(self.file_path)
+        self._write({"name": "Edited"}, mtime=1)
+        self.assertEqual(self.fixtures.load_json(self.file_path),
+                         {"name": "Edited"})
+        os.remove(self.file_path)
+        self.assertIsNone(self.fixtures.load_json(self.file_path))
+
+    def test_load_json_copies(self):
+        """ Altering a loaded config leaves the cached one untouched """
+        config = self.fixtures.load_json(self.file_path)
+        config["interval"]["seconds"] = 10
+        config["name"] = "Altered"
+        self.assertEqual(self.fixtures.load_json(self.file_path),
+                         {"name": "Block", "interval": {"seconds": 3}})
+
+    def test_load_collection(self):
+        """ Collections hold every config of a folder, cached per file """
+        collection = self.fixtures.load_collection(self.folder.name)
+        self.assertEqual(list(collection), ["Block"])
+        collection["Block"]["name"] = "Altered"
+        self.assertEqual(
+            self.fixtures.load_collection(self.folder.name)["Block"]["name"],
+            "Block")
+
+    def test_block_classes_cached(self):
+        """ Block classes are discovered once per package """
+        discover = Mock(side_effect=lambda package: [package])
+        for _ in range(2):
+            self.assertEqual(
+                self.fixtures.block_classes("blocks", discover), ["blocks"])
+        self.assertEqual(
+            self.fixtures.block_classes("other", discover), ["other"])
+        self.assertEqual(discover.call_count, 2)
+        self.fixtures.clear()
+        self.fixtures.block_classes("blocks", discover)
+        self.assertEqual(discover.call_count, 3)
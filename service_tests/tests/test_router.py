@@ -0,0 +1,353 @@
+import json
+import os
+import shutil
+from tempfile import mkdtemp
+from threading import Event, Thread
+from time import sleep
+from unittest import TestCase
+from unittest.mock import MagicMock
+
+from nio.router.context import RouterContext
+from nio.signal.base import Signal
+
+from ..capture import SignalCapture
+from ..profiler import BlockProfiler
+from ..router import ServiceTestRouter, SharedSignalMutation
+
+
+class _Block(object):
+
+    def __init__(self, name, process_signals=None):
+        self._name = name
+        self.received = []
+        self._process_signals = process_signals
+
+    def name(self):
+        return self._name
+
+    def process_signals(self, signals, input_id=None):
+        self.received.append(signals)
+        if self._process_signals:
+            self._process_signals(signals)
+
+
+class TestServiceTestRouter(TestCase):
+
+    def _router(self, copy_strategy=ServiceTestRouter.CopyStrategy.deep,
+                guard_mutations=False, receiver=None, trace_size=0):
+        self.sender = _Block("sender")
+        self.receivers = [_Block("receiver1", receiver), _Block("receiver2")]
+        router = ServiceTestRouter(
+            True, copy_strategy, guard_mutations, trace_size)
+        execution = [{
+            "name": "sender",
+            "receivers": {"__default_terminal_value": [
+                {"name": block.name(), "input": "__default_terminal_value"}
+                for block in self.receivers]}
+        }]
+        execution.extend({"name": block.name(), "receivers": {}}
+                         for block in self.receivers)
+        blocks = {block.name(): block
+                  for block in [self.sender] + self.receivers}
+        router.configure(RouterContext(execution=execution, blocks=blocks))
+        return router
+
+    def _notify(self, router):
+        signals = [Signal({"values": [1, 2]})]
+        router.notify_signals(
+            self.sender, signals, "__default_terminal_value")
+        return signals
+
+    def test_deep_copy(self):
+        """ Every receiver gets its own deep copy of the signals """
+        router = self._router(ServiceTestRouter.CopyStrategy.deep)
+        signals = self._notify(router)
+        received = [block.received[0] for block in self.receivers]
+        self.assertIsNot(received[0][0], signals[0])
+        self.assertIsNot(received[0][0].values, received[1][0].values)
+        self.assertEqual(received[0], signals)
+
+    def test_copy_on_write(self):
+        """ Setting an attribute only affects that receiver """
+        router = self._router(
+            ServiceTestRouter.CopyStrategy.copy_on_write, receiver=lambda
+            signals: setattr(signals[0], "values", "replaced"))
+        signals = self._notify(router)
+        received = [block.received[0] for block in self.receivers]
+        self.assertEqual(received[0][0].values, "replaced")
+        # other receivers and the sender are not affected
+        self.assertEqual(received[1][0].values, [1, 2])
+        self.assertEqual(signals[0].values, [1, 2])
+        self.assertIs(received[1][0].values, signals[0].values)
+
+    def test_shallow(self):
+        """ Receivers get their own list of the same signals """
+        router = self._router(ServiceTestRouter.CopyStrategy.shallow)
+        signals = self._notify(router)
+        received = [block.received[0] for block in self.receivers]
+        self.assertIsNot(received[0], signals)
+        self.assertIs(received[0][0], signals[0])
+
+    def test_none(self):
+        """ Receivers get the notified list itself """
+        router = self._router(ServiceTestRouter.CopyStrategy.none)
+        signals = self._notify(router)
+        self.assertIs(self.receivers[0].received[0], signals)
+
+    def test_guard(self):
+        """ Altering shared signals fails for every shared strategy """
+        for copy_strategy in (ServiceTestRouter.CopyStrategy.none,
+                              ServiceTestRouter.CopyStrategy.shallow,
+                              ServiceTestRouter.CopyStrategy.copy_on_write):
+            router = self._router(
+                copy_strategy, True,
+                lambda signals: signals[0].values.append(3))
+            with self.assertRaises(SharedSignalMutation):
+                self._notify(router)
+            # second receiver never gets altered signals
+            self.assertEqual(self.receivers[1].received, [])
+
+    def test_guard_allows_copy_on_write_attribute(self):
+        """ Setting attributes of copy on write signals is allowed """
+        router = self._router(
+            ServiceTestRouter.CopyStrategy.copy_on_write, True,
+            lambda signals: setattr(signals[0], "extra", 1))
+        self._notify(router)
+        self.assertEqual(len(self.receivers[1].received), 1)
+
+    def test_guard_not_needed_for_deep_copies(self):
+        """ Deep copies are never guarded, senders keep their signals """
+        receiver = MagicMock(side_effect=lambda signals:
+                             signals[0].values.append(3))
+        router = self._router(ServiceTestRouter.CopyStrategy.deep, True,
+                              receiver)
+        signals = self._notify(router)
+        self.assertEqual(signals[0].values, [1, 2])
+
+    def test_output_routes(self):
+        """ Signals go to the receivers of their output or the default """
+        router = self._router()
+        router._routes["sender"]["other"] = [("receiver2", "input2")]
+        router.notify_signals(self.sender, [Signal()], "other")
+        router.notify_signals(self.sender, [Signal()], "unknown")
+        self.assertEqual(len(self.receivers[0].received), 1)
+        self.assertEqual(len(self.receivers[1].received), 2)
+
+    def test_trace(self):
+        """ The most recent hops are traced up to the trace size """
+        router = self._router(trace_size=3)
+        self._notify(router)
+        self._notify(router)
+        self.assertEqual(len(router.trace), 3)
+        hop = router.trace[-1]
+        self.assertEqual((hop.sender, hop.receiver, hop.count),
+                         ("sender", "receiver2", 1))
+        self.assertIsNone(self._router().trace)
+
+
+class TestPooledServiceTestRouter(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.processed = []
+        self.blocks = {name: _Block(name, self._processed(name))
+                       for name in ("sender", "first", "second")}
+        self.router = ServiceTestRouter(
+            False, ServiceTestRouter.CopyStrategy.none, workers=2,
+            queue_size=2)
+        execution = [
+            {"name": "sender", "receivers": {"__default_terminal_value": [
+                {"name": "first", "input": "__default_terminal_value"}]}},
+            {"name": "first", "receivers": {"__default_terminal_value": [
+                {"name": "second", "input": "__default_terminal_value"}]}},
+            {"name": "second", "receivers": {}},
+        ]
+        self.router.configure(
+            RouterContext(execution=execution, blocks=self.blocks))
+
+    def tearDown(self):
+        self.router.shutdown()
+        super().tearDown()
+
+    def _processed(self, name):
+        def process(signals):
+            self.processed.append((name, signals[0].index))
+            if name == "first":
+                self.router.notify_signals(
+                    self.blocks["first"], signals,
+                    "__default_terminal_value")
+        return process
+
+    def test_blocks_see_inputs_in_order(self):
+        """ Every block processes its signal lists in order """
+        for index in range(100):
+            self.router.notify_signals(
+                self.blocks["sender"], [Signal({"index": index})],
+                "__default_terminal_value")
+        self.router.shutdown(timeout=5)
+        for name in ("first", "second"):
+            self.assertEqual(
+                [index for block, index in self.processed if block == name],
+                list(range(100)))
+
+    def test_wait_for_processed_signals(self):
+        """ Processed events are set for blocks run in the pool """
+        second = self.blocks["second"]
+        self.router.notify_signals(
+            self.blocks["sender"], [Signal({"index": 0})],
+            "__default_terminal_value")
+        while not self.router._processed_signals["second"]:
+            self.assertTrue(second._processed_event.wait(1))
+        self.assertEqual(len(self.router._processed_signals["second"]), 1)
+
+    def test_backpressure(self):
+        """ Notifying waits while a block queue is full """
+        release = Event()
+        self.blocks["first"].process_signals = \
+            self.router._call_processed(
+                lambda signals: release.wait(), "first")
+        notified = []
+
+        def notify():
+            for index in range(5):
+                self.router.notify_signals(
+                    self.blocks["sender"], [Signal({"index": index})],
+                    "__default_terminal_value")
+                notified.append(index)
+
+        notifier = Thread(target=notify)
+        notifier.start()
+        sleep(0.2)
+        # one list being processed and two waiting in the queue
+        self.assertEqual(len(notified), 3)
+        release.set()
+        notifier.join(5)
+        self.assertEqual(len(notified), 5)
+
+
+class TestProfiledServiceTestRouter(TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.profiler = BlockProfiler()
+        self.router = ServiceTestRouter(
+            True, ServiceTestRouter.CopyStrategy.deep, profiler=self.profiler)
+        self.blocks = {
+            "sender": _Block("sender"),
+            "first": _Block("first", self._notify_twice),
+            "second": _Block("second", lambda signals: sleep(0.01)),
+        }
+        execution = [
+            {"name": "sender", "receivers": {"__default_terminal_value": [
+                {"name": "first", "input": "__default_terminal_value"}]}},
+            {"name": "first", "receivers": {"__default_terminal_value": [
+                {"name": "second", "input": "__default_terminal_value"}]}},
+            {"name": "second", "receivers": {}},
+        ]
+        self.router.configure(
+            RouterContext(execution=execution, blocks=self.blocks))
+        self.router.notify_signals(
+            self.blocks["sender"], [Signal()], "__default_terminal_value")
+
+    def _notify_twice(self, signals):
+        self.router.notify_signals(
+            self.blocks["first"], signals * 2, "__default_terminal_value")
+
+    def test_report(self):
+        """ Calls, signals and times are reported per block and input """
+        report = self.profiler.report()
+        first = report["first"]["inputs"]["None"]
+        self.assertEqual(first["calls"], 1)
+        self.assertEqual(first["signals_in"], 1)
+        self.assertGreater(first["copy_time"], 0)
+        self.assertEqual(report["first"]["outputs"],
+                         {"__default_terminal_value": 2})
+        second = report["second"]["inputs"]["None"]
+        self.assertEqual(second["signals_in"], 2)
+        self.assertGreaterEqual(second["wall_time"], 0.01)
+        self.assertEqual(sum(second["wall_histogram_us"].values()), 1)
+        # nested time is included in the wall time of calling blocks
+        self.assertGreaterEqual(first["wall_time"], second["wall_time"])
+
+    def test_collapsed_stacks(self):
+        """ Collapsed stacks nest blocks notified by other blocks """
+        folder = mkdtemp()
+        try:
+            filename = os.path.join(folder, "profile.collapsed")
+            self.profiler.write_collapsed(filename)
+            with open(filename) as f:
+                stacks = dict(line.rsplit(" ", 1) for line in f)
+            self.assertEqual(set(stacks), {"first", "first;second"})
+            self.assertGreaterEqual(int(stacks["first;second"]), 10000)
+            self.profiler.write_json(os.path.join(folder, "profile.json"))
+        finally:
+            shutil.rmtree(folder)
+
+
+class TestCapturingServiceTestRouter(TestCase):
+
+    def _router(self, mode, folder=None, **kwargs):
+        self.sender = _Block("sender")
+        self.receiver = _Block("receiver")
+        router = ServiceTestRouter(
+            True, capture=lambda block_name, input_id: SignalCapture(
+                mode, filename=folder and os.path.join(
+                    folder, "{}.{}.jsonl".format(block_name, input_id)),
+                **kwargs))
+        execution = [
+            {"name": "sender", "receivers": {"__default_terminal_value": [
+                {"name": "receiver", "input": "__default_terminal_value"}]}},
+            {"name": "receiver", "receivers": {}},
+        ]
+        router.configure(RouterContext(
+            execution=execution,
+            blocks={"sender": self.sender, "receiver": self.receiver}))
+        for index in range(10):
+            router.notify_signals(self.sender, [Signal({"index": index})],
+                                  "__default_terminal_value")
+        return router
+
+    def test_full(self):
+        """ Full captures keep every signal """
+        router = self._router(SignalCapture.Mode.full)
+        capture = router._processed_signals["receiver"]
+        self.assertEqual(capture.count, 10)
+        self.assertEqual(len(capture), 10)
+        self.assertEqual(capture[0].index, 0)
+        self.assertEqual(
+            router.processed_signals_input["receiver"][None].count, 10)
+
+    def test_ring(self):
+        """ Ring captures keep the most recent signals """
+        router = self._router(SignalCapture.Mode.ring, size=3)
+        capture = router._processed_signals["receiver"]
+        self.assertEqual(capture.count, 10)
+        self.assertEqual([signal.index for signal in capture], [7, 8, 9])
+        self.assertEqual(capture[-1].index, 9)
+
+    def test_count(self):
+        """ Count captures only count signals """
+        router = self._router(SignalCapture.Mode.count)
+        capture = router._processed_signals["receiver"]
+        self.assertEqual(capture.count, 10)
+        self.assertEqual(len(capture), 0)
+        self.assertFalse(capture.retains)
+
+    def test_stream(self):
+        """ Stream captures overwrite files left by a previous run """
+        folder = mkdtemp()
+        try:
+            filename = os.path.join(folder, "receiver.*.jsonl")
+            # left over from a previous run
+            with open(filename, "w") as f:
+                f.write('{"index": -1}\n')
+            router = self._router(SignalCapture.Mode.stream, folder)
+            router.close_captures()
+            self.assertEqual(router._processed_signals["receiver"].count, 10)
+            for name in ("receiver.*.jsonl", "receiver.None.jsonl"):
+                with open(os.path.join(folder, name)) as f:
+                    self.assertEqual(
+                        [json.loads(line)["index"] for line in f],
+                        list(range(10)))
+        finally:
+            shutil.rmtree(folder)